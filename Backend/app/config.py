@@ -0,0 +1,181 @@
+import os
+
+# Runtime configuration, overridable through environment variables
+
+# Re-ranking
+# Backend used to re-rank retrieved chunks: "nli" (bart-large-mnli), "cross-encoder" or "none"
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "nli")
+NLI_RERANKER_MODEL = os.getenv("NLI_RERANKER_MODEL", "facebook/bart-large-mnli")
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANKER_BATCH_SIZE = int(os.getenv("RERANKER_BATCH_SIZE", "16"))
+RERANKER_MAX_LENGTH = int(os.getenv("RERANKER_MAX_LENGTH", "512"))
+
+# Exam generation worker pool
+# Number of exams generated concurrently, and how many more may wait before requests are rejected
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "2"))
+GENERATION_MAX_QUEUE = int(os.getenv("GENERATION_MAX_QUEUE", "8"))
+
+# Asynchronous exam generation jobs
+# How long a finished job stays in memory for polling/streaming before only MongoDB has it
+EXAM_JOB_RETENTION_SECONDS = int(os.getenv("EXAM_JOB_RETENTION_SECONDS", "600"))
+
+# FAISS vector database location
+VECTORSTORE_PATH = os.getenv(
+    "VECTORSTORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "routers", "vector_database")
+)
+
+# Retrieval + re-rank result cache
+RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE_ENABLED", "1") == "1"
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "512"))
+RETRIEVAL_CACHE_TTL_SECONDS = int(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "86400"))
+# Minimum cosine similarity between query embeddings for a near-duplicate hit
+RETRIEVAL_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RETRIEVAL_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+# Persistence backend: "" (memory only), "disk" or "mongo"
+RETRIEVAL_CACHE_PERSIST = os.getenv("RETRIEVAL_CACHE_PERSIST", "")
+RETRIEVAL_CACHE_PATH = os.getenv("RETRIEVAL_CACHE_PATH", os.path.join(VECTORSTORE_PATH, "retrieval_cache.pkl"))
+
+# Question bank: serve previously generated questions for the same (chunk, type, difficulty)
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "1") == "1"
+
+# Number of chunks packed into one question generation prompt (1 = one LLM call per question)
+QUESTION_BATCH_SIZE = int(os.getenv("QUESTION_BATCH_SIZE", "1"))
+
+# Ollama output format ("json" constrains the model to valid JSON, "" disables it)
+OLLAMA_FORMAT = os.getenv("OLLAMA_FORMAT", "json")
+# Regenerations allowed per exam for questions that fail validation
+QUESTION_RETRY_BUDGET = int(os.getenv("QUESTION_RETRY_BUDGET", "5"))
+
+# Ollama client
+# Comma-separated list of Ollama servers to balance requests across
+OLLAMA_HOSTS = [host.strip() for host in os.getenv("OLLAMA_HOSTS", "http://localhost:11434").split(",") if host.strip()]
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+# Requests in flight across all servers; match the servers' combined OLLAMA_NUM_PARALLEL
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4"))
+# Deadline of one generation call, including the wait for a free slot
+OLLAMA_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "120"))
+# "least-loaded" or "round-robin"
+OLLAMA_BALANCING = os.getenv("OLLAMA_BALANCING", "least-loaded")
+
+# Model and index loading: "background" (load concurrently after startup, auth is served at once),
+# "startup" (load before accepting requests) or "lazy" (load each resource on first use)
+MODEL_LOADING = os.getenv("MODEL_LOADING", "background")
+# Run one inference per model after loading so the first request does not pay for it
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+# Shared hosting across uvicorn workers
+# Memory-map index.faiss read-only instead of loading a private copy in each worker
+FAISS_MMAP = os.getenv("FAISS_MMAP", "0") == "1"
+# Unix socket of the inference sidecar (app/services/inference_server.py); empty = models in each worker
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "")
+# Sidecar micro-batching: wait up to this long for more requests, up to this many texts per batch
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "5"))
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "64"))
+
+# Corpus ingestion (app/services/ingestion.py)
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+# Chunks embedded per model call
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+# Previous index versions kept on disk (for rollback and for workers still mapping them)
+INDEX_VERSIONS_KEEP = int(os.getenv("INDEX_VERSIONS_KEEP", "3"))
+# How often each worker checks whether another process published a new index version
+INDEX_RELOAD_CHECK_SECONDS = float(os.getenv("INDEX_RELOAD_CHECK_SECONDS", "5"))
+# Usernames allowed to change the corpus through the API (comma-separated); empty = nobody
+INGEST_ADMIN_USERS = [user.strip() for user in os.getenv("INGEST_ADMIN_USERS", "").split(",") if user.strip()]
+
+# Approximate nearest-neighbour search (index type is chosen when building, see app/scripts/build_ann_index.py)
+# IVF indexes: inverted lists scanned per query (higher = better recall, slower)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+# HNSW indexes: candidate list size during search (higher = better recall, slower)
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+
+# Hybrid retrieval: fuse the dense FAISS results with BM25 keyword matches before re-ranking
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+# Reciprocal rank fusion constant (larger = flatter fusion of the two rankings)
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Candidate selection (app/services/selection.py)
+# Retrieve at least this many candidate chunks per requested question
+CANDIDATES_PER_QUESTION = int(os.getenv("CANDIDATES_PER_QUESTION", "3"))
+# Maximal marginal relevance: 1 = relevance only, 0 = diversity only
+MMR_ENABLED = os.getenv("MMR_ENABLED", "1") == "1"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Distinct questions allowed from one chunk when there are fewer usable chunks than questions
+MAX_QUESTIONS_PER_CHUNK = int(os.getenv("MAX_QUESTIONS_PER_CHUNK", "3"))
+
+# Authenticated user resolution (app/utils/jwt_utils.py)
+# Users are cached per worker after the first lookup; account changes in other workers show up after the TTL
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+# Password hashing (app/utils/auth_utils.py)
+# bcrypt cost; stored hashes with another cost are re-hashed at the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads running bcrypt, off the event loop (each call takes ~100-300 ms of CPU)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
+# Login rate limiting (token buckets): burst size and sustained attempts per minute
+LOGIN_RATE_USER_BURST = int(os.getenv("LOGIN_RATE_USER_BURST", "5"))
+LOGIN_RATE_USER_PER_MINUTE = float(os.getenv("LOGIN_RATE_USER_PER_MINUTE", "5"))
+# Per client IP; generous because a whole classroom may log in from one address
+LOGIN_RATE_IP_BURST = int(os.getenv("LOGIN_RATE_IP_BURST", "60"))
+LOGIN_RATE_IP_PER_MINUTE = float(os.getenv("LOGIN_RATE_IP_PER_MINUTE", "120"))
+
+# Exam history (app/routers/exam.py): exams per page, newest first
+EXAM_HISTORY_PAGE_SIZE = int(os.getenv("EXAM_HISTORY_PAGE_SIZE", "20"))
+EXAM_HISTORY_MAX_PAGE_SIZE = int(os.getenv("EXAM_HISTORY_MAX_PAGE_SIZE", "100"))
+
+# MongoDB (app/database.py): one pooled client per process, opened and closed by the app lifespan
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "exam_generator")
+# Connections per server, per client (the API has an async and a sync client for worker threads)
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+# Fail fast instead of hanging requests when MongoDB is unreachable or the pool is exhausted
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+# Write concern: "majority" or a number of nodes; journaled writes when MONGO_JOURNAL=1
+MONGO_WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", "1")
+MONGO_JOURNAL = os.getenv("MONGO_JOURNAL", "0") == "1"
+
+# Logging and metrics (app/utils/telemetry.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" for humans, "json" for log collectors (one object per line, stage timings as fields)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Request coalescing (app/services/coalescing.py): identical exam requests, retrievals and question
+# generations running at the same time are computed once and shared
+COALESCING_ENABLED = os.getenv("COALESCING_ENABLED", "1") == "1"
+
+# Class exams (POST /Exam/class-exams): users allowed to create exams for a class (nobody when empty)
+CLASS_EXAM_TEACHERS = [name.strip() for name in os.getenv("CLASS_EXAM_TEACHERS", "").split(",") if name.strip()]
+CLASS_EXAM_MAX_STUDENTS = int(os.getenv("CLASS_EXAM_MAX_STUDENTS", "200"))
+# Shared candidate pool = question_nbr * factor questions, each student's exam being drawn from it
+CLASS_EXAM_POOL_FACTOR = float(os.getenv("CLASS_EXAM_POOL_FACTOR", "1.5"))
+CLASS_EXAM_MAX_POOL = int(os.getenv("CLASS_EXAM_MAX_POOL", "60"))
+
+# CPU inference backend of the query embedder and the re-ranker (app/services/onnx_inference.py):
+# "torch" (PyTorch models) or "onnx" (ONNX Runtime exports, falling back to PyTorch when unavailable).
+# Check accuracy and speed against PyTorch with app/scripts/check_onnx_backend.py before switching.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+# Exported models, one directory per model, created on first use
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models"))
+# Dynamic int8 quantization of the weights (0 = run the FP32 export)
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "1") == "1"
+# Threads per model call (0 = one per physical core); divide the cores between uvicorn workers
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+
+# Grading of submitted answers (app/services/grading.py)
+# Open-ended answers: cosine similarity of the answer's embedding to the reference answer's. At or above
+# ACCEPT the answer is correct, at or below REJECT it is wrong; in between the LLM grades it.
+GRADING_ACCEPT_SIMILARITY = float(os.getenv("GRADING_ACCEPT_SIMILARITY", "0.8"))
+GRADING_REJECT_SIMILARITY = float(os.getenv("GRADING_REJECT_SIMILARITY", "0.45"))
+# Borderline answers sent to the LLM per grading job (0 = never); the others keep a similarity-based score
+GRADING_MAX_ESCALATIONS = int(os.getenv("GRADING_MAX_ESCALATIONS", "200"))
+# Threads running grading jobs, and exams loaded, graded and written back per step of a job
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", "1"))
+GRADING_BATCH_SIZE = int(os.getenv("GRADING_BATCH_SIZE", "500"))
@@ -1,19 +1,202 @@
+import logging
+import threading
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
 from pymongo.errors import PyMongoError
+from app import config
 
-# MongoDB Configuration
-MONGO_URI = "mongodb://localhost:27017"
-DATABASE_NAME = "exam_generator"
-
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DATABASE_NAME]
-
-# Users collection
-users_collection = db["users"]
-exams_collection = db["exams"]
-# To ensure unique usernames and emails, set up indexes in MongoDB
-try:
-    users_collection.create_index("username", unique=True)
-    users_collection.create_index("email", unique=True)
-except PyMongoError:
-    pass
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+
+# Connection pool events of one client: open and checked-out connections, requests waiting for a
+# connection, and how long they waited (pymongo calls these from whichever thread checks out)
+class PoolMetrics(monitoring.ConnectionPoolListener):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.max_checked_out = 0
+        self.max_waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = {}  # reason -> count
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+        self.pools_cleared = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started_at = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def connection_check_out_failed(self, event):
+        reason = str(getattr(event, "reason", "unknown"))
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        started_at = getattr(self._local, "started_at", None)
+        waited = time.perf_counter() - started_at if started_at is not None else 0.0
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.wait_seconds_total += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                "max_checked_out": self.max_checked_out,
+                "max_waiting": self.max_waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "avg_wait_ms": round(1000 * self.wait_seconds_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 3),
+                "pools_cleared": self.pools_cleared,
+            }
+
+
+def client_options(listener):
+    write_concern = config.MONGO_WRITE_CONCERN
+    options = {
+        "minPoolSize": config.MONGO_MIN_POOL_SIZE,
+        "maxPoolSize": config.MONGO_MAX_POOL_SIZE,
+        "maxIdleTimeMS": config.MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": config.MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": config.MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "w": int(write_concern) if write_concern.isdigit() else write_concern,
+        "event_listeners": [listener],
+    }
+    if config.MONGO_JOURNAL:
+        options["journal"] = True
+    return options
+
+
+# MongoDB clients of the process: the async client for request handlers, opened by the app lifespan
+# (or on first use, e.g. in scripts), and a sync client for code running in worker threads
+class Database:
+
+    def __init__(self):
+        self.client = None
+        self.sync_client = None
+        self.pool_metrics = PoolMetrics()
+        self.sync_pool_metrics = PoolMetrics()
+        self._lock = threading.Lock()
+
+    # client: an already configured client, e.g. mongomock_motor's for tests and benchmarks
+    def connect(self, client=None):
+        with self._lock:
+            if self.client is None:
+                self.client = client or AsyncIOMotorClient(config.MONGO_URI, **client_options(self.pool_metrics))
+            return self.client
+
+    @property
+    def db(self):
+        return self.connect()[config.DATABASE_NAME]
+
+    @property
+    def users(self):
+        return self.db["users"]
+
+    @property
+    def exams(self):
+        return self.db["exams"]
+
+    @property
+    def question_bank(self):
+        return self.db["question_bank"]
+
+    def sync_database(self):
+        with self._lock:
+            if self.sync_client is None:
+                self.sync_client = MongoClient(config.MONGO_URI, **client_options(self.sync_pool_metrics))
+        return self.sync_client[config.DATABASE_NAME]
+
+    # Unique usernames and emails, question bank lookups, and the exam history, which is listed per
+    # user, newest first ((created_at, _id) is the pagination cursor)
+    async def ensure_indexes(self):
+        await self.users.create_index("username", unique=True)
+        await self.users.create_index("email", unique=True)
+        await self.question_bank.create_index([("chunk_hash", 1), ("question_type", 1), ("difficulty", 1)])
+        await self.exams.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+        await self.exams.create_index([("class_id", 1), ("created_by", 1)], sparse=True)
+
+    # Called by the app lifespan; an unreachable server doesn't stop the app (requests will fail fast
+    # after MONGO_SERVER_SELECTION_TIMEOUT_MS, and /health/db reports it)
+    async def start(self, client=None):
+        self.connect(client)
+        try:
+            await self.ensure_indexes()
+        except PyMongoError as e:
+            logger.error("Could not create MongoDB indexes: %s", e)
+
+    def close(self):
+        with self._lock:
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+            if self.sync_client is not None:
+                self.sync_client.close()
+                self.sync_client = None
+
+    async def ping(self):
+        try:
+            await self.db.command("ping")
+            return True
+        except PyMongoError:
+            return False
+
+    def stats(self):
+        return {
+            "async_pool": self.pool_metrics.stats(),
+            "sync_pool": self.sync_pool_metrics.stats(),
+            "max_pool_size": config.MONGO_MAX_POOL_SIZE,
+        }
+
+
+database = Database()
+
+
+# Database for code running in worker threads (exam pipeline, caches, scripts)
+def get_sync_database():
+    return database.sync_database()
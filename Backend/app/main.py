@@ -1,10 +1,66 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from app import config
 from app.routers import exam
 from app.routers import auth
+from app.routers import health
+from app.routers import ingest
+from app.routers import metrics as metrics_router
+from app.services.model_registry import model_registry
+from app.services.generation_pool import generation_pool
+from app.services.grading_jobs import grading_job_manager
+from app.services.coalescing import coalescing_stats
+from app.services.retrieval_cache import retrieval_cache
+from app.services.llm_client import llm_client
+from app.utils.auth_utils import password_executor
+from app.utils.jwt_utils import user_cache
+from app.utils.telemetry import configure_logging, metrics
+from app.database import database
 
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Question Generation API")
+configure_logging()
+
+# Gauges read from the components' own stats at each scrape: executor and LLM queue depths, cache
+# hit rates, MongoDB pool usage
+metrics.add_source("generation_pool", generation_pool.stats)
+metrics.add_source("coalescing", coalescing_stats)
+metrics.add_source("grading", grading_job_manager.stats)
+metrics.add_source("llm", llm_client.stats)
+metrics.add_source("user_cache", user_cache.stats)
+metrics.add_source("mongo", database.stats)
+if retrieval_cache:
+    metrics.add_source("retrieval_cache", retrieval_cache.stats)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the MongoDB pool and create the indexes before serving
+    await database.start()
+
+    # Load the models and the FAISS index concurrently, without holding up auth traffic
+    loading = None
+    if config.MODEL_LOADING == "startup":
+        await asyncio.to_thread(model_registry.load_all)
+    elif config.MODEL_LOADING == "background":
+        loading = asyncio.create_task(asyncio.to_thread(model_registry.load_all))
+
+    yield
+
+    if loading:
+        loading.cancel()
+    # Stop the exam generation, grading and password hashing workers, close LLM and MongoDB connections (the
+    # question bank's included) and persist the retrieval cache on shutdown
+    generation_pool.shutdown()
+    grading_job_manager.shutdown()
+    password_executor.shutdown(wait=False)
+    llm_client.close()
+    if retrieval_cache:
+        retrieval_cache.close()
+    database.close()
+
+
+app = FastAPI(title="Question Generation API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,3 +73,6 @@ app.add_middleware(
 # Include routers
 app.include_router(exam.router, prefix="/Exam", tags=["Questions"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
+app.include_router(health.router, prefix="/health", tags=["health"])
+app.include_router(ingest.router, prefix="/Ingest", tags=["ingestion"])
+app.include_router(metrics_router.router, tags=["metrics"])
@@ -1,24 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
+from app import config
 from app.schemas.user import UserCreate, UserLogin, UserResponse
-from app.utils.auth_utils import hash_password, verify_password
-from app.utils.jwt_utils import create_access_token, get_current_user
+from app.utils.auth_utils import ahash_password, averify_password
+from app.utils.jwt_utils import create_access_token, get_current_user, invalidate_user
+from app.utils.rate_limit import TokenBucketLimiter
 from pymongo.errors import DuplicateKeyError
-from app.database import users_collection
+from app.database import database
 
 router = APIRouter()
 
+# Login attempts allowed per username and per client IP
+login_user_limiter = TokenBucketLimiter(config.LOGIN_RATE_USER_BURST, config.LOGIN_RATE_USER_PER_MINUTE)
+login_ip_limiter = TokenBucketLimiter(config.LOGIN_RATE_IP_BURST, config.LOGIN_RATE_IP_PER_MINUTE)
+
+
+def check_rate_limit(limiter, key):
+    allowed, retry_after = limiter.acquire(key)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, please retry later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def client_ip(request: Request):
+    return request.client.host if request.client else "unknown"
+
+
 # Signup endpoint
 @router.post("/signup", response_model=UserResponse)
-async def signup(user: UserCreate):
+async def signup(user: UserCreate, request: Request):
+    check_rate_limit(login_ip_limiter, client_ip(request))
     try:
-        hashed_password = hash_password(user.password)
+        hashed_password = await ahash_password(user.password)
         new_user = {
             "username": user.username,
             "email": user.email,
             "hashed_password": hashed_password,
         }
-        await users_collection.insert_one(new_user)
+        await database.users.insert_one(new_user)
         return UserResponse(username=user.username, email=user.email)
     except DuplicateKeyError:
         raise HTTPException(
@@ -27,14 +49,24 @@ async def signup(user: UserCreate):
 
 # Login endpoint
 @router.post("/login")
-async def login(user: UserLogin):
-    stored_user = await users_collection.find_one({"username": user.username})
+async def login(user: UserLogin, request: Request):
+    # Rejected attempts cost neither a database lookup nor a bcrypt verification
+    check_rate_limit(login_ip_limiter, client_ip(request))
+    check_rate_limit(login_user_limiter, user.username)
+
+    stored_user = await database.users.find_one({"username": user.username})
     if not stored_user:
         raise HTTPException(status_code=404, detail="User not found.")
 
-    if not verify_password(user.password, stored_user["hashed_password"]):
+    valid, new_hash = await averify_password(user.password, stored_user["hashed_password"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid password.")
 
-    token = create_access_token({"sub": stored_user["username"]})
-    return {"access_token": token, "token_type": "bearer"}
+    # Hash made with outdated parameters (e.g. fewer bcrypt rounds): replace it while we have the password
+    if new_hash:
+        await database.users.update_one({"_id": stored_user["_id"]}, {"$set": {"hashed_password": new_hash}})
+        invalidate_user(stored_user["_id"])
 
+    login_user_limiter.reset(user.username)
+    token = create_access_token({"sub": stored_user["username"], "uid": str(stored_user["_id"])})
+    return {"access_token": token, "token_type": "bearer"}
@@ -1,41 +1,49 @@
+import base64
+import json
+import logging
+from typing import Optional
 from bson import ObjectId
-from app.schemas.request import QuestionRequest
+from app import config
+from app.schemas.request import AnswerSubmission, ClassAnswersRequest, ClassExamRequest, QuestionRequest
 from app.schemas.response import QuestionResponse
 from app.services.piepeline import exam_pipeline
-from langchain_ollama import OllamaLLM
-from app.utils.faiss_utils import load_faiss_index
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from app.services.class_exams import class_exam_documents, class_pool_size
+from app.services.coalescing import coalescing_stats, exam_flight
+from app.services.generation_pool import generation_pool, PoolSaturatedError
+from app.services.exam_jobs import exam_job_manager, format_sse
+from app.services.grading_jobs import grading_job_manager
+from app.services.retrieval_cache import retrieval_cache, normalize_query
+from app.services.llm_client import llm_client
+from app.services.model_registry import model_registry
+from app.services.index_store import index_store
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from pymongo import UpdateOne
 from datetime import datetime
 from app.utils.jwt_utils import get_current_user
-import os
-from app.database import exams_collection
+from app.utils.telemetry import stage
+from app.database import database
 
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
-base_dir = os.path.dirname(os.path.abspath(__file__))  # Current script directory
-vectorstore_path = os.path.join(base_dir, "vector_database")
+# The FAISS index and the models are loaded by the model registry (app/services/model_registry.py),
+# in the background at startup or on first use; index_store switches to newly ingested index versions
+ollama_model = llm_client  # Pooled, load-balanced client with the OllamaLLM.invoke() interface
 
-# Load the FAISS vector database
-# save_path = "vector_database"
-
-# Load FAISS index and Ollama model
-faiss_index = load_faiss_index(vectorstore_path)
-ollama_model = OllamaLLM(model="llama3.2")
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
-
-@router.post("/generate-exam", response_model=QuestionResponse)
-async def generate_exam(request: QuestionRequest, token: str = Depends(oauth2_scheme)):
-    try:
-        # Generate the exam
-        exam = exam_pipeline(
+# Generate an exam in the bounded worker pool, off the event loop. Identical requests (same query,
+# type, size and difficulty, same index version) arriving while one is running wait for it and
+# share its questions instead of taking their own pool slot and LLM calls.
+async def generate_shared_exam(request, question_nbr, faiss_index):
+    async def generate():
+        return await generation_pool.run(
+            exam_pipeline,
             query=request.query,
             question_type=request.question_type,
-            question_nbr=request.question_nbr,
+            question_nbr=question_nbr,
             faiss_index=faiss_index,
             ollama_model=ollama_model,
             difficulty=request.difficulty,
@@ -43,65 +51,415 @@ async def generate_exam(request: QuestionRequest, token: str = Depends(oauth2_sc
             top_n=10  # Re-ranked documents
         )
 
-        # Extract user from the token
-        user = await get_current_user(token)
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid token")
+    if not config.COALESCING_ENABLED:
+        return await generate()
+    key = (normalize_query(request.query), request.question_type.lower(), question_nbr, request.difficulty, id(faiss_index))
+    return await exam_flight.do(key, generate)
+
+
+@router.post("/generate-exam", response_model=QuestionResponse)
+async def generate_exam(request: QuestionRequest, user: dict = Depends(get_current_user)):
+    try:
+        faiss_index = await index_store.get_index(model_registry)
+        exam = await generate_shared_exam(request, request.question_nbr, faiss_index)
+        questions = exam.get("questions", [])
+        if not questions:
+            raise HTTPException(status_code=422, detail="No questions could be generated for this query")
 
         # Save the generated exam
         exam_data = {
             "query": request.query,
             "answers": {},  # No answers at generation time
-            "questions": exam["questions"],
+            "questions": questions,
             "user_id": user["_id"],
             "created_at": datetime.utcnow(),
         }
-        await exams_collection.insert_one(exam_data)
+        with stage("mongo_insert"):
+            result = await database.exams.insert_one(exam_data)
 
-        return {"questions": exam["questions"]}
+        return {"questions": questions, "exam_id": str(result.inserted_id)}
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many exams are being generated, please retry later.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/exam_history")
-async def get_exam_history(token: str = Depends(oauth2_scheme)):
-    user = await get_current_user(token)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
+# Only the configured teachers may create and grade exams for a class (nobody when none are
+# configured: anyone can sign up)
+async def get_teacher(user: dict = Depends(get_current_user)):
+    if user["username"] not in config.CLASS_EXAM_TEACHERS:
+        raise HTTPException(status_code=403, detail="Not allowed to create class exams")
+    return user
+
+
+# Exams for a whole class: one shared pool of questions is generated (LLM cost follows the pool
+# size, not the class size), then every student gets their own draw and order of questions and
+# MCQ options. All exams are written with a single insert_many.
+@router.post("/class-exams", status_code=201)
+async def create_class_exams(request: ClassExamRequest, teacher: dict = Depends(get_teacher)):
+    usernames = list(dict.fromkeys(request.students))
+    if not usernames:
+        raise HTTPException(status_code=400, detail="No students given")
+    if len(usernames) > config.CLASS_EXAM_MAX_STUDENTS:
+        raise HTTPException(status_code=400, detail=f"At most {config.CLASS_EXAM_MAX_STUDENTS} students per class")
+
+    students = await database.users.find({"username": {"$in": usernames}}, {"username": 1}).to_list(length=len(usernames))
+    found = {student["username"] for student in students}
+    missing = [username for username in usernames if username not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Unknown students", "missing_students": missing})
+
     try:
-        # Fetch exams for the authenticated user
-        exams = await exams_collection.find({"user_id": user["_id"]}).to_list(length=100)
+        faiss_index = await index_store.get_index(model_registry)
+        exam = await generate_shared_exam(request, class_pool_size(request.question_nbr, request.pool_size), faiss_index)
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many exams are being generated, please retry later.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    pool = exam.get("questions", [])
+    if not pool:
+        raise HTTPException(status_code=422, detail="No questions could be generated for this query")
+
+    class_id = ObjectId()
+    documents = class_exam_documents(pool, request, students, class_id, teacher["_id"])
+    with stage("mongo_insert", documents=len(documents)):
+        await database.exams.insert_many(documents, ordered=False)
+
+    return {
+        "class_id": str(class_id),
+        "pool_size": len(pool),
+        "exams": [
+            {"username": student["username"], "exam_id": str(document["_id"])}
+            for student, document in zip(students, documents)
+        ],
+    }
+
+
+QUESTION_COUNT_PROJECTION = {"class_id": 1, "question_count": {"$size": {"$ifNull": ["$questions", []]}}}
+
 
-        # Convert ObjectId and ensure all fields are JSON serializable
-        def serialize_exam(exam):
-            exam["_id"] = str(exam["_id"])  # Convert _id to string
-            exam["user_id"] = str(exam["user_id"])  # Convert user_id to string
-            exam["created_at"] = exam["created_at"].isoformat()  # ISO format for datetime
-            return exam
+# Answers are keyed by question index ("0", "1", ...), within the exam's questions
+def check_answers(answers, question_count):
+    unknown = [key for key in answers if not key.isdigit() or int(key) >= question_count]
+    if unknown:
+        raise HTTPException(status_code=400, detail={"message": "Unknown questions", "questions": unknown})
 
-        serialized_exams = [serialize_exam(exam) for exam in exams]
 
-        return {"exams": serialized_exams}
+def parse_object_id(value, detail):
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=404, detail=detail)
+    return ObjectId(value)
+
+
+# Submit the answers to one of the user's exams and queue its grading. Class exams take one
+# submission; the user's own practice exams can be answered (and graded) again.
+@router.post("/exams/{exam_id}/answers", status_code=202)
+async def submit_answers(exam_id: str, submission: AnswerSubmission, user: dict = Depends(get_current_user)):
+    exam_id = parse_object_id(exam_id, "Exam not found")
+    exam = await database.exams.find_one({"_id": exam_id, "user_id": user["_id"]}, QUESTION_COUNT_PROJECTION)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    check_answers(submission.answers, exam["question_count"])
+
+    query = {"_id": exam_id}
+    if exam.get("class_id"):
+        query["submitted_at"] = {"$exists": False}
+    result = await database.exams.update_one(
+        query, {"$set": {"answers": submission.answers, "submitted_at": datetime.utcnow()}}
+    )
+    if not result.matched_count:
+        raise HTTPException(status_code=409, detail="Answers already submitted")
+
+    job = await grading_job_manager.submit([exam_id], user, ollama_model)
+    return {"job_id": job.id, "status": job.status}
+
+
+# Exams of a class created by this teacher
+def class_exams_query(class_id, teacher):
+    return {"class_id": parse_object_id(class_id, "Class not found"), "created_by": teacher["_id"]}
+
+
+# Submit the answers of many students at once (e.g. collected on paper): written with one
+# bulk_write, then graded together in one background job
+@router.post("/class-exams/{class_id}/submissions", status_code=202)
+async def submit_class_answers(class_id: str, request: ClassAnswersRequest, teacher: dict = Depends(get_teacher)):
+    submissions = {submission.exam_id: submission.answers for submission in request.submissions}
+    if not submissions:
+        raise HTTPException(status_code=400, detail="No submissions given")
+    if len(submissions) > config.CLASS_EXAM_MAX_STUDENTS:
+        raise HTTPException(status_code=400, detail=f"At most {config.CLASS_EXAM_MAX_STUDENTS} submissions at once")
+
+    query = class_exams_query(class_id, teacher)
+    exam_ids = [ObjectId(exam_id) for exam_id in submissions if ObjectId.is_valid(exam_id)]
+    exams = await database.exams.find({**query, "_id": {"$in": exam_ids}}, QUESTION_COUNT_PROJECTION) \
+        .to_list(length=len(exam_ids))
+    found = {str(exam["_id"]): exam for exam in exams}
+    missing = [exam_id for exam_id in submissions if exam_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Unknown exams", "missing_exams": missing})
+    for exam_id, answers in submissions.items():
+        check_answers(answers, found[exam_id]["question_count"])
+
+    submitted_at = datetime.utcnow()
+    operations = [
+        UpdateOne({"_id": exam["_id"]}, {"$set": {"answers": submissions[str(exam["_id"])], "submitted_at": submitted_at}})
+        for exam in exams
+    ]
+    with stage("mongo_bulk_write", documents=len(operations)):
+        await database.exams.bulk_write(operations, ordered=False)
+
+    job = await grading_job_manager.submit([exam["_id"] for exam in exams], teacher, ollama_model)
+    return {"job_id": job.id, "status": job.status, "submitted": len(operations)}
+
+
+# Grade (again) every submitted exam of a class, e.g. after changing the grading thresholds
+@router.post("/class-exams/{class_id}/grade", status_code=202)
+async def grade_class_exams(class_id: str, teacher: dict = Depends(get_teacher)):
+    query = {**class_exams_query(class_id, teacher), "submitted_at": {"$exists": True}}
+    exams = await database.exams.find(query, {"_id": 1}).to_list(length=None)
+    if not exams:
+        raise HTTPException(status_code=404, detail="No submitted exams in this class")
+
+    job = await grading_job_manager.submit([exam["_id"] for exam in exams], teacher, ollama_model)
+    return {"job_id": job.id, "status": job.status, "exams": len(exams)}
+
+
+# Progress of a grading job while it is recent; the grades themselves are stored in the exams
+@router.get("/grading-jobs/{job_id}")
+async def get_grading_job(job_id: str, user: dict = Depends(get_current_user)):
+    job = grading_job_manager.get(job_id)
+    if not job or job.user_id != user["_id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+
+# Grade of every student of a class
+@router.get("/class-exams/{class_id}/results")
+async def get_class_results(class_id: str, teacher: dict = Depends(get_teacher)):
+    exams = await database.exams.find(
+        class_exams_query(class_id, teacher),
+        {"user_id": 1, "submitted_at": 1, "grading_status": 1, "grading.score": 1,
+         "grading.max_score": 1, "grading.percentage": 1, "grading.needs_review": 1},
+    ).to_list(length=None)
+    if not exams:
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    users = await database.users.find(
+        {"_id": {"$in": [exam["user_id"] for exam in exams]}}, {"username": 1}
+    ).to_list(length=len(exams))
+    usernames = {user["_id"]: user["username"] for user in users}
+    results = [
+        {
+            "username": usernames.get(exam["user_id"]),
+            "exam_id": str(exam["_id"]),
+            "submitted": "submitted_at" in exam,
+            "grading_status": exam.get("grading_status"),
+            **exam.get("grading", {}),
+        }
+        for exam in exams
+    ]
+    return {"class_id": class_id, "results": sorted(results, key=lambda result: result["username"] or "")}
+
+
+# Submit an exam for background generation; questions can then be polled or streamed
+@router.post("/exam-jobs", status_code=202)
+async def create_exam_job(request: QuestionRequest, user: dict = Depends(get_current_user)):
+    try:
+        faiss_index = await index_store.get_index(model_registry)
+        job = await exam_job_manager.submit(request, user, faiss_index, ollama_model, k=25, top_n=10)
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many exams are being generated, please retry later.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    return {"job_id": job.id, "status": job.status}
+
+
+# Status of a job, served from memory while it is recent and from the stored exam otherwise.
+# Class exams never come from a job (and would give their answers away): they are served by get_exam.
+async def get_job_snapshot(job_id, user):
+    job = exam_job_manager.get(job_id)
+    if job and job.user_id == user["_id"]:
+        return job, job.snapshot()
+
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    exam = await database.exams.find_one(
+        {"_id": ObjectId(job_id), "user_id": user["_id"], "class_id": {"$exists": False}}
+    )
+    if not exam:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return None, {
+        "job_id": job_id,
+        "status": exam.get("status", "completed"),
+        "question_nbr": exam.get("question_nbr", len(exam["questions"])),
+        "completed_questions": len(exam["questions"]),
+        "questions": exam["questions"],
+        "error": exam.get("error"),
+    }
+
+
+@router.get("/exam-jobs/{job_id}")
+async def get_exam_job(job_id: str, user: dict = Depends(get_current_user)):
+    _, snapshot = await get_job_snapshot(job_id, user)
+    return snapshot
+
+
+# Server-Sent Events stream: one "question" event per generated question, then a final "status" event
+@router.get("/exam-jobs/{job_id}/events")
+async def stream_exam_job(job_id: str, user: dict = Depends(get_current_user)):
+    job, snapshot = await get_job_snapshot(job_id, user)
+
+    async def stream():
+        if job:
+            async for event, data in job.events():
+                yield format_sse(event, data)
+        else:
+            for index, question in enumerate(snapshot["questions"]):
+                yield format_sse("question", {"index": index, "question": question})
+            yield format_sse("status", {"status": snapshot["status"], "error": snapshot["error"]})
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/generation-stats")
+async def get_generation_stats():
+    # Queue wait time and active/queued job counts of the generation pool, and work shared by coalescing
+    return {**generation_pool.stats(), "coalescing": coalescing_stats()}
+
+
+@router.get("/llm-stats")
+async def get_llm_stats():
+    # In-flight requests, latency and token counts per Ollama server
+    return llm_client.stats()
+
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    # Hit/miss counters of the retrieval + re-rank cache
+    return retrieval_cache.stats() if retrieval_cache else {"enabled": False}
+
+
+# Fields of an exam in the history list: no questions (raw LLM output, source chunks), just their count
+EXAM_SUMMARY_PROJECTION = {
+    "query": 1,
+    "status": 1,
+    "created_at": 1,
+    "question_count": {"$size": {"$ifNull": ["$questions", []]}},
+    "grading_status": 1,
+    "score": "$grading.percentage",
+}
+EXAM_TITLE_LENGTH = 80
+
+
+def exam_title(query):
+    lines = (query or "").strip().splitlines()
+    title = lines[0] if lines else "Examen"
+    return title if len(title) <= EXAM_TITLE_LENGTH else title[:EXAM_TITLE_LENGTH - 1].rstrip() + "…"
+
+
+# The pagination cursor is the (created_at, _id) of the last exam of a page, opaque to the client
+def encode_history_cursor(exam):
+    raw = json.dumps([exam["created_at"].isoformat(), str(exam["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_history_cursor(cursor):
+    try:
+        created_at, exam_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), ObjectId(exam_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def serialize_exam(exam):
+    exam["_id"] = str(exam["_id"])
+    for field in ("user_id", "class_id", "created_by"):
+        if field in exam:
+            exam[field] = str(exam[field])
+    exam["created_at"] = exam["created_at"].isoformat()
+    return exam
+
+
+# One page of the user's exams, newest first; served by the (user_id, created_at, _id) index
+@router.get("/exam_history")
+async def get_exam_history(
+    limit: int = Query(config.EXAM_HISTORY_PAGE_SIZE, ge=1, le=config.EXAM_HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user: dict = Depends(get_current_user),
+):
+    query = {"user_id": user["_id"]}
+    if cursor:
+        created_at, exam_id = decode_history_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": exam_id}},
+        ]
+
+    try:
+        # One extra exam tells whether there is a next page
+        exams = await database.exams.find(query, EXAM_SUMMARY_PROJECTION) \
+            .sort([("created_at", -1), ("_id", -1)]) \
+            .limit(limit + 1) \
+            .to_list(length=limit + 1)
     except Exception as e:
-        print(f"Error fetching exams: {str(e)}")
+        logger.exception("Error fetching exam history")
         raise HTTPException(status_code=500, detail=f"Error fetching exam history: {str(e)}")
 
+    next_cursor = encode_history_cursor(exams[limit - 1]) if len(exams) > limit else None
+    summaries = []
+    for exam in exams[:limit]:
+        exam["title"] = exam_title(exam.get("query"))
+        summaries.append(serialize_exam(exam))
+    return {"exams": summaries, "next_cursor": next_cursor}
+
+
+# Class exams are served to the student without the answers (correct option or reference answer,
+# and the explanation, which gives it away) until they are graded
+def hide_answers(exam):
+    if exam.get("class_id") and not exam.get("grading"):
+        exam["questions"] = [
+            {key: value for key, value in question.items() if key not in ("correct_answer", "explanation")}
+            for question in exam.get("questions", [])
+        ]
+    return exam
+
+
+# Full exam (questions included), for display
+@router.get("/exams/{exam_id}")
+async def get_exam(exam_id: str, user: dict = Depends(get_current_user)):
+    if not ObjectId.is_valid(exam_id):
+        raise HTTPException(status_code=404, detail="Exam not found")
+    exam = await database.exams.find_one({"_id": ObjectId(exam_id), "user_id": user["_id"]})
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    exam["title"] = exam_title(exam.get("query"))
+    return serialize_exam(hide_answers(exam))
+
 @router.delete("/delete-exam/{exam_id}")
-async def delete_exam(exam_id: str, token: str = Depends(oauth2_scheme)):
-    user = await get_current_user(token)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
+async def delete_exam(exam_id: str, user: dict = Depends(get_current_user)):
+    if not ObjectId.is_valid(exam_id):
+        raise HTTPException(status_code=404, detail="Exam not found")
     try:
-        # Find the exam by ID
-        exam = await exams_collection.find_one({"_id": ObjectId(exam_id), "user_id": user["_id"]})
-        if not exam:
-            raise HTTPException(status_code=404, detail="Exam not found")
-
-        # Delete the exam
-        await exams_collection.delete_one({"_id": ObjectId(exam_id)})
-        
-        return {"message": "Exam deleted successfully"}
+        # Delete only the user's own exam, without loading it first
+        result = await database.exams.delete_one({"_id": ObjectId(exam_id), "user_id": user["_id"]})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting exam: {str(e)}")
+    if not result.deleted_count:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    return {"message": "Exam deleted successfully"}
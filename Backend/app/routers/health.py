@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.database import database
+from app.services.model_registry import model_registry
+
+router = APIRouter()
+
+# Liveness: the process is up and serving requests (auth works before models are loaded)
+@router.get("/live")
+async def live():
+    return {"status": "alive"}
+
+# Readiness: models and index are loaded, exams can be generated
+@router.get("/ready")
+async def ready():
+    ready = model_registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "loading", "resources": model_registry.status()},
+    )
+
+# MongoDB reachability and connection pool metrics (open, checked out, waiting, wait times)
+@router.get("/db")
+async def db():
+    reachable = await database.ping()
+    return JSONResponse(
+        status_code=200 if reachable else 503,
+        content={"status": "up" if reachable else "down", **database.stats()},
+    )
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from app import config
+from app.services.ingestion import corpus_ingestor
+from app.utils.jwt_utils import get_current_user
+
+router = APIRouter()
+
+ALLOWED_EXTENSIONS = (".pdf", ".txt", ".md")
+
+
+# Only the configured admins may change the corpus (nobody when none are configured: anyone can sign up)
+async def get_corpus_admin(user: dict = Depends(get_current_user)):
+    if user["username"] not in config.INGEST_ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Not allowed to change the course material")
+    return user
+
+
+# Add PDF/text files to the index; each file is a document (doc_id only applies to a single file)
+@router.post("/documents")
+async def ingest_documents(
+    files: List[UploadFile] = File(...),
+    doc_id: Optional[str] = Form(None),
+    replace: bool = Form(False),
+    user=Depends(get_corpus_admin),
+):
+    if doc_id and len(files) > 1:
+        raise HTTPException(status_code=400, detail="doc_id can only be given for a single file")
+    doc_ids = {}
+    for upload in files:
+        if not upload.filename.lower().endswith(ALLOWED_EXTENSIONS):
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {upload.filename}")
+        # Files are spooled under their name and each one is a document: "cours.pdf" twice, or
+        # "cours.pdf" and "cours.md", would overwrite each other
+        name = os.path.basename(upload.filename)
+        key = doc_id or os.path.splitext(name)[0]
+        if key in doc_ids:
+            raise HTTPException(
+                status_code=400, detail=f"{name} and {doc_ids[key]} would both be document '{key}'"
+            )
+        doc_ids[key] = name
+
+    # Spool the uploads to disk, then chunk and embed them off the event loop
+    upload_dir = tempfile.mkdtemp(prefix="ingest-")
+    try:
+        paths = {}
+        for upload, (key, name) in zip(files, doc_ids.items()):
+            path = os.path.join(upload_dir, name)
+            with open(path, "wb") as f:
+                shutil.copyfileobj(upload.file, f)
+            paths[path] = key
+
+        return await asyncio.to_thread(corpus_ingestor.ingest_files, paths, replace)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error ingesting documents: {str(e)}")
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+
+# Remove every chunk of a document from the index
+@router.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str, user=Depends(get_corpus_admin)):
+    result = await asyncio.to_thread(corpus_ingestor.delete_document, doc_id)
+    if not result["deleted"]:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return result
+
+
+@router.get("/documents")
+async def list_documents(user=Depends(get_corpus_admin)):
+    return await asyncio.to_thread(corpus_ingestor.list_documents)
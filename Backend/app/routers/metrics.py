@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.utils.telemetry import metrics
+
+router = APIRouter()
+
+
+# Prometheus scrape endpoint: stage timings, LLM token counts, cache hit rates, queue depths
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,11 +1,14 @@
 # schemas/exam.py
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class Question(BaseModel):
+    type: str  # "mcq" or "open-ended"
     question_text: str
-    options: Optional[List[str]] = None
-    correct_answer: Optional[str] = None
+    options: Optional[Dict[str, str]] = None  # {"A": ..., "B": ..., "C": ..., "D": ...} for MCQs
+    correct_answer: Optional[str] = None  # Option letter for MCQs, reference answer otherwise
+    explanation: Optional[str] = None
+    source: Optional[str] = None  # Chunk the question was generated from
 
 class Exam(BaseModel):
     user_id: str
@@ -1,3 +1,4 @@
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 class QuestionRequest(BaseModel):
@@ -5,3 +6,16 @@ class QuestionRequest(BaseModel):
     question_type: str  # "mcq" or "open-ended"
     question_nbr: int
     difficulty: str  # "beginner", "intermediate", or "advanced"
+
+class ClassExamRequest(QuestionRequest):
+    students: List[str]  # Usernames; each gets their own exam
+    pool_size: Optional[int] = None  # Questions generated for the whole class (default: see CLASS_EXAM_POOL_FACTOR)
+
+class AnswerSubmission(BaseModel):
+    answers: Dict[str, str]  # Question index ("0", "1", ...) -> option letter (MCQ) or written answer
+
+class ExamAnswers(AnswerSubmission):
+    exam_id: str
+
+class ClassAnswersRequest(BaseModel):
+    submissions: List[ExamAnswers]  # Answers of several students' exams, e.g. collected on paper
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class QuestionResponse(BaseModel):
-    questions: List[Dict]
\ No newline at end of file
+    questions: List[Dict]
+    exam_id: Optional[str] = None  # To submit answers for grading
@@ -0,0 +1,52 @@
+"""
+Convert the served FAISS index to another index type and publish it as a new index version.
+
+Vectors are taken from the current index (no re-embedding) and FAISS ids are kept, so the docstore
+and chunk metadata are reused as they are. Running API workers switch to the new version within
+INDEX_RELOAD_CHECK_SECONDS; search-time parameters are FAISS_NPROBE and FAISS_EF_SEARCH.
+
+Run from the Backend directory, e.g.:
+    python -m app.scripts.build_ann_index --type hnsw --hnsw-m 32 --ef-construction 200
+    python -m app.scripts.build_ann_index --type ivf-pq --nlist 4096 --pq-m 64
+    python -m app.scripts.build_ann_index --type flat   # back to exact search
+
+Compare the types on synthetic corpora first with benchmarks/bench_ann.py.
+"""
+import argparse
+import time
+from app.services.ann_index import INDEX_TYPES, convert_index, index_type
+from app.services.index_store import index_store
+from app.services.model_registry import model_registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--type", required=True, choices=INDEX_TYPES)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: ~4 * sqrt(n))")
+    parser.add_argument("--pq-m", type=int, default=64, help="IVF-PQ sub-quantizers (must divide 768)")
+    parser.add_argument("--pq-bits", type=int, default=8)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    args = parser.parse_args()
+
+    embedding_model = model_registry.get("embedding_model")
+    with index_store.writer_lock():
+        faiss_index = index_store.load_editable(embedding_model)
+        source_type = index_type(faiss_index.index)
+        print(f"Converting {faiss_index.index.ntotal} vectors from {source_type} to {args.type}...")
+        if source_type == "ivf-pq":
+            print("Warning: IVF-PQ only stores compressed vectors; rebuild from the documents for exact ones.")
+
+        started_at = time.perf_counter()
+        converted = convert_index(
+            faiss_index, args.type, nlist=args.nlist, pq_m=args.pq_m, pq_bits=args.pq_bits,
+            hnsw_m=args.hnsw_m, ef_construction=args.ef_construction,
+        )
+        print(f"Built in {time.perf_counter() - started_at:.1f} s.")
+
+        version = index_store.publish(converted)
+    print(f"Published index version {version}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Check the ONNX Runtime inference backend (INFERENCE_BACKEND=onnx) against the PyTorch FP32 models
+before switching to it: retrieval recall@k of the query embedder on the served FAISS index, re-rank
+order of the re-ranker on the same candidates, embedding agreement on served chunks, latency and
+resident memory. Each backend runs in its own process so their memory is measured separately.
+Exits with status 1 when recall or re-rank agreement falls below the thresholds.
+
+Run from the Backend directory (the first run exports and quantizes the models into ONNX_MODEL_DIR):
+    python -m app.scripts.check_onnx_backend --reranker nli --k 25 --top-n 5
+    ONNX_INTRA_OP_THREADS=4 python -m app.scripts.check_onnx_backend --output onnx_check.json
+    ONNX_QUANTIZE=0 python -m app.scripts.check_onnx_backend   # FP32 export, to isolate the quantization error
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from app import config
+from app.services.reranker import CrossEncoderReRanker, NLIReRanker
+from app.services.retrieval import documents_at, search_eligible
+from app.utils.faiss_utils import embedding_model_name, load_embedding_model, load_faiss_index, resolve_index_path
+
+QUERIES = [
+    "les jointures en SQL",
+    "GROUP BY et HAVING",
+    "les index et les performances",
+    "transactions et atomicité",
+    "normalisation des tables",
+    "sous-requêtes corrélées",
+    "clés primaires et clés étrangères",
+    "les vues en SQL",
+    "fonctions d'agrégation COUNT SUM AVG",
+    "la clause WHERE et les opérateurs de comparaison",
+    "LEFT JOIN et RIGHT JOIN",
+    "contraintes d'intégrité",
+]
+RERANKERS = {
+    NLIReRanker.name: (NLIReRanker, config.NLI_RERANKER_MODEL),
+    CrossEncoderReRanker.name: (CrossEncoderReRanker, config.CROSS_ENCODER_MODEL),
+}
+
+
+# Resident memory of this process in MiB (peak when /proc isn't available)
+def rss_mib():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def timed(fn, *args):
+    started_at = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started_at) * 1000
+
+
+# Embedding model and re-ranker of one backend, loaded directly: no silent fallback to PyTorch here
+def load_backend(backend, reranker_name):
+    reranker_class, model_name = RERANKERS[reranker_name]
+    if backend == "onnx":
+        from app.services.onnx_inference import ONNX_RERANKERS, OnnxEmbeddings
+        embeddings = OnnxEmbeddings(embedding_model_name)
+        reranker_class = ONNX_RERANKERS[reranker_name]
+    else:
+        embeddings = load_embedding_model("torch")
+    return embeddings, reranker_class(model_name, config.RERANKER_BATCH_SIZE, config.RERANKER_MAX_LENGTH)
+
+
+# Run the queries through one backend (in a child process). Re-ranking scores the candidates given
+# (the baseline's retrieval) so both backends order the same documents.
+def run_backend(backend, reranker_name, queries, k, runs, sample_size, candidates=None):
+    base_rss = rss_mib()
+    (embeddings, reranker), load_ms = timed(load_backend, backend, reranker_name)
+    model_rss = rss_mib() - base_rss
+
+    faiss_index = load_faiss_index(resolve_index_path(config.VECTORSTORE_PATH), embeddings)
+    if faiss_index is None:
+        raise RuntimeError(f"No FAISS index found in {config.VECTORSTORE_PATH}.")
+
+    embeddings.embed_query("warm-up")
+    reranker.score("warm-up", ["warm-up"])
+
+    result = {"backend": backend, "load_ms": load_ms, "model_rss_mib": model_rss}
+    embed_ms, rerank_ms = [], []
+    result["query_vectors"], result["retrieved"], result["scores"] = [], [], []
+    for i, query in enumerate(queries):
+        for _ in range(runs):
+            vector, elapsed = timed(embeddings.embed_query, query)
+            embed_ms.append(elapsed)
+        positions = search_eligible(faiss_index, vector, k)
+        texts = [doc.page_content for doc in documents_at(faiss_index, candidates[i] if candidates else positions)]
+        for _ in range(runs):
+            scores, elapsed = timed(reranker.score, query, texts)
+            rerank_ms.append(elapsed)
+        result["query_vectors"].append(list(vector))
+        result["retrieved"].append(positions)
+        result["scores"].append([float(score) for score in scores])
+
+    # The same chunks for both backends: seeded sample of the docstore
+    positions = sorted(faiss_index.index_to_docstore_id)
+    sample = random.Random(0).sample(positions, min(sample_size, len(positions)))
+    texts = [doc.page_content for doc in documents_at(faiss_index, sample)]
+    result["document_vectors"], documents_ms = timed(embeddings.embed_documents, texts)
+
+    result.update({
+        "embed_query_ms": {"p50": percentile(embed_ms, 50), "p95": percentile(embed_ms, 95)},
+        "rerank_ms": {"p50": percentile(rerank_ms, 50), "p95": percentile(rerank_ms, 95)},
+        "embed_documents_per_second": len(texts) / (documents_ms / 1000) if documents_ms else 0.0,
+        "rss_mib": rss_mib(),
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+    return result
+
+
+def run_in_process(*args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_backend, *args).result()
+
+
+# Kendall rank correlation between two score lists (1 = same order)
+def kendall_tau(a, b):
+    concordant = discordant = 0
+    for i in range(len(a)):
+        for j in range(i + 1, len(a)):
+            sign = (a[i] - a[j]) * (b[i] - b[j])
+            concordant += sign > 0
+            discordant += sign < 0
+    pairs = len(a) * (len(a) - 1) / 2
+    return (concordant - discordant) / pairs if pairs else 1.0
+
+
+# Indexes of the top-n scores, in the order ReRanker.rerank would keep them
+def top_n(scores, n):
+    return sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:n]
+
+
+# Row-wise cosine similarity between two sets of vectors
+def cosines(a, b):
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    if not a.size:
+        return np.ones(0)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def compare(baseline, candidate, top_n_kept):
+    recall = [
+        len(set(expected) & set(found)) / len(expected)
+        for expected, found in zip(baseline["retrieved"], candidate["retrieved"]) if expected
+    ]
+    taus = [kendall_tau(a, b) for a, b in zip(baseline["scores"], candidate["scores"])]
+    overlap = [
+        len(set(top_n(a, top_n_kept)) & set(top_n(b, top_n_kept))) / min(top_n_kept, len(a))
+        for a, b in zip(baseline["scores"], candidate["scores"]) if a
+    ]
+    query_cosines = cosines(baseline["query_vectors"], candidate["query_vectors"])
+    document_cosines = cosines(baseline["document_vectors"], candidate["document_vectors"])
+    return {
+        "recall_at_k": float(np.mean(recall)) if recall else 1.0,
+        "rerank_kendall_tau": float(np.mean(taus)) if taus else 1.0,
+        "rerank_top_n_overlap": float(np.mean(overlap)) if overlap else 1.0,
+        "rerank_top1_agreement": float(np.mean([
+            top_n(a, 1) == top_n(b, 1) for a, b in zip(baseline["scores"], candidate["scores"]) if a
+        ] or [1.0])),
+        "query_cosine_min": float(query_cosines.min()) if query_cosines.size else 1.0,
+        "document_cosine_mean": float(document_cosines.mean()) if document_cosines.size else 1.0,
+        "document_cosine_min": float(document_cosines.min()) if document_cosines.size else 1.0,
+    }
+
+
+def report(baseline, candidate, accuracy, args):
+    print(f"Re-ranker: {args.reranker}, {len(args.queries)} queries, k={args.k}, top_n={args.top_n}, "
+          f"quantized={config.ONNX_QUANTIZE}, intra-op threads={config.ONNX_INTRA_OP_THREADS or 'auto'}")
+    print(f"{'':<28}{'torch':>12}{'onnx':>12}")
+    rows = [
+        ("load (ms)", lambda r: r["load_ms"]),
+        ("models RSS (MiB)", lambda r: r["model_rss_mib"]),
+        ("peak RSS (MiB)", lambda r: r["peak_rss_mib"]),
+        ("embed_query p50 (ms)", lambda r: r["embed_query_ms"]["p50"]),
+        ("embed_query p95 (ms)", lambda r: r["embed_query_ms"]["p95"]),
+        ("rerank p50 (ms)", lambda r: r["rerank_ms"]["p50"]),
+        ("rerank p95 (ms)", lambda r: r["rerank_ms"]["p95"]),
+        ("documents embedded / s", lambda r: r["embed_documents_per_second"]),
+    ]
+    for label, value in rows:
+        print(f"{label:<28}{value(baseline):>12.1f}{value(candidate):>12.1f}")
+    print()
+    for name, value in accuracy.items():
+        print(f"{name:<28}{value:>12.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reranker", default="nli", choices=list(RERANKERS))
+    parser.add_argument("--queries", nargs="+", default=QUERIES)
+    parser.add_argument("--k", type=int, default=25, help="chunks retrieved, then re-ranked, per query")
+    parser.add_argument("--top-n", type=int, default=5, help="re-ranked chunks kept per query")
+    parser.add_argument("--runs", type=int, default=3, help="timed calls per query")
+    parser.add_argument("--sample", type=int, default=256, help="docstore chunks embedded by both backends")
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--min-rank-correlation", type=float, default=0.9, help="mean Kendall tau of re-rank scores")
+    parser.add_argument("--output", help="write the measurements to this JSON file")
+    args = parser.parse_args()
+
+    baseline = run_in_process("torch", args.reranker, args.queries, args.k, args.runs, args.sample)
+    candidate = run_in_process(
+        "onnx", args.reranker, args.queries, args.k, args.runs, args.sample, baseline["retrieved"]
+    )
+    accuracy = compare(baseline, candidate, args.top_n)
+    report(baseline, candidate, accuracy, args)
+
+    if args.output:
+        vectors = ("query_vectors", "document_vectors", "retrieved", "scores")
+        with open(args.output, "w") as f:
+            json.dump({
+                "params": {key: value for key, value in vars(args).items() if key != "output"},
+                "accuracy": accuracy,
+                "backends": [{key: value for key, value in r.items() if key not in vectors} for r in (baseline, candidate)],
+            }, f, indent=2)
+
+    failed = accuracy["recall_at_k"] < args.min_recall or accuracy["rerank_kendall_tau"] < args.min_rank_correlation
+    if failed:
+        print(f"\nBelow the thresholds (recall >= {args.min_recall}, Kendall tau >= {args.min_rank_correlation}).")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Add course material to the FAISS index, or remove it, without rebuilding the index.
+
+Each run publishes a new index version; running API workers switch to it within
+INDEX_RELOAD_CHECK_SECONDS. Run from the Backend directory:
+    python -m app.scripts.ingest_corpus add cours_sql.pdf tp_jointures.pdf
+    python -m app.scripts.ingest_corpus add cours_sql_v2.pdf --doc-id cours_sql --replace
+    python -m app.scripts.ingest_corpus delete cours_sql
+    python -m app.scripts.ingest_corpus list
+"""
+import argparse
+import json
+import os
+from app.services.ingestion import corpus_ingestor, default_doc_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="ingest PDF/text files, one document per file")
+    add.add_argument("paths", nargs="+")
+    add.add_argument("--doc-id", help="document id (single file only; default: file name)")
+    add.add_argument("--replace", action="store_true", help="drop the document's previous chunks first")
+
+    delete = commands.add_parser("delete", help="remove a document's chunks")
+    delete.add_argument("doc_id")
+
+    commands.add_parser("list", help="chunk count per document")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        if args.doc_id and len(args.paths) > 1:
+            parser.error("--doc-id can only be given for a single file")
+        missing = [path for path in args.paths if not os.path.isfile(path)]
+        if missing:
+            parser.error(f"File not found: {', '.join(missing)}")
+        files = {path: args.doc_id or default_doc_id(path) for path in args.paths}
+        result = corpus_ingestor.ingest_files(files, replace=args.replace)
+    elif args.command == "delete":
+        result = corpus_ingestor.delete_document(args.doc_id)
+    else:
+        result = corpus_ingestor.list_documents()
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
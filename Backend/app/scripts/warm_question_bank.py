@@ -0,0 +1,79 @@
+"""
+Pre-generate questions for every usable chunk of the FAISS docstore into the question bank.
+
+Run from the Backend directory, typically in the background:
+    nohup python -m app.scripts.warm_question_bank --variants 3 > warm.log 2>&1 &
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import tqdm
+from app import config
+from app.services.cleaning import filter_irrelevant_chunks, clean_relevant_chunks_for_question_generation
+from app.services.question_bank import create_question_bank
+from app.services.llm_client import llm_client
+from app.services.question_generator import generate_question
+from app.utils.faiss_utils import load_faiss_index, resolve_index_path
+
+
+# All chunks of the docstore that would survive the request-time filtering and cleaning
+def docstore_chunks(faiss_index):
+    documents = list(faiss_index.docstore._dict.values())
+    return clean_relevant_chunks_for_question_generation(filter_irrelevant_chunks(documents), min_chunk_length=30)
+
+
+# Generate the missing variants for each (chunk, question type, difficulty) and store them in the bank.
+# Each one gets its own variant number: identical generations would be coalesced into one LLM call
+# (COALESCING_ENABLED), and the bank would store the same question several times.
+def warm_question_bank(faiss_index, ollama_model, bank, variants, question_types, difficulties, query, workers):
+    tasks = []
+    for content in docstore_chunks(faiss_index):
+        for question_type in question_types:
+            for difficulty in difficulties:
+                banked = bank.count(content, question_type, difficulty)
+                tasks.extend((content, question_type, difficulty, variant) for variant in range(banked, variants))
+
+    print(f"Generating {len(tasks)} questions...")
+
+    def generate(task):
+        content, question_type, difficulty, variant = task
+        question = generate_question(content, query, question_type, ollama_model, difficulty, variant)
+        bank.add([question], difficulty, query)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(generate, task) for task in tasks]
+        for future in tqdm.tqdm(as_completed(futures), total=len(futures), desc="Warming question bank"):
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Question generation failed: {e}")
+
+    print(f"Done: {len(tasks) - failed} questions added, {failed} failed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", type=int, default=3, help="questions to keep per (chunk, type, difficulty)")
+    parser.add_argument("--types", nargs="+", default=["mcq", "open-ended"])
+    parser.add_argument("--difficulties", nargs="+", default=["beginner", "intermediate", "advanced"])
+    parser.add_argument("--query", default="SQL", help="concept the questions should target")
+    parser.add_argument("--workers", type=int, default=config.OLLAMA_MAX_CONCURRENCY, help="concurrent LLM calls")
+    args = parser.parse_args()
+
+    bank = create_question_bank()
+    if not bank:
+        parser.error("The question bank is disabled (QUESTION_BANK_ENABLED=0).")
+
+    faiss_index = load_faiss_index(resolve_index_path(config.VECTORSTORE_PATH))
+    if not faiss_index:
+        parser.error(f"No FAISS index found in {config.VECTORSTORE_PATH}.")
+
+    warm_question_bank(
+        faiss_index, llm_client, bank, args.variants,
+        args.types, args.difficulties, args.query, args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import math
+import faiss
+import numpy as np
+from langchain.vectorstores import FAISS
+
+# Supported FAISS index types, from exact to most compressed
+INDEX_TYPES = ("flat", "ivf-flat", "hnsw", "ivf-pq")
+
+
+# Type name of a faiss index (see INDEX_TYPES)
+def index_type(index):
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf-pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf-flat"
+    return "flat"
+
+
+# Rule of thumb for the number of IVF lists: ~4 * sqrt(n), with at least 39 training points per list
+def default_nlist(n_vectors):
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+# Build an index of the given type over vectors (float32, n x d). IVF types are trained on a sample.
+def build_index(vectors, kind="flat", metric=faiss.METRIC_L2, nlist=None, pq_m=64, pq_bits=8,
+                hnsw_m=32, ef_construction=200, train_size=100_000, seed=0):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dimension = vectors.shape
+
+    if kind == "flat":
+        index = faiss.IndexFlat(dimension, metric)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, metric)
+        index.hnsw.efConstruction = ef_construction
+    elif kind in ("ivf-flat", "ivf-pq"):
+        nlist = nlist or default_nlist(n_vectors)
+        quantizer = faiss.IndexFlat(dimension, metric)
+        if kind == "ivf-flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+        else:
+            if dimension % pq_m:
+                raise ValueError(f"pq_m={pq_m} must divide the vector dimension {dimension}.")
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_bits, metric)
+
+        sample = vectors
+        if n_vectors > train_size:
+            sample = vectors[np.random.default_rng(seed).choice(n_vectors, train_size, replace=False)]
+        index.train(sample)
+    else:
+        raise ValueError(f"Unknown index type '{kind}'. Use one of: {', '.join(INDEX_TYPES)}.")
+
+    index.add(vectors)
+    return index
+
+
+# All vectors of an index, in id order (exact for flat/IVF-Flat/HNSW, decoded approximations for IVF-PQ)
+def extract_vectors(index):
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+# Same vector store (docstore, ids) over a different index type; FAISS ids are kept
+def convert_index(faiss_index, kind, **build_options):
+    index = build_index(extract_vectors(faiss_index.index), kind, metric=faiss_index.index.metric_type, **build_options)
+    return FAISS(faiss_index.embedding_function, index, faiss_index.docstore, dict(faiss_index.index_to_docstore_id))
+
+
+# Search parameters for an index: nprobe for IVF, efSearch for HNSW, plus an optional id selector
+def search_parameters(index, selector=None, nprobe=16, ef_search=64):
+    if isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = min(nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search
+    elif selector is None:
+        return None
+    else:
+        params = faiss.SearchParameters()
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+# Build options of an existing index, to build it again over other vectors
+def index_build_options(index):
+    kind = index_type(index)
+    if kind == "hnsw":
+        return {"hnsw_m": index.hnsw.nb_neighbors(1), "ef_construction": index.hnsw.efConstruction}
+    if kind == "ivf-pq":
+        return {"nlist": index.nlist, "pq_m": index.pq.M, "pq_bits": index.pq.nbits}
+    if kind == "ivf-flat":
+        return {"nlist": index.nlist}
+    return {}
+
+
+# Delete chunks (docstore ids) from a vector store. langchain's FAISS.delete renumbers the positions
+# to 0..n-1, which matches the index only for flat indexes: IVF indexes keep their original ids and
+# HNSW graphs cannot remove vectors. Other types are deleted from a flat copy, then built again with
+# the same options over the remaining vectors (IVF-PQ from their decoded approximations).
+def delete_chunks(faiss_index, ids):
+    kind = index_type(faiss_index.index)
+    if kind == "flat":
+        faiss_index.delete(ids)
+        return
+
+    options = index_build_options(faiss_index.index)
+    metric = faiss_index.index.metric_type
+    flat_index = convert_index(faiss_index, "flat")
+    flat_index.delete(ids)  # shares the docstore, which is updated too
+    remaining = flat_index.index.ntotal
+    if remaining and "nlist" in options:
+        options["nlist"] = min(options["nlist"], remaining)
+    faiss_index.index = (
+        build_index(extract_vectors(flat_index.index), kind, metric=metric, **options) if remaining else flat_index.index
+    )
+    faiss_index.index_to_docstore_id = flat_index.index_to_docstore_id
@@ -0,0 +1,51 @@
+import math
+import random
+from datetime import datetime
+from app import config
+
+
+# Questions generated once for a whole class: question_nbr times the pool factor, within the cap
+def class_pool_size(question_nbr, pool_size=None):
+    size = pool_size or math.ceil(question_nbr * config.CLASS_EXAM_POOL_FACTOR)
+    return max(question_nbr, min(size, config.CLASS_EXAM_MAX_POOL))
+
+
+# Copy of an MCQ with its options in another order, the correct answer following its option
+def shuffle_options(question, rng):
+    options = question.get("options")
+    if not options:
+        return dict(question)
+    letters = sorted(options)
+    texts = [options[letter] for letter in letters]
+    order = list(range(len(letters)))
+    rng.shuffle(order)
+    shuffled = {letter: texts[position] for letter, position in zip(letters, order)}
+    correct = question.get("correct_answer")
+    if correct in options:
+        correct = letters[order.index(letters.index(correct))]
+    return {**question, "options": shuffled, "correct_answer": correct}
+
+
+# One exam per student from the shared pool: its own draw of questions, in its own order, with its
+# own MCQ option order. Seeded by class and student, so an exam can be rebuilt identically.
+def build_student_exam(pool, question_nbr, class_id, student_id):
+    rng = random.Random(f"{class_id}:{student_id}")
+    questions = rng.sample(pool, min(question_nbr, len(pool)))
+    return [shuffle_options(question, rng) for question in questions]
+
+
+# Exam documents for every student, ready for one insert_many
+def class_exam_documents(pool, request, students, class_id, teacher_id):
+    created_at = datetime.utcnow()
+    return [
+        {
+            "query": request.query,
+            "answers": {},  # No answers at generation time
+            "questions": build_student_exam(pool, request.question_nbr, class_id, student["_id"]),
+            "user_id": student["_id"],
+            "class_id": class_id,
+            "created_by": teacher_id,
+            "created_at": created_at,
+        }
+        for student in students
+    ]
@@ -1,45 +1,68 @@
 import re
 
+# Patterns identifying table of contents, irrelevant sections, and excessive dots, compiled once
+IRRELEVANT_PATTERNS = [
+    re.compile(r"table\s*des\s*matières"),  # table of contents
+    re.compile(r"liste\s*des\s*(figures|tables)"),  # list of figures or tables
+    re.compile(r"\.{3,}"),  # More than 3 consecutive dots (likely a table of contents)
+    re.compile(r"\b(guide|résumé|abstract|remerciement|introduction|conclusion|références|bibliographie|webographie)\b"),  # Common non-SQL sections
+]
+WHITESPACE_PATTERN = re.compile(r'[ \t]+')
+FILLER_PATTERN = re.compile(r'\b(introduction|résumé|summary|conclusion)\b', flags=re.IGNORECASE)
+
+# Bump when the checks below change, so stored chunk metadata is recomputed
+CHUNK_ANALYSIS_VERSION = 1
+# Thresholds of the precomputed analysis (the request-time defaults)
+ANALYSIS_MAX_DOT_RATIO = 0.5
+ANALYSIS_MIN_LENGTH = 30
+
+
+# Whether a chunk carries an up-to-date analysis from annotate_chunks
+def has_chunk_analysis(doc):
+    return doc.metadata.get("analysis_version") == CHUNK_ANALYSIS_VERSION
+
+
+# Check whether a chunk is relevant (not a table of contents, an irrelevant section, or too short)
+def is_relevant_chunk(text, max_dot_ratio=0.5, min_length=30):
+    words = text.split()
+    if not words:
+        return False
+
+    # Step 1: Check if the chunk contains any irrelevant pattern
+    lowered = text.strip().lower()
+    if any(pattern.search(lowered) for pattern in IRRELEVANT_PATTERNS):
+        return False
+
+    # Step 2: Check if the chunk has too many dots (likely a table of contents)
+    dot_ratio = lowered.count('.') / len(words)  # Calculate dot ratio
+    if dot_ratio > max_dot_ratio:
+        return False
+
+    # Step 3: Check if the chunk is short
+    return len(words) >= min_length
+
+
 # Function to filter irrelevant chunks from a list of retrieved documents
 # Filter out irrelevant chunks that contain table of contents, irrelevant sections, and excessive dots
+# (uses the flag precomputed by annotate_chunks when the chunk has one)
 def filter_irrelevant_chunks(documents, max_dot_ratio=0.5, min_length=30):
     relevant_chunks = []
 
-    # Define patterns for identifying table of contents, irrelevant sections, and excessive dots
-    irrelevant_patterns = [
-        r"table\s*des\s*matières",  # table of contents
-        r"liste\s*des\s*(figures|tables)",  # list of figures or tables
-        r"\.{3,}",  # More than 3 consecutive dots (likely a table of contents)
-        r"\b(guide|résumé|abstract|remerciement|introduction|conclusion|références|bibliographie|webographie)\b",  # Common non-SQL sections
-    ]
+    precomputed = max_dot_ratio == ANALYSIS_MAX_DOT_RATIO and min_length == ANALYSIS_MIN_LENGTH
 
     for doc in documents:
-        # Step 1: Check if the chunk contains any irrelevant pattern
-        text = doc.page_content.strip().lower()
-
-        # If any irrelevant pattern is matched, skip this chunk
-        if any(re.search(pattern, text) for pattern in irrelevant_patterns):
-            continue
-
-        # Step 2: Check if the chunk has too many dots (likely a table of contents)
-        dot_ratio = text.count('.') / len(text.split())  # Calculate dot ratio
-        if dot_ratio > max_dot_ratio:
-            continue
-
-        # Step 3: Check if the chunk is short
-        # Split the text into words and check length
-        words = doc.page_content.split()
-        if len(words) < min_length:
-            continue
+        if precomputed and has_chunk_analysis(doc):
+            relevant = doc.metadata["relevant"]
+        else:
+            relevant = is_relevant_chunk(doc.page_content, max_dot_ratio, min_length)
 
         # If the chunk passes all checks, keep it
-        relevant_chunks.append(doc)
+        if relevant:
+            relevant_chunks.append(doc)
 
     return relevant_chunks
 
 
-import re
-
 def clean_chunk_for_question_generation(chunk, min_length):
     """
     Clean the chunk for question generation by removing unnecessary text and ensuring meaningful content.
@@ -52,10 +75,10 @@ def clean_chunk_for_question_generation(chunk, min_length):
         str: Cleaned chunk ready for question generation.
     """
     # Step 1: Normalize whitespace (remove extra spaces, newlines)
-    cleaned_text = re.sub(r'[ \t]+', ' ', chunk).strip()
+    cleaned_text = WHITESPACE_PATTERN.sub(' ', chunk).strip()
 
     # Step 2: Remove non-informative filler phrases like "introduction", "summary"
-    cleaned_text = re.sub(r'\b(introduction|résumé|summary|conclusion)\b', '', cleaned_text, flags=re.IGNORECASE)
+    cleaned_text = FILLER_PATTERN.sub('', cleaned_text)
 
     # Step 3: Ensure minimum content length for meaningful chunk
     if len(cleaned_text.split()) < min_length:
@@ -67,8 +90,32 @@ def clean_relevant_chunks_for_question_generation(re_ranked_docs, min_chunk_leng
     cleaned_chunks = []
 
     for doc in re_ranked_docs:
-        cleaned_chunk = clean_chunk_for_question_generation(doc.page_content, min_chunk_length)
+        # Cleaned text precomputed by annotate_chunks, when computed with the same minimum length
+        if min_chunk_length == ANALYSIS_MIN_LENGTH and has_chunk_analysis(doc):
+            cleaned_chunk = doc.metadata["clean_text"]
+        else:
+            cleaned_chunk = clean_chunk_for_question_generation(doc.page_content, min_chunk_length)
         if cleaned_chunk:  # Only add the chunk if it's not None (meaningful)
             cleaned_chunks.append(cleaned_chunk)
 
-    return cleaned_chunks
\ No newline at end of file
+    return cleaned_chunks
+
+
+# Compute once per chunk, at ingest or index load time, what used to be computed on every request:
+# a relevance flag (usable for questions), the cleaned text and its word count, stored in metadata
+def annotate_chunks(documents):
+    annotated = 0
+    for doc in documents:
+        if has_chunk_analysis(doc):
+            continue
+        clean_text = clean_chunk_for_question_generation(doc.page_content, ANALYSIS_MIN_LENGTH)
+        doc.metadata.update({
+            "relevant": clean_text is not None and is_relevant_chunk(
+                doc.page_content, ANALYSIS_MAX_DOT_RATIO, ANALYSIS_MIN_LENGTH
+            ),
+            "clean_text": clean_text,
+            "word_count": len(clean_text.split()) if clean_text else 0,
+            "analysis_version": CHUNK_ANALYSIS_VERSION,
+        })
+        annotated += 1
+    return annotated
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Single-flight for worker threads: concurrent calls with the same key run fn once, and every
+# caller gets its result (or its exception). Results are shared, so callers must not mutate them.
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.executed += 1
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._calls), "executed": self.executed, "shared": self.shared}
+
+
+# Single-flight for coroutines on the event loop. The shared task is shielded: a waiter going away
+# (e.g. a client disconnecting) doesn't cancel the work the other waiters are waiting for.
+class AsyncSingleFlight:
+
+    def __init__(self):
+        self._tasks = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, coro_fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn())
+            self._tasks[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda finished: self._finish(key, finished))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._tasks.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Retrieved, even when every waiter went away
+
+    def stats(self):
+        return {"in_flight": len(self._tasks), "executed": self.executed, "shared": self.shared}
+
+
+# Identical retrievals and question generations running at the same time in the worker threads
+retrieval_flight = SingleFlight()
+question_flight = SingleFlight()
+# Identical exam requests waiting on the event loop
+exam_flight = AsyncSingleFlight()
+
+
+def coalescing_stats():
+    return {
+        "exams": exam_flight.stats(),
+        "retrievals": retrieval_flight.stats(),
+        "questions": question_flight.stats(),
+    }
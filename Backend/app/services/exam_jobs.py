@@ -0,0 +1,166 @@
+import asyncio
+import json
+from datetime import datetime
+from app import config
+from app.database import database
+from app.services.generation_pool import generation_pool
+from app.services.piepeline import exam_pipeline
+from app.utils.telemetry import stage
+
+
+# An exam being generated in the background; its id is the id of the exam document in MongoDB
+class ExamJob:
+
+    def __init__(self, exam_id, user_id, question_nbr):
+        self.id = str(exam_id)
+        self.exam_id = exam_id
+        self.user_id = user_id
+        self.question_nbr = question_nbr
+        self.status = "queued"
+        self.error = None
+        self.questions = []  # (index, question) pairs in completion order
+        self.pending_writes = []  # partial exam updates still being written to MongoDB
+        self._subscribers = []
+
+    @property
+    def finished(self):
+        return self.status in ("completed", "failed")
+
+    def snapshot(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "question_nbr": self.question_nbr,
+            "completed_questions": len(self.questions),
+            "questions": [question for _, question in sorted(self.questions, key=lambda item: item[0])],
+            "error": self.error,
+        }
+
+    # The methods below must run on the event loop thread
+    def _publish(self, event, data):
+        for queue in self._subscribers:
+            queue.put_nowait((event, data))
+
+    def add_question(self, index, question):
+        self.questions.append((index, question))
+        self._publish("question", {"index": index, "question": question})
+
+    def set_status(self, status, error=None):
+        self.status = status
+        self.error = error
+        self._publish("status", {"status": status, "error": error})
+
+    # Yield (event, data) pairs: questions already generated first, then new ones as they arrive
+    async def events(self):
+        # Snapshot and subscribe together, so every later event lands in the queue exactly once
+        queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        replay, status, error, finished = list(self.questions), self.status, self.error, self.finished
+        try:
+            for index, question in replay:
+                yield "question", {"index": index, "question": question}
+            yield "status", {"status": status, "error": error}
+
+            while not finished:
+                event, data = await queue.get()
+                yield event, data
+                finished = event == "status" and data["status"] in ("completed", "failed")
+        finally:
+            self._subscribers.remove(queue)
+
+
+# Format an event for a Server-Sent Events stream
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# Registry of in-flight and recently finished exam generation jobs
+class ExamJobManager:
+
+    def __init__(self, retention_seconds):
+        self.retention_seconds = retention_seconds
+        self.jobs = {}
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    # Create the exam document, queue its generation and return the job (raises PoolSaturatedError)
+    async def submit(self, request, user, faiss_index, ollama_model, k=25, top_n=10):
+        loop = asyncio.get_running_loop()
+
+        with stage("mongo_insert"):
+            result = await database.exams.insert_one({
+                "query": request.query,
+                "answers": {},  # No answers at generation time
+                "questions": [],
+                "status": "queued",
+                "question_nbr": request.question_nbr,
+                "user_id": user["_id"],
+                "created_at": datetime.utcnow(),
+            })
+        job = ExamJob(result.inserted_id, user["_id"], request.question_nbr)
+
+        # Called from the worker thread each time a question is generated
+        def on_question(index, question):
+            question = question.dict()
+            loop.call_soon_threadsafe(job.add_question, index, question)
+            job.pending_writes.append(asyncio.run_coroutine_threadsafe(
+                database.exams.update_one({"_id": job.exam_id}, {"$push": {"questions": question}}),
+                loop,
+            ))
+
+        # Runs in the worker thread once the job leaves the queue
+        def run(**kwargs):
+            loop.call_soon_threadsafe(job.set_status, "running")
+            job.pending_writes.append(asyncio.run_coroutine_threadsafe(
+                database.exams.update_one({"_id": job.exam_id}, {"$set": {"status": "running"}}),
+                loop,
+            ))
+            return exam_pipeline(**kwargs)
+
+        try:
+            future = generation_pool.submit(
+                run,
+                query=request.query,
+                question_type=request.question_type,
+                question_nbr=request.question_nbr,
+                faiss_index=faiss_index,
+                ollama_model=ollama_model,
+                difficulty=request.difficulty,
+                k=k,
+                top_n=top_n,
+                on_question=on_question,
+            )
+        except Exception:
+            await database.exams.delete_one({"_id": job.exam_id})
+            raise
+
+        self.jobs[job.id] = job
+        asyncio.create_task(self._watch(job, future))
+        return job
+
+    # Wait for the pipeline to finish, then store the final (ordered) exam and status
+    async def _watch(self, job, future):
+        try:
+            exam = await asyncio.wrap_future(future)
+            questions = exam.get("questions", [])
+
+            # Let the partial updates land first so they cannot overwrite the final exam
+            await asyncio.gather(*[asyncio.wrap_future(write) for write in job.pending_writes], return_exceptions=True)
+            await database.exams.update_one(
+                {"_id": job.exam_id},
+                {"$set": {"questions": questions, "status": "completed"}},
+            )
+            job.set_status("completed")
+        except Exception as e:
+            await asyncio.gather(*[asyncio.wrap_future(write) for write in job.pending_writes], return_exceptions=True)
+            await database.exams.update_one(
+                {"_id": job.exam_id},
+                {"$set": {"status": "failed", "error": str(e)}},
+            )
+            job.set_status("failed", str(e))
+        finally:
+            asyncio.get_running_loop().call_later(self.retention_seconds, self.jobs.pop, job.id, None)
+
+
+exam_job_manager = ExamJobManager(config.EXAM_JOB_RETENTION_SECONDS)
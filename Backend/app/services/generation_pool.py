@@ -0,0 +1,112 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import config
+from app.utils.telemetry import metrics, submit_in_context
+
+
+# Raised when the generation queue is full; carries a Retry-After estimate in seconds
+class PoolSaturatedError(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Exam generation queue is full.")
+        self.retry_after = retry_after
+
+
+# Bounded worker pool running the blocking exam pipeline off the event loop, with admission control
+class GenerationPool:
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exam-generation")
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.run_time_total = 0.0
+
+    # Estimate how long a rejected client should wait before retrying
+    def retry_after(self):
+        finished = self.completed + self.failed
+        average_run_time = self.run_time_total / finished if finished else 30.0
+        waves = (self.queued + self.active) / self.max_workers
+        return max(1, math.ceil(average_run_time * max(waves, 1)))
+
+    # Queue fn(*args, **kwargs) in the pool and return its concurrent future,
+    # or raise PoolSaturatedError right away if the queue is full
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise PoolSaturatedError(self.retry_after())
+            self.queued += 1
+
+        enqueued_at = time.perf_counter()
+
+        def job():
+            started_at = time.perf_counter()
+            with self._lock:
+                wait = started_at - enqueued_at
+                self.queued -= 1
+                self.active += 1
+                self.queue_wait_total += wait
+                self.queue_wait_max = max(self.queue_wait_max, wait)
+            metrics.observe("generation_queue_wait_seconds", wait)
+
+            succeeded = False
+            try:
+                result = fn(*args, **kwargs)
+                succeeded = True
+                return result
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.run_time_total += time.perf_counter() - started_at
+                    if succeeded:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+
+        # With the request's context, so the pipeline's spans belong to the request's trace
+        return submit_in_context(self.executor, job)
+
+    # Run fn(*args, **kwargs) in the pool, or raise PoolSaturatedError if the queue is full
+    async def run(self, fn, *args, **kwargs):
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # The client went away before the job started: release its queue slot
+            if future.cancelled():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def stats(self):
+        with self._lock:
+            started = self.completed + self.failed + self.active
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active_jobs": self.active,
+                "queued_jobs": self.queued,
+                "completed_jobs": self.completed,
+                "failed_jobs": self.failed,
+                "rejected_jobs": self.rejected,
+                "queue_wait_avg_seconds": self.queue_wait_total / started if started else 0.0,
+                "queue_wait_max_seconds": self.queue_wait_max,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+generation_pool = GenerationPool(config.GENERATION_WORKERS, config.GENERATION_MAX_QUEUE)
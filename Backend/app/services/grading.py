@@ -0,0 +1,191 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from app import config
+from app.services.question_parser import QuestionParseError, load_json
+from app.utils.telemetry import metrics, stage, submit_in_context
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("graded_answers_total", "Answers graded, by question type and grading method")
+
+
+# Option letter of an MCQ answer: "b", "B)" or "B. ..." give "B", as does the text of option B;
+# anything else gives "" (never correct)
+def normalize_choice(answer, options):
+    text = str(answer or "").strip()
+    letter = text[:1].upper()
+    if letter in options and (len(text) == 1 or not text[1].isalnum()):
+        return letter
+    for key, value in options.items():
+        if text.lower() == str(value).strip().lower():
+            return key
+    return ""
+
+
+# Score MCQ answers all at once: 1.0 where the normalized answer is the stored correct option
+def score_choices(expected, given):
+    expected, given = np.asarray(expected, dtype="U1"), np.asarray(given, dtype="U1")
+    return ((expected == given) & (given != "")).astype(np.float64)
+
+
+# Cosine similarity of each answer to its reference. Every distinct text is embedded once, in
+# batched calls: class exams share their reference answers, so most of them repeat.
+def answer_similarities(embedding_model, references, answers):
+    texts = list(dict.fromkeys(references + answers))
+    vectors = np.asarray(embedding_model.embed_documents(texts), dtype=np.float32)
+    vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    positions = {text: i for i, text in enumerate(texts)}
+    reference_vectors = vectors[[positions[text] for text in references]]
+    answer_vectors = vectors[[positions[text] for text in answers]]
+    return (reference_vectors * answer_vectors).sum(axis=1)
+
+
+# Score of a borderline answer that isn't sent to the LLM: linear between the two thresholds
+def similarity_score(similarity, accept=None, reject=None):
+    accept = config.GRADING_ACCEPT_SIMILARITY if accept is None else accept
+    reject = config.GRADING_REJECT_SIMILARITY if reject is None else reject
+    return round(float(np.clip((similarity - reject) / max(accept - reject, 1e-6), 0.0, 1.0)), 2)
+
+
+def build_grading_prompt(question, reference, answer):
+    prompt = f"""
+    Vous êtes un correcteur d'examens SQL. Évaluez la réponse d'un étudiant à une question ouverte
+    en la comparant à la réponse de référence.
+
+    ### Question :
+    {question}
+
+    ### Réponse de référence :
+    {reference or "(aucune)"}
+
+    ### Réponse de l'étudiant :
+    {answer}
+
+    ### Consignes :
+    1. Jugez le fond (exactitude des concepts et des requêtes SQL), pas la formulation.
+    2. Attribuez une note de 0 (incorrecte), 0.5 (partiellement correcte) ou 1 (correcte).
+    3. Retournez uniquement le JSON suivant, où "feedback" justifie la note en une ou deux phrases :
+       ```json
+       {{
+           "score": 0,
+           "feedback": ""
+       }}
+       ```
+    """
+    return prompt
+
+
+# Grade one borderline answer with the LLM (raises QuestionParseError on an unusable answer)
+def grade_with_llm(ollama_model, question, reference, answer):
+    with stage("grade_llm"):
+        data = load_json(ollama_model.invoke(build_grading_prompt(question, reference, answer)))
+    if not isinstance(data, dict):
+        raise QuestionParseError("The model answer is not a JSON object.")
+    try:
+        score = float(data.get("score"))
+    except (TypeError, ValueError):
+        raise QuestionParseError("The score is missing.")
+    feedback = data.get("feedback")
+    return round(min(max(score, 0.0), 1.0), 2), feedback if isinstance(feedback, str) else None
+
+
+def question_text(question):
+    return question.get("question_text") or question.get("question") or ""
+
+
+# Grade the submitted answers of a batch of exams. MCQs are compared with their correct option in one
+# vectorized pass; open-ended answers are scored by embedding similarity to the reference answer, and
+# only the borderline ones (between the two thresholds) go to the LLM, at most max_escalations of them,
+# the most uncertain first. Returns {exam _id: grading} and the number of LLM escalations.
+def grade_exams(exams, embedding_model, ollama_model=None, max_escalations=None):
+    max_escalations = config.GRADING_MAX_ESCALATIONS if max_escalations is None else max_escalations
+    results = {exam["_id"]: [None] * len(exam.get("questions", [])) for exam in exams}
+    choices, open_answers = [], []
+
+    for exam in exams:
+        answers = exam.get("answers") or {}
+        for index, question in enumerate(exam.get("questions", [])):
+            answer = str(answers.get(str(index)) or "").strip()
+            options = question.get("options")
+            if options:
+                choices.append((exam["_id"], index, normalize_choice(question.get("correct_answer"), options), normalize_choice(answer, options)))
+            elif not answer:
+                results[exam["_id"]][index] = {"score": 0.0, "method": "blank"}
+            else:
+                open_answers.append((exam["_id"], index, question, str(question.get("correct_answer") or "").strip(), answer))
+
+    with stage("grading", exams=len(exams)):
+        if choices:
+            scores = score_choices([item[2] for item in choices], [item[3] for item in choices])
+            for (exam_id, index, _, _), score in zip(choices, scores.tolist()):
+                results[exam_id][index] = {"score": score, "method": "exact"}
+            metrics.count("graded_answers_total", len(choices), question_type="mcq", method="exact")
+
+        borderline = []
+        with_reference = [item for item in open_answers if item[3]]
+        if with_reference:
+            similarities = answer_similarities(
+                embedding_model, [item[3] for item in with_reference], [item[4] for item in with_reference]
+            ).tolist()
+            for item, similarity in zip(with_reference, similarities):
+                exam_id, index = item[0], item[1]
+                if similarity >= config.GRADING_ACCEPT_SIMILARITY:
+                    results[exam_id][index] = {"score": 1.0, "method": "similarity", "similarity": round(similarity, 4)}
+                elif similarity <= config.GRADING_REJECT_SIMILARITY:
+                    results[exam_id][index] = {"score": 0.0, "method": "similarity", "similarity": round(similarity, 4)}
+                else:
+                    borderline.append((item, similarity))
+        # Without a reference answer there is nothing to compare with: the LLM judges from the question
+        borderline.extend((item, None) for item in open_answers if not item[3])
+
+        midpoint = (config.GRADING_ACCEPT_SIMILARITY + config.GRADING_REJECT_SIMILARITY) / 2
+        borderline.sort(key=lambda entry: 0.0 if entry[1] is None else abs(entry[1] - midpoint))
+        escalated = borderline[:max_escalations] if ollama_model else []
+        for item, similarity in borderline[len(escalated):]:
+            results[item[0]][item[1]] = fallback_result(similarity)
+
+        if escalated:
+            with ThreadPoolExecutor(max_workers=config.OLLAMA_MAX_CONCURRENCY) as executor:
+                futures = [
+                    submit_in_context(executor, grade_with_llm, ollama_model, question_text(item[2]), item[3], item[4])
+                    for item, _ in escalated
+                ]
+                for (item, similarity), future in zip(escalated, futures):
+                    try:
+                        score, feedback = future.result()
+                        result = {"score": score, "method": "llm", "feedback": feedback}
+                        if similarity is not None:
+                            result["similarity"] = round(similarity, 4)
+                    except Exception as e:
+                        logger.warning("LLM grading failed, keeping the similarity score: %s", e)
+                        result = fallback_result(similarity)
+                    results[item[0]][item[1]] = result
+
+        for item in open_answers:
+            result = results[item[0]][item[1]]
+            metrics.count("graded_answers_total", question_type="open-ended", method=result["method"])
+
+    graded_at = datetime.utcnow()
+    gradings = {exam_id: summarize(questions, graded_at) for exam_id, questions in results.items()}
+    return gradings, len(escalated)
+
+
+# Similarity-based score of a borderline answer; answers without a reference are left to the teacher
+def fallback_result(similarity):
+    if similarity is None:
+        return {"score": 0.0, "method": "ungraded"}
+    return {"score": similarity_score(similarity), "method": "similarity", "similarity": round(similarity, 4)}
+
+
+def summarize(questions, graded_at):
+    score = round(sum(question["score"] for question in questions), 2)
+    return {
+        "questions": questions,
+        "score": score,
+        "max_score": len(questions),
+        "percentage": round(100 * score / len(questions), 1) if questions else 0.0,
+        "needs_review": any(question["method"] == "ungraded" for question in questions),
+        "graded_at": graded_at,
+    }
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from pymongo import UpdateOne
+from app import config
+from app.database import database
+from app.services.grading import grade_exams
+from app.services.model_registry import model_registry
+from app.utils.telemetry import stage, submit_in_context
+
+logger = logging.getLogger(__name__)
+
+
+# Grading of a set of submitted exams, run in the background
+class GradingJob:
+
+    def __init__(self, exam_ids, user_id):
+        self.id = str(ObjectId())
+        self.exam_ids = exam_ids
+        self.user_id = user_id
+        self.status = "queued"
+        self.graded = 0
+        self.escalated = 0
+        self.error = None
+
+    def snapshot(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "exams": len(self.exam_ids),
+            "graded_exams": self.graded,
+            "llm_escalations": self.escalated,
+            "error": self.error,
+        }
+
+
+# Registry of grading jobs. Each job grades its exams GRADING_BATCH_SIZE at a time in the grading
+# threads and writes every batch back with one bulk_write; the grade lands in each exam's "grading"
+# field, so it outlives the job (kept in memory for polling for EXAM_JOB_RETENTION_SECONDS).
+class GradingJobManager:
+
+    def __init__(self, workers, retention_seconds):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grading")
+        self.retention_seconds = retention_seconds
+        self.jobs = {}
+        self.completed = 0
+        self.failed = 0
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    # Mark the exams as pending and queue their grading. An exam submitted again before its grading
+    # finished belongs to the newer job: writes of the older one are filtered out by grading_job.
+    async def submit(self, exam_ids, user, ollama_model):
+        job = GradingJob(list(exam_ids), user["_id"])
+        await database.exams.update_many(
+            {"_id": {"$in": job.exam_ids}},
+            {"$set": {"grading_status": "pending", "grading_job": job.id}},
+        )
+        self.jobs[job.id] = job
+        asyncio.create_task(self._run(job, ollama_model))
+        return job
+
+    async def _run(self, job, ollama_model):
+        job.status = "running"
+        try:
+            embedding_model = await model_registry.aget("embedding_model")
+            for start in range(0, len(job.exam_ids), config.GRADING_BATCH_SIZE):
+                exam_ids = job.exam_ids[start:start + config.GRADING_BATCH_SIZE]
+                exams = await database.exams.find(
+                    {"_id": {"$in": exam_ids}, "grading_job": job.id},
+                    {"questions": 1, "answers": 1},
+                ).to_list(length=len(exam_ids))
+                if not exams:
+                    continue
+
+                gradings, escalated = await asyncio.wrap_future(submit_in_context(
+                    self.executor, grade_exams, exams, embedding_model, ollama_model,
+                    max(config.GRADING_MAX_ESCALATIONS - job.escalated, 0),
+                ))
+                operations = [
+                    UpdateOne(
+                        {"_id": exam_id, "grading_job": job.id},
+                        {"$set": {"grading": grading, "grading_status": "graded"}},
+                    )
+                    for exam_id, grading in gradings.items()
+                ]
+                with stage("mongo_bulk_write", documents=len(operations)):
+                    await database.exams.bulk_write(operations, ordered=False)
+                job.graded += len(operations)
+                job.escalated += escalated
+
+            job.status = "completed"
+            self.completed += 1
+        except Exception as e:
+            logger.exception("Grading job %s failed", job.id)
+            job.status = "failed"
+            job.error = str(e)
+            self.failed += 1
+            await database.exams.update_many(
+                {"_id": {"$in": job.exam_ids}, "grading_job": job.id, "grading_status": "pending"},
+                {"$set": {"grading_status": "failed"}},
+            )
+        finally:
+            asyncio.get_running_loop().call_later(self.retention_seconds, self.jobs.pop, job.id, None)
+
+    def stats(self):
+        return {
+            "running": sum(1 for job in self.jobs.values() if job.status in ("queued", "running")),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+grading_job_manager = GradingJobManager(config.GRADING_WORKERS, config.EXAM_JOB_RETENTION_SECONDS)
@@ -0,0 +1,142 @@
+import asyncio
+import fcntl
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from app import config
+from app.services.lexical_index import get_lexical_index
+from app.services.retrieval import prepare_index
+from app.utils.faiss_utils import (
+    INDEX_POINTER_FILE,
+    INDEX_VERSIONS_DIR,
+    load_faiss_index,
+    resolve_index_path,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Versioned FAISS index on disk. Every change is written to a new version directory and published
+# by atomically replacing the CURRENT pointer file, so readers never see a half-written index.
+class IndexStore:
+
+    def __init__(self, base_path, keep_versions=3, check_interval=5.0, mmap=False):
+        self.base_path = base_path
+        self.keep_versions = keep_versions
+        self.check_interval = check_interval
+        self.mmap = mmap
+        self.loaded_path = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    def current_path(self):
+        return resolve_index_path(self.base_path)
+
+    def current_version(self):
+        path = self.current_path()
+        return os.path.basename(path) if path != self.base_path else None
+
+    # Load the served version (registry loader for "faiss_index")
+    def load(self, embedding_model):
+        path = self.current_path()
+        faiss_index = load_faiss_index(path, embedding_model, mmap=self.mmap)
+        if faiss_index is not None:
+            self._prepare(faiss_index, path)
+        self.loaded_path = path
+        return faiss_index
+
+    # Per-chunk metadata, eligible ids and the BM25 index (read from the version directory when saved there)
+    def _prepare(self, faiss_index, path):
+        eligible = prepare_index(faiss_index)
+        if config.HYBRID_RETRIEVAL:
+            get_lexical_index(faiss_index, eligible.ids, path)
+
+    # Load a private, writable copy of the served version, to build the next version from
+    def load_editable(self, embedding_model):
+        faiss_index = load_faiss_index(self.current_path(), embedding_model)
+        if faiss_index is None:
+            raise RuntimeError(f"No FAISS index found in {self.current_path()}.")
+        return faiss_index
+
+    # Serialize writers, across processes too (API workers and the ingestion CLI)
+    @contextmanager
+    def writer_lock(self):
+        os.makedirs(self.base_path, exist_ok=True)
+        with open(os.path.join(self.base_path, ".write.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Save a new version, point CURRENT at it and drop the oldest versions; returns the version name
+    def publish(self, faiss_index):
+        version = f"v{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        versions_path = os.path.join(self.base_path, INDEX_VERSIONS_DIR)
+        version_path = os.path.join(versions_path, version)
+        faiss_index.save_local(version_path)
+        self._prepare(faiss_index, version_path)  # saves the BM25 index with the version
+
+        pointer_path = os.path.join(self.base_path, INDEX_POINTER_FILE)
+        tmp_path = f"{pointer_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, pointer_path)
+
+        self._prune(versions_path, version)
+        return version
+
+    def _prune(self, versions_path, current):
+        # Version names sort by creation time
+        older = sorted(name for name in os.listdir(versions_path) if name != current)
+        for name in older[:max(len(older) - self.keep_versions, 0)]:
+            shutil.rmtree(os.path.join(versions_path, name), ignore_errors=True)
+
+    # Serve a new version in this process, reusing the loaded embedding model
+    def swap(self, registry, faiss_index=None):
+        path = self.current_path()
+        if faiss_index is None or self.mmap:
+            faiss_index = load_faiss_index(path, registry.get("embedding_model"), mmap=self.mmap)
+            if faiss_index is None:
+                raise RuntimeError(f"Could not load index version {path}.")
+        self._prepare(faiss_index, path)
+        registry.set("faiss_index", faiss_index)
+        self.loaded_path = path
+        return faiss_index
+
+    # Pick up versions published by other processes (throttled to one check per interval)
+    def refresh(self, registry):
+        now = time.monotonic()
+        if self.loaded_path is None or now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self.current_path() == self.loaded_path:
+            return
+        with self._reload_lock:
+            if self.current_path() != self.loaded_path:
+                logger.info("Switching to FAISS index version %s", self.current_version())
+                try:
+                    self.swap(registry)
+                except Exception as e:
+                    # Keep serving the loaded version; retried at the next check
+                    logger.exception("Error switching FAISS index version")
+
+    # The served index, after checking for a newer version
+    async def get_index(self, registry):
+        if self.loaded_path is not None and time.monotonic() - self._checked_at >= self.check_interval:
+            await asyncio.to_thread(self.refresh, registry)
+        return await registry.aget("faiss_index")
+
+
+index_store = IndexStore(
+    config.VECTORSTORE_PATH,
+    keep_versions=config.INDEX_VERSIONS_KEEP,
+    check_interval=config.INDEX_RELOAD_CHECK_SECONDS,
+    mmap=config.FAISS_MMAP,
+)
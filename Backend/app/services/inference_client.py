@@ -0,0 +1,132 @@
+import json
+import socket
+import struct
+import threading
+from langchain_core.embeddings import Embeddings
+from app import config
+from app.services.reranker import ReRanker
+
+# Messages are length-prefixed JSON: a 4-byte big-endian size, then the UTF-8 body
+HEADER = struct.Struct(">I")
+
+
+# Raised when the inference sidecar cannot be reached or reports an error
+class InferenceError(RuntimeError):
+    pass
+
+
+def encode_message(message):
+    body = json.dumps(message).encode("utf-8")
+    return HEADER.pack(len(body)) + body
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Inference sidecar closed the connection.")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def read_message(sock):
+    (size,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    return json.loads(_recv_exactly(sock, size))
+
+
+# Client of the inference sidecar over its Unix socket, with one connection per thread
+class InferenceClient:
+
+    def __init__(self, socket_path, timeout=60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def request(self, op, **params):
+        message = encode_message({"op": op, **params})
+        # Requests are idempotent: reconnect once, e.g. after the sidecar restarted
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(message)
+                response = read_message(sock)
+                break
+            except OSError as e:
+                self._disconnect()
+                if attempt:
+                    raise InferenceError(f"Inference sidecar unavailable at {self.socket_path}: {e}")
+
+        if "error" in response:
+            raise InferenceError(response["error"])
+        return response["result"]
+
+    def ping(self):
+        return self.request("ping")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = InferenceClient(config.INFERENCE_SOCKET)
+        return _client
+
+
+# Embedding model computed by the sidecar; same interface as HuggingFaceEmbeddings
+class SidecarEmbeddings(Embeddings):
+
+    def __init__(self, client=None):
+        self.client = client or get_inference_client()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self.client.request("embed", texts=list(texts))
+
+    def embed_query(self, text):
+        return self.client.request("embed", texts=[text])[0]
+
+
+# Re-ranker whose model runs in the sidecar; scores from several workers are batched together there
+class SidecarReRanker(ReRanker):
+
+    def __init__(self, backend, client=None):
+        self.backend = backend
+        self.client = client or get_inference_client()
+        self._name = None
+
+    # Name of the re-ranker the sidecar loaded for this backend (it goes in the retrieval cache key,
+    # so the PyTorch and ONNX models never share entries), asked once the sidecar answers
+    @property
+    def name(self):
+        if self._name is None:
+            try:
+                self._name = self.client.ping()["rerankers"][self.backend]
+            except (InferenceError, KeyError, TypeError):
+                return f"sidecar-{self.backend}"
+        return self._name
+
+    def score(self, query, texts):
+        if not texts:
+            return []
+        return self.client.request("score", backend=self.backend, query=query, texts=list(texts))
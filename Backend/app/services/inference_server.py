@@ -0,0 +1,198 @@
+"""
+Inference sidecar: one process holding the embedding model and the re-rankers for every uvicorn
+worker on the machine. Workers send embed/score requests over a Unix socket (see
+app/services/inference_client.py); requests arriving from different workers within a short
+window are run as one model batch.
+
+Run from the Backend directory, then start the API with the same INFERENCE_SOCKET:
+    INFERENCE_SOCKET=/tmp/sql-exam-inference.sock python -m app.services.inference_server
+    INFERENCE_SOCKET=/tmp/sql-exam-inference.sock FAISS_MMAP=1 uvicorn app.main:app --workers 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import config
+from app.services.inference_client import HEADER, encode_message
+from app.services.reranker import RERANKER_BACKENDS
+from app.utils.faiss_utils import load_embedding_model
+from app.utils.telemetry import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+# Collect requests for up to `window` seconds (or `max_batch` texts) and run them as one batch
+class MicroBatcher:
+
+    def __init__(self, run_batch, executor, max_batch, window):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch = max_batch
+        self.window = window
+        self.pending = []  # (item, future)
+        self.pending_size = 0
+        self.timer = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item, size):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((item, future))
+        self.pending_size += size
+        if self.pending_size >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending, self.pending_size = self.pending, [], 0
+        if not batch:
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        # One model thread: the next batch keeps filling up while this one runs
+        done = asyncio.get_running_loop().run_in_executor(
+            self.executor, self.run_batch, [item for item, _ in batch]
+        )
+        done.add_done_callback(lambda done: self._deliver(batch, done))
+
+    def _deliver(self, batch, done):
+        error = done.exception()
+        results = None if error else done.result()
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(results[index])
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.items,
+            "avg_requests_per_batch": self.items / self.batches if self.batches else 0.0,
+        }
+
+
+class InferenceServer:
+
+    def __init__(self, socket_path, embedding_model, rerankers, max_batch=64, window=0.005):
+        self.socket_path = socket_path
+        self.embedding_model = embedding_model
+        self.rerankers = rerankers
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self.embed_batcher = MicroBatcher(self._embed_batch, self.executor, max_batch, window)
+        self.score_batchers = {
+            name: MicroBatcher(
+                lambda requests, reranker=reranker: self._score_batch(reranker, requests),
+                self.executor, max_batch, window,
+            )
+            for name, reranker in rerankers.items()
+        }
+        self.started_at = time.time()
+
+    def _embed_batch(self, requests):
+        texts = [text for texts in requests for text in texts]
+        vectors = self.embedding_model.embed_documents(texts)
+        results, start = [], 0
+        for texts in requests:
+            results.append(vectors[start:start + len(texts)])
+            start += len(texts)
+        return results
+
+    def _score_batch(self, reranker, requests):
+        if hasattr(reranker, "score_many"):
+            return reranker.score_many(requests)
+        return [reranker.score(query, texts) for query, texts in requests]
+
+    async def dispatch(self, message):
+        op = message.get("op")
+        if op == "embed":
+            texts = message["texts"]
+            return await self.embed_batcher.submit(texts, len(texts))
+        if op == "score":
+            backend = message["backend"]
+            if backend not in self.score_batchers:
+                raise ValueError(f"Re-ranker '{backend}' is not loaded in the inference sidecar.")
+            texts = message["texts"]
+            return await self.score_batchers[backend].submit((message["query"], texts), len(texts))
+        if op == "ping":
+            # Name of the re-ranker actually loaded for each backend, e.g. "nli-onnx" for "nli"
+            return {
+                "rerankers": {backend: reranker.name for backend, reranker in self.rerankers.items()},
+                "uptime_seconds": time.time() - self.started_at,
+            }
+        if op == "stats":
+            return {
+                "embed": self.embed_batcher.stats(),
+                "score": {name: batcher.stats() for name, batcher in self.score_batchers.items()},
+            }
+        raise ValueError(f"Unknown operation '{op}'.")
+
+    # One connection per worker thread; its requests are answered in order
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                    message = json.loads(await reader.readexactly(size))
+                except asyncio.IncompleteReadError:
+                    return
+                try:
+                    response = {"result": await self.dispatch(message)}
+                except Exception as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(encode_message(response))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info("Inference sidecar listening on %s (rerankers: %s)", self.socket_path, ", ".join(self.rerankers))
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=config.INFERENCE_SOCKET or "/tmp/sql-exam-inference.sock")
+    parser.add_argument(
+        "--rerankers", nargs="+", default=[config.RERANKER_BACKEND],
+        choices=[name for name in RERANKER_BACKENDS if name != "none"],
+    )
+    parser.add_argument("--max-batch", type=int, default=config.INFERENCE_MAX_BATCH)
+    parser.add_argument("--window-ms", type=float, default=config.INFERENCE_BATCH_WINDOW_MS)
+    args = parser.parse_args()
+    configure_logging()
+
+    # The models are loaded here directly, never through the sidecar itself
+    embedding_model = load_embedding_model()
+    rerankers = {name: RERANKER_BACKENDS[name]() for name in args.rerankers}
+    server = InferenceServer(
+        args.socket, embedding_model, rerankers, max_batch=args.max_batch, window=args.window_ms / 1000
+    )
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
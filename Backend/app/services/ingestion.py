@@ -0,0 +1,166 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import Counter
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from app import config
+from app.services.ann_index import delete_chunks
+from app.services.cleaning import annotate_chunks, filter_irrelevant_chunks
+from app.services.index_store import index_store
+from app.services.model_registry import model_registry
+from app.utils.faiss_utils import load_embedding_model
+
+
+# Hash of a chunk's text, ignoring whitespace and case, used to skip chunks already in the index
+def content_hash(text):
+    return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+# Document id of a file: its name without extension
+def default_doc_id(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# Pages of a PDF or text file, read one at a time
+def load_pages(path):
+    if path.lower().endswith(".pdf"):
+        loader = PyPDFLoader(path)
+    else:
+        loader = TextLoader(path, encoding="utf-8")
+    return loader.lazy_load()
+
+
+# Adds and removes course material in the FAISS index without rebuilding it. Each change is applied
+# to a copy of the served index, published as a new version and hot-swapped into the model registry.
+class CorpusIngestor:
+
+    def __init__(self, store=index_store, registry=model_registry, batch_size=64, chunk_size=1000, chunk_overlap=200):
+        self.store = store
+        self.registry = registry
+        self.batch_size = batch_size
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._document_model = None
+        self._document_model_lock = threading.Lock()
+
+    # Embedder of new chunks: the FP32 PyTorch model the corpus was embedded with, also when queries
+    # go through the int8 ONNX export (INFERENCE_BACKEND=onnx), so the index keeps a single embedding
+    # space. Loaded on the first ingestion only.
+    def document_embedding_model(self, query_embedding_model):
+        if config.INFERENCE_BACKEND != "onnx":
+            return query_embedding_model
+        with self._document_model_lock:
+            if self._document_model is None:
+                self._document_model = load_embedding_model("torch")
+        return self._document_model
+
+    # Ingest files as documents ({path: doc_id}); replace=True first drops the documents' previous chunks
+    def ingest_files(self, files, replace=False):
+        embedding_model = self.registry.get("embedding_model")
+        report = {}
+
+        with self.store.writer_lock():
+            faiss_index = self.store.load_editable(embedding_model)
+            document_model = self.document_embedding_model(embedding_model)
+            if replace:
+                for doc_id in set(files.values()):
+                    self._delete_chunks(faiss_index, doc_id)
+            known_hashes = {
+                doc.metadata.get("content_hash") or content_hash(doc.page_content)
+                for doc in faiss_index.docstore._dict.values()
+            }
+
+            for path, doc_id in files.items():
+                report[doc_id] = self._ingest_file(faiss_index, document_model, path, doc_id, known_hashes)
+
+            if not any(stats["added"] for stats in report.values()) and not replace:
+                return {"version": self.store.current_version(), "documents": report}
+            version = self.store.publish(faiss_index)
+            self.store.swap(self.registry, faiss_index)
+
+        return {"version": version, "documents": report}
+
+    def _ingest_file(self, faiss_index, embedding_model, path, doc_id, known_hashes):
+        stats = Counter(chunks=0, added=0, duplicates=0, filtered=0)
+        batch = []
+
+        for page in load_pages(path):
+            for chunk in self.splitter.split_documents([page]):
+                stats["chunks"] += 1
+                chunk.metadata.update({"doc_id": doc_id, "source": os.path.basename(path)})
+                batch.append(chunk)
+                if len(batch) >= self.batch_size:
+                    self._add_batch(faiss_index, embedding_model, batch, known_hashes, stats)
+                    batch = []
+        self._add_batch(faiss_index, embedding_model, batch, known_hashes, stats)
+
+        return dict(stats)
+
+    # Filter, dedup and embed one batch of chunks, then append it to the index
+    # (the relevance flag and cleaned text are stored with each chunk, see annotate_chunks)
+    def _add_batch(self, faiss_index, embedding_model, chunks, known_hashes, stats):
+        annotate_chunks(chunks)
+        relevant = filter_irrelevant_chunks(chunks)
+        stats["filtered"] += len(chunks) - len(relevant)
+
+        new_chunks = []
+        for chunk in relevant:
+            chunk_hash = content_hash(chunk.page_content)
+            if chunk_hash in known_hashes:
+                stats["duplicates"] += 1
+                continue
+            known_hashes.add(chunk_hash)
+            chunk.metadata["content_hash"] = chunk_hash
+            new_chunks.append(chunk)
+        if not new_chunks:
+            return
+
+        texts = [chunk.page_content for chunk in new_chunks]
+        embeddings = embedding_model.embed_documents(texts)
+        faiss_index.add_embeddings(
+            list(zip(texts, embeddings)),
+            metadatas=[chunk.metadata for chunk in new_chunks],
+            ids=[str(uuid.uuid4()) for _ in new_chunks],
+        )
+        stats["added"] += len(new_chunks)
+
+    def _delete_chunks(self, faiss_index, doc_id):
+        ids = [
+            docstore_id
+            for docstore_id, doc in faiss_index.docstore._dict.items()
+            if doc.metadata.get("doc_id") == doc_id
+        ]
+        if not ids:
+            return 0
+
+        delete_chunks(faiss_index, ids)
+        return len(ids)
+
+    # Remove every chunk of a document; returns the number of chunks removed
+    def delete_document(self, doc_id):
+        embedding_model = self.registry.get("embedding_model")
+        with self.store.writer_lock():
+            faiss_index = self.store.load_editable(embedding_model)
+            deleted = self._delete_chunks(faiss_index, doc_id)
+            if not deleted:
+                return {"version": self.store.current_version(), "deleted": 0}
+            version = self.store.publish(faiss_index)
+            self.store.swap(self.registry, faiss_index)
+        return {"version": version, "deleted": deleted}
+
+    # Chunk count per document in the served index (chunks from the original build have no doc_id)
+    def list_documents(self):
+        faiss_index = self.registry.get("faiss_index")
+        counts = Counter(doc.metadata.get("doc_id") for doc in faiss_index.docstore._dict.values())
+        return {
+            "version": self.store.current_version(),
+            "documents": [{"doc_id": doc_id, "chunks": count} for doc_id, count in counts.most_common()],
+        }
+
+
+corpus_ingestor = CorpusIngestor(
+    batch_size=config.INGEST_BATCH_SIZE,
+    chunk_size=config.INGEST_CHUNK_SIZE,
+    chunk_overlap=config.INGEST_CHUNK_OVERLAP,
+)
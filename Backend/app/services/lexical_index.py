@@ -0,0 +1,180 @@
+import logging
+import os
+import re
+import threading
+import unicodedata
+import weakref
+from collections import Counter
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# BM25 postings saved next to index.faiss / index.pkl
+LEXICAL_INDEX_FILE = "bm25.npz"
+# Bump when tokenization or the stored arrays change, so saved indexes are rebuilt
+LEXICAL_INDEX_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+
+
+# Lowercase, accent-free word tokens; SQL keywords (HAVING, LEFT JOIN, COALESCE) stay whole words
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return TOKEN_PATTERN.findall(text)
+
+
+# Okapi BM25 over the chunks of a FAISS index, keyed by FAISS id. Postings are stored CSR-style in
+# flat numpy arrays: the postings of term t are doc_ids/term_freqs[offsets[t]:offsets[t + 1]].
+class BM25Index:
+
+    def __init__(self, vocabulary, offsets, doc_ids, term_freqs, doc_lengths, k1=1.2, b=0.75):
+        self.vocabulary = vocabulary  # term -> term id
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths  # per FAISS id; 0 for chunks left out of the index
+        self.k1 = k1
+        self.b = b
+        indexed = doc_lengths > 0
+        self.doc_count = int(indexed.sum())
+        self.avg_length = float(doc_lengths[indexed].mean()) if self.doc_count else 0.0
+        doc_freqs = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((self.doc_count - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+    # Build from {FAISS id: text}; n_ids is the number of ids of the FAISS index
+    @classmethod
+    def build(cls, texts, n_ids, k1=1.2, b=0.75):
+        vocabulary = {}
+        term_ids, doc_ids, term_freqs = [], [], []
+        doc_lengths = np.zeros(n_ids, dtype=np.float32)
+
+        for doc_id, text in texts.items():
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(count)
+
+        # Group the postings by term
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=offsets[1:])
+
+        return cls(
+            vocabulary,
+            offsets,
+            np.asarray(doc_ids, dtype=np.int32)[order],
+            np.asarray(term_freqs, dtype=np.float32)[order],
+            doc_lengths,
+            k1,
+            b,
+        )
+
+    # FAISS ids of the k best-scoring chunks, best first
+    def search(self, query, k):
+        term_ids = {self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary}
+        if not term_ids or not self.doc_count:
+            return []
+
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            ids = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[ids] / self.avg_length)
+            scores[ids] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + norm)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        return candidates[np.argsort(-scores[candidates], kind="stable")].tolist()
+
+    def save(self, path):
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            version=np.array([LEXICAL_INDEX_VERSION]),
+            vocabulary=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b]),
+        )
+        os.replace(tmp_path, path)
+
+    # Saved index, or None when missing or saved by another version
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(path) as data:
+                if int(data["version"][0]) != LEXICAL_INDEX_VERSION:
+                    return None
+                text = data["vocabulary"].tobytes().decode("utf-8")
+                terms = text.split("\n") if text else []
+                k1, b = data["params"].tolist()
+                return cls(
+                    {term: term_id for term_id, term in enumerate(terms)},
+                    data["offsets"],
+                    data["doc_ids"],
+                    data["term_freqs"],
+                    data["doc_lengths"],
+                    k1,
+                    b,
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+# Reciprocal rank fusion: score(id) = sum over rankings of 1 / (k + rank); returns ids best first
+def reciprocal_rank_fusion(rankings, k=60, limit=None):
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return fused[:limit] if limit else fused
+
+
+_lexical_indexes = weakref.WeakKeyDictionary()
+_lexical_lock = threading.Lock()
+
+
+# Build the BM25 index of a vector store over the given (eligible) FAISS ids
+def build_lexical_index(faiss_index, ids):
+    docstore = faiss_index.docstore
+    texts = {
+        int(position): docstore.search(faiss_index.index_to_docstore_id[int(position)]).page_content
+        for position in ids
+    }
+    return BM25Index.build(texts, faiss_index.index.ntotal)
+
+
+# BM25 index of a loaded vector store: loaded from index_path when saved there and still matching
+# the index, built otherwise (and saved when index_path is given)
+def get_lexical_index(faiss_index, ids, index_path=None):
+    with _lexical_lock:
+        if faiss_index in _lexical_indexes:
+            return _lexical_indexes[faiss_index]
+
+        path = os.path.join(index_path, LEXICAL_INDEX_FILE) if index_path else None
+        lexical_index = BM25Index.load(path) if path else None
+        if lexical_index is not None and (
+            len(lexical_index.doc_lengths) != faiss_index.index.ntotal or lexical_index.doc_count != len(ids)
+        ):
+            lexical_index = None  # Saved for another version of the index
+
+        if lexical_index is None:
+            lexical_index = build_lexical_index(faiss_index, ids)
+            if path:
+                try:
+                    lexical_index.save(path)
+                except OSError as e:
+                    logger.warning("Could not save the BM25 index to %s: %s", path, e)
+
+        _lexical_indexes[faiss_index] = lexical_index
+        return lexical_index
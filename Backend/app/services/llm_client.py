@@ -0,0 +1,269 @@
+import asyncio
+import itertools
+import json
+import queue
+import threading
+import time
+import httpx
+from app import config
+from app.utils.telemetry import metrics
+
+
+# Token counts per LLM call, for the llm_*_tokens histograms
+TOKEN_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+# Raised when a generation call misses its deadline
+class LLMTimeoutError(TimeoutError):
+    pass
+
+
+# Raised when every Ollama server failed to answer
+class LLMUnavailableError(RuntimeError):
+    pass
+
+
+# One Ollama server and its pooled HTTP connections
+class OllamaEndpoint:
+
+    def __init__(self, url, max_connections):
+        self.url = url.rstrip("/")
+        self.max_connections = max_connections
+        self.client = None  # created on the client's event loop
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.latency_total = 0.0
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_avg_seconds": self.latency_total / self.requests if self.requests else 0.0,
+        }
+
+
+# Ollama client with pooled async HTTP connections, a global concurrency limit, per-call deadlines,
+# load balancing across several servers and token streaming.
+# It runs on its own event loop thread, so both the worker threads of the exam pipeline (invoke)
+# and async code (ainvoke, astream) can use it; invoke() matches OllamaLLM.invoke().
+class OllamaClient:
+
+    def __init__(self, hosts, model, max_concurrency=4, timeout=120.0, format="", balancing="least-loaded"):
+        if not hosts:
+            raise ValueError("At least one Ollama host is required.")
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.format = format
+        self.balancing = balancing
+        self.endpoints = [OllamaEndpoint(host, max_concurrency) for host in hosts]
+        self._round_robin = itertools.cycle(range(len(self.endpoints)))
+        self._loop = None
+        self._semaphore = None
+        self._start_lock = threading.Lock()
+
+        # Counters
+        self.waiting = 0
+        self.timeouts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    # Start the client's event loop thread on first use
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="ollama-client", daemon=True).start()
+                self._semaphore = asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    async def _setup(self):
+        for endpoint in self.endpoints:
+            endpoint.client = httpx.AsyncClient(
+                base_url=endpoint.url,
+                limits=httpx.Limits(max_connections=endpoint.max_connections, max_keepalive_connections=endpoint.max_connections),
+                timeout=httpx.Timeout(None, connect=10.0),
+            )
+        return asyncio.Semaphore(self.max_concurrency)
+
+    # Least-loaded server (round-robin among ties), or plain round-robin
+    def _pick_endpoint(self, exclude=()):
+        candidates = [index for index in range(len(self.endpoints)) if self.endpoints[index] not in exclude]
+        start = next(self._round_robin)
+        ordered = sorted(candidates, key=lambda index: (index - start) % len(self.endpoints))
+        if self.balancing == "least-loaded":
+            ordered.sort(key=lambda index: self.endpoints[index].in_flight)
+        return self.endpoints[ordered[0]]
+
+    def _payload(self, prompt, stream, format, options):
+        payload = {"model": self.model, "prompt": prompt, "stream": stream}
+        format = self.format if format is None else format
+        if format:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
+        return payload
+
+    def _record_usage(self, result):
+        prompt_tokens, completion_tokens = result.get("prompt_eval_count", 0), result.get("eval_count", 0)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        if prompt_tokens or completion_tokens:
+            metrics.observe("llm_prompt_tokens", prompt_tokens, buckets=TOKEN_BUCKETS)
+            metrics.observe("llm_completion_tokens", completion_tokens, buckets=TOKEN_BUCKETS)
+
+    # Wait for a free slot, then send the request to one server, failing over to the others
+    async def _request(self, send):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        try:
+            tried = []
+            while len(tried) < len(self.endpoints):
+                endpoint = self._pick_endpoint(exclude=tried)
+                tried.append(endpoint)
+                endpoint.in_flight += 1
+                started_at = time.perf_counter()
+                try:
+                    return await send(endpoint)
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    endpoint.errors += 1
+                    error = e
+                finally:
+                    endpoint.in_flight -= 1
+                    endpoint.requests += 1
+                    endpoint.latency_total += time.perf_counter() - started_at
+            raise LLMUnavailableError(f"No Ollama server could answer: {error}")
+        finally:
+            self._semaphore.release()
+
+    async def _generate(self, prompt, timeout, format, options):
+        async def send(endpoint):
+            response = await endpoint.client.post("/api/generate", json=self._payload(prompt, False, format, options))
+            response.raise_for_status()
+            result = response.json()
+            self._record_usage(result)
+            return result["response"]
+
+        try:
+            return await asyncio.wait_for(self._request(send), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Ollama generation exceeded {timeout or self.timeout:.0f} s.")
+
+    # Stream tokens to on_token(token); returns once the generation is done
+    async def _stream(self, prompt, on_token, timeout, format, options):
+        async def send(endpoint):
+            emitted = False
+            payload = self._payload(prompt, True, format, options)
+            try:
+                async with endpoint.client.stream("POST", "/api/generate", json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("response"):
+                            emitted = True
+                            on_token(chunk["response"])
+                        if chunk.get("done"):
+                            self._record_usage(chunk)
+            except httpx.TransportError as e:
+                # Tokens were already delivered: failing over would repeat them
+                if emitted:
+                    raise LLMUnavailableError(f"Ollama stream interrupted: {e}")
+                raise
+
+        try:
+            await asyncio.wait_for(self._request(send), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Ollama generation exceeded {timeout or self.timeout:.0f} s.")
+
+    # Blocking generation, for worker threads (same interface as OllamaLLM.invoke)
+    def invoke(self, prompt, timeout=None, format=None, options=None):
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._generate(prompt, timeout, format, options), loop).result()
+
+    # Generation from async code running on another event loop
+    async def ainvoke(self, prompt, timeout=None, format=None, options=None):
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._generate(prompt, timeout, format, options), loop)
+        return await asyncio.wrap_future(future)
+
+    # Blocking token stream, for worker threads
+    def stream(self, prompt, timeout=None, format=None, options=None):
+        loop = self._ensure_loop()
+        tokens = queue.Queue()
+        done = object()
+        future = asyncio.run_coroutine_threadsafe(self._stream(prompt, tokens.put, timeout, format, options), loop)
+        future.add_done_callback(lambda _: tokens.put(done))
+        while True:
+            token = tokens.get()
+            if token is done:
+                future.result()  # re-raise errors
+                return
+            yield token
+
+    # Async token stream, for async code running on another event loop
+    async def astream(self, prompt, timeout=None, format=None, options=None):
+        loop = self._ensure_loop()
+        caller_loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        done = object()
+
+        def on_token(token):
+            caller_loop.call_soon_threadsafe(tokens.put_nowait, token)
+
+        future = asyncio.run_coroutine_threadsafe(self._stream(prompt, on_token, timeout, format, options), loop)
+        future.add_done_callback(lambda _: caller_loop.call_soon_threadsafe(tokens.put_nowait, done))
+        while True:
+            token = await tokens.get()
+            if token is done:
+                future.result()
+                return
+            yield token
+
+    def stats(self):
+        return {
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "waiting": self.waiting,
+            "timeouts": self.timeouts,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+        }
+
+    def close(self):
+        if self._loop is None:
+            return
+
+        async def aclose():
+            for endpoint in self.endpoints:
+                await endpoint.client.aclose()
+
+        asyncio.run_coroutine_threadsafe(aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+
+def create_llm_client():
+    return OllamaClient(
+        config.OLLAMA_HOSTS,
+        config.OLLAMA_MODEL,
+        max_concurrency=config.OLLAMA_MAX_CONCURRENCY,
+        timeout=config.OLLAMA_TIMEOUT_SECONDS,
+        format=config.OLLAMA_FORMAT,
+        balancing=config.OLLAMA_BALANCING,
+    )
+
+
+llm_client = create_llm_client()
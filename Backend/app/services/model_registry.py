@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import config
+from app.services.reranker import get_reranker
+from app.services.index_store import index_store
+from app.utils.faiss_utils import load_embedding_model
+
+logger = logging.getLogger(__name__)
+
+
+# A named resource (model, index) with its loader, optional warm-up and load state
+class RegisteredResource:
+
+    def __init__(self, name, loader, warmup=None, depends_on=()):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.depends_on = depends_on
+        self.value = None
+        self.status = "pending"  # pending, loading, ready or failed
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.lock = threading.Lock()
+
+
+# Registry of heavy resources, loaded concurrently at startup or lazily on first use
+class ModelRegistry:
+
+    def __init__(self, warmup=True):
+        self.warmup = warmup
+        self._resources = {}
+
+    def register(self, name, loader, warmup=None, depends_on=()):
+        self._resources[name] = RegisteredResource(name, loader, warmup, depends_on)
+
+    # Return a resource, loading it (and what it depends on) first if needed; blocks while loading
+    def get(self, name):
+        resource = self._resources[name]
+        if resource.status == "ready":
+            return resource.value
+
+        with resource.lock:
+            if resource.status != "ready":
+                self._load(resource)
+        return resource.value
+
+    # Same as get(), without blocking the event loop
+    async def aget(self, name):
+        resource = self._resources[name]
+        if resource.status == "ready":
+            return resource.value
+        return await asyncio.to_thread(self.get, name)
+
+    # Replace a loaded resource, e.g. to hot-swap a new index version
+    def set(self, name, value):
+        resource = self._resources[name]
+        with resource.lock:
+            resource.value = value
+            resource.status = "ready"
+            resource.error = None
+
+    def _load(self, resource):
+        resource.status = "loading"
+        try:
+            dependencies = {dependency: self.get(dependency) for dependency in resource.depends_on}
+            started_at = time.perf_counter()
+            value = resource.loader(**dependencies)
+            if value is None:
+                raise RuntimeError(f"Loading '{resource.name}' returned nothing.")
+            resource.load_seconds = time.perf_counter() - started_at
+
+            if self.warmup and resource.warmup:
+                started_at = time.perf_counter()
+                resource.warmup(value)
+                resource.warmup_seconds = time.perf_counter() - started_at
+
+            resource.value = value
+            resource.status = "ready"
+            resource.error = None
+            logger.info("Loaded %s", resource.name, extra={"seconds": round(resource.load_seconds, 1)})
+        except Exception as e:
+            # Leave the resource retryable: the next get() loads it again
+            resource.status = "failed"
+            resource.error = str(e)
+            logger.exception("Error loading %s", resource.name)
+            raise
+
+    # Load every registered resource concurrently; dependencies are waited for, not loaded twice
+    def load_all(self):
+        with ThreadPoolExecutor(max_workers=max(len(self._resources), 1), thread_name_prefix="model-loading") as executor:
+            futures = [executor.submit(self.get, name) for name in self._resources]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception:
+                    pass  # Reported through status()
+
+    def is_ready(self):
+        return all(resource.status == "ready" for resource in self._resources.values())
+
+    def status(self):
+        return {
+            name: {
+                "status": resource.status,
+                "error": resource.error,
+                "load_seconds": resource.load_seconds,
+                "warmup_seconds": resource.warmup_seconds,
+            }
+            for name, resource in self._resources.items()
+        }
+
+
+# Embeddings computed by the inference sidecar when one is configured, in this process otherwise
+def load_embeddings():
+    if config.INFERENCE_SOCKET:
+        from app.services.inference_client import SidecarEmbeddings
+        return SidecarEmbeddings()
+    return load_embedding_model()
+
+
+def create_model_registry():
+    registry = ModelRegistry(warmup=config.MODEL_WARMUP)
+    registry.register(
+        "embedding_model",
+        load_embeddings,
+        warmup=lambda model: model.embed_query("warm-up"),
+    )
+    registry.register(
+        "faiss_index",
+        index_store.load,
+        warmup=lambda index: index.similarity_search("warm-up", k=1),
+        depends_on=("embedding_model",),
+    )
+    registry.register(
+        "reranker",
+        get_reranker,
+        warmup=lambda reranker: reranker.score("warm-up", ["warm-up"]),
+    )
+    return registry
+
+
+model_registry = create_model_registry()
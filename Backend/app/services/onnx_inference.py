@@ -0,0 +1,196 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+import onnxruntime as ort
+import torch
+from langchain_core.embeddings import Embeddings
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from transformers import AutoConfig, AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+from app import config
+from app.services.reranker import CrossEncoderReRanker, NLIReRanker
+
+logger = logging.getLogger(__name__)
+
+# Files of an exported model, next to its tokenizer and config
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+ONNX_OPSET = 17
+# Sequence length the sentence-transformers pipeline of all-MPNet-base-v2 truncates to
+EMBEDDING_MAX_LENGTH = 384
+
+_export_lock = threading.Lock()
+
+
+# Hub id of a sentence-transformers model: short names ("all-MPNet-base-v2") live under sentence-transformers/
+def hub_model_id(model_name):
+    if "/" in model_name or os.path.isdir(model_name):
+        return model_name
+    return f"sentence-transformers/{model_name}"
+
+
+# Directory of a model's export under ONNX_MODEL_DIR
+def export_path(model_name, model_dir=None):
+    return os.path.join(model_dir or config.ONNX_MODEL_DIR, model_name.replace("/", "--"))
+
+
+# Model returning one named output from positional inputs, the form torch.onnx.export traces
+class _NamedOutput(torch.nn.Module):
+
+    def __init__(self, model, input_names, output_name):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+        self.output_name = output_name
+
+    def forward(self, *inputs):
+        return self.model(**dict(zip(self.input_names, inputs)))[self.output_name]
+
+
+# Export a Hugging Face model to ONNX, in FP32 and with int8 weights (dynamic quantization), along with
+# its tokenizer and config so it loads without the original weights. kind is "embedding" (token
+# states) or "sequence-classification" (logits). The export is written to a temporary directory then
+# renamed, so a worker never loads a half-written model from another one.
+def export_model(model_name, kind, model_dir=None):
+    target = export_path(model_name, model_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".export-", dir=os.path.dirname(target))
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if kind == "embedding":
+            model, output_name = AutoModel.from_pretrained(model_name), "last_hidden_state"
+            sample = tokenizer(["requête SQL", "jointure"], padding=True, return_tensors="pt")
+            output_axes = {0: "batch", 1: "sequence"}
+        else:
+            model, output_name = AutoModelForSequenceClassification.from_pretrained(model_name), "logits"
+            sample = tokenizer(["requête SQL", "jointure"], ["passage", "autre passage"], padding=True, return_tensors="pt")
+            output_axes = {0: "batch"}
+        model.eval()
+
+        input_names = [name for name in tokenizer.model_input_names if name in sample]
+        fp32_path = os.path.join(staging, FP32_FILE)
+        with torch.no_grad():
+            torch.onnx.export(
+                _NamedOutput(model, input_names, output_name),
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=[output_name],
+                dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names}, output_name: output_axes},
+                opset_version=ONNX_OPSET,
+                do_constant_folding=True,
+            )
+        # Weights quantized per output channel ahead of time, activations at run time
+        quantize_dynamic(fp32_path, os.path.join(staging, INT8_FILE), weight_type=QuantType.QInt8, per_channel=True)
+        tokenizer.save_pretrained(staging)
+        model.config.save_pretrained(staging)
+
+        try:
+            os.rename(staging, target)
+        except OSError:
+            logger.info("ONNX export of %s already published by another process", model_name)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+# Export directory of a model, exporting it first when it isn't there yet
+def ensure_exported(model_name, kind):
+    path = export_path(model_name)
+    if not os.path.exists(os.path.join(path, INT8_FILE)):
+        with _export_lock:
+            if not os.path.exists(os.path.join(path, INT8_FILE)):
+                logger.info("Exporting %s to ONNX", model_name)
+                export_model(model_name, kind)
+    return path
+
+
+# CPU ONNX Runtime session of an exported model: the int8 weights unless ONNX_QUANTIZE=0
+def create_session(model_path):
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = config.ONNX_INTRA_OP_THREADS
+    options.inter_op_num_threads = config.ONNX_INTER_OP_THREADS
+    model_file = os.path.join(model_path, INT8_FILE if config.ONNX_QUANTIZE else FP32_FILE)
+    return ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+
+
+# Tokenizer outputs the exported graph takes, as int64 arrays
+def session_inputs(session, encoded):
+    return {item.name: np.asarray(encoded[item.name], dtype=np.int64) for item in session.get_inputs()}
+
+
+# Sentence embeddings from the ONNX export of a sentence-transformers model: token states mean-pooled
+# over the attention mask then L2-normalized, as the PyTorch pipeline of all-MPNet-base-v2 does
+class OnnxEmbeddings(Embeddings):
+
+    def __init__(self, model_name, batch_size=32, max_length=EMBEDDING_MAX_LENGTH):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        model_path = ensure_exported(hub_model_id(model_name), "embedding")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.session = create_session(model_path)
+
+    def embed_documents(self, texts):
+        vectors = [None] * len(texts)
+        # Texts of similar length batched together, as in the re-ranker
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), self.batch_size):
+            batch_ids = order[start:start + self.batch_size]
+            for i, vector in zip(batch_ids, self.embed([texts[i] for i in batch_ids]).tolist()):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed([text])[0].tolist()
+
+    def embed(self, texts):
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        states = self.session.run(["last_hidden_state"], session_inputs(self.session, encoded))[0]
+        mask = encoded["attention_mask"][..., None].astype(states.dtype)
+        pooled = (states * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+
+# Pair classifier re-ranker running the ONNX export on ONNX Runtime instead of the PyTorch model.
+# Logits come back as a tensor so the scoring of each re-ranker (logits_to_scores) is shared.
+class OnnxPairClassifierMixin:
+
+    def load_model(self, model_name, device=None):
+        self.device = "cpu"
+        model_path = ensure_exported(model_name, "sequence-classification")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model_config = AutoConfig.from_pretrained(model_path)
+        self.session = create_session(model_path)
+
+    def forward(self, first, second):
+        encoded = self.tokenizer(
+            first,
+            second,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np",
+        )
+        logits = self.session.run(["logits"], session_inputs(self.session, encoded))[0]
+        return torch.from_numpy(logits)
+
+
+# Named apart from the PyTorch re-rankers: the name is part of the (persisted) retrieval cache key,
+# and the two backends don't produce exactly the same rankings
+class OnnxNLIReRanker(OnnxPairClassifierMixin, NLIReRanker):
+    name = "nli-onnx"
+
+
+class OnnxCrossEncoderReRanker(OnnxPairClassifierMixin, CrossEncoderReRanker):
+    name = "cross-encoder-onnx"
+
+
+# ONNX Runtime variant of each pair classifier backend, by the PyTorch re-ranker's name
+ONNX_RERANKERS = {
+    NLIReRanker.name: OnnxNLIReRanker,
+    CrossEncoderReRanker.name: OnnxCrossEncoderReRanker,
+}
@@ -1,25 +1,46 @@
+import logging
 from app.services.retrieval import retrieve_and_rerank
 from app.services.cleaning import clean_relevant_chunks_for_question_generation
 from app.services.question_generator import generate_questions_parallel
+from app.services.question_bank import question_bank
+from app.services.selection import candidate_depth, select_diverse, plan_question_slots
+from app.utils.telemetry import stage
+
+logger = logging.getLogger(__name__)
 
 # Optimized exam generation pipeline
-def exam_pipeline(query, question_type, question_nbr, faiss_index, ollama_model, difficulty="intermediate", k=25, top_n=5):
+# Each step is timed (exam_stage_seconds on /metrics) and traced as a span of the "pipeline" span
+def exam_pipeline(query, question_type, question_nbr, faiss_index, ollama_model, difficulty="intermediate", k=25, top_n=5, on_question=None, use_question_bank=True):
+    with stage("pipeline", question_type=question_type, question_nbr=question_nbr):
+        k, top_n = candidate_depth(question_nbr, k, top_n)
+        with stage("retrieve", k=k, top_n=top_n):
+            re_ranked_docs = retrieve_and_rerank(query, faiss_index, k, top_n)
 
-    print("Retrieving relevant documents...")
-    re_ranked_docs = retrieve_and_rerank(query, faiss_index, k, top_n)
+        if not re_ranked_docs:
+            logger.warning("No documents found for the query", extra={"query": query})
+            return {}
 
-    if not re_ranked_docs:
-        print("No documents found for the given query.")
-        return {}
+        # Relevant but mutually different chunks, so near-duplicate chunks don't give near-duplicate questions
+        with stage("select"):
+            selected_docs = select_diverse(re_ranked_docs, faiss_index, question_nbr)
 
-    print(f"Retrieved {len(re_ranked_docs)} documents.")
+        with stage("clean"):
+            cleaned_chunks = clean_relevant_chunks_for_question_generation(selected_docs, min_chunk_length=30)
 
-    print("Cleaning retrieved content...")
-    cleaned_chunks = clean_relevant_chunks_for_question_generation(re_ranked_docs, min_chunk_length=30)
-    print(f"Normalized to {len(cleaned_chunks)} valid chunks.")
+        # Several distinct questions per chunk when there are fewer chunks than questions
+        contents, variants = plan_question_slots(cleaned_chunks, question_nbr)
 
-    print("Generating questions...")
-    exam = {"questions": generate_questions_parallel(cleaned_chunks, query, question_type, question_nbr, ollama_model, difficulty)}
+        with stage("generate", question_nbr=question_nbr):
+            questions = generate_questions_parallel(
+                contents, query, question_type, question_nbr, ollama_model, difficulty, on_question,
+                question_bank if use_question_bank else None, variants=variants,
+            )
+        exam = {"questions": [question.dict() for question in questions]}
 
-    print(f"Generated {len(exam['questions'])} questions.")
+    logger.info("Exam generated", extra={
+        "retrieved": len(re_ranked_docs),
+        "chunks": len(cleaned_chunks),
+        "questions": len(exam["questions"]),
+        "requested": question_nbr,
+    })
     return exam
@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import random
+import re
+from datetime import datetime
+from pymongo.errors import PyMongoError
+from app import config
+from app.database import database
+from app.schemas.exam import Question
+from app.services.question_parser import QuestionParseError, parse_question
+
+logger = logging.getLogger(__name__)
+
+
+# Content hash of a chunk, insensitive to whitespace differences
+def chunk_hash(content):
+    normalized = re.sub(r"\s+", " ", content).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+# Persistent bank of generated questions, indexed by (chunk hash, question type, difficulty)
+# Used from the exam generation worker threads, hence the synchronous collection. The collection is
+# taken from the shared Database on each use: its sync client is opened on first use with the pool
+# settings and closed by the app lifespan, not at import.
+class QuestionBank:
+
+    def __init__(self, db=None):
+        self.db = db or database
+
+    @property
+    def collection(self):
+        return self.db.sync_database()["question_bank"]
+
+    # Return one banked question per chunk (None where the bank has nothing), picking variants at random
+    def lookup(self, contents, question_type, difficulty):
+        hashes = [chunk_hash(content) for content in contents]
+        try:
+            cursor = self.collection.find(
+                {"chunk_hash": {"$in": list(set(hashes))}, "question_type": question_type, "difficulty": difficulty},
+                {"chunk_hash": 1, "question_data": 1},
+            )
+            variants = {}
+            for doc in cursor:
+                variants.setdefault(doc["chunk_hash"], []).append(doc["question_data"])
+        except PyMongoError as e:
+            logger.warning("Question bank lookup failed: %s", e)
+            return [None] * len(contents)
+
+        banked = []
+        for content, content_hash in zip(contents, hashes):
+            question = None
+            while variants.get(content_hash) and question is None:
+                # Remove the variant so a chunk repeated in the same exam gets a different question
+                question_data = variants[content_hash].pop(random.randrange(len(variants[content_hash])))
+                question = self._to_question(question_data, question_type, content)
+            banked.append(question)
+        return banked
+
+    # Stored question fields, or a raw model answer for entries banked before questions were parsed
+    @staticmethod
+    def _to_question(question_data, question_type, content):
+        try:
+            if isinstance(question_data, dict) and "question_text" in question_data:
+                return Question(**{**question_data, "source": content})
+            return parse_question(question_data, question_type, source=content)
+        except (QuestionParseError, ValueError, TypeError):
+            return None
+
+    def count(self, content, question_type, difficulty):
+        return self.collection.count_documents(
+            {"chunk_hash": chunk_hash(content), "question_type": question_type, "difficulty": difficulty}
+        )
+
+    # Add newly generated questions to the bank
+    def add(self, questions, difficulty, query=None):
+        documents = [
+            {
+                "chunk_hash": chunk_hash(question.source),
+                "question_type": question.type,
+                "difficulty": difficulty,
+                "source_content": question.source,
+                "question_data": question.dict(exclude={"source"}),
+                "query": query,
+                "created_at": datetime.utcnow(),
+            }
+            for question in questions
+        ]
+        if not documents:
+            return
+        try:
+            self.collection.insert_many(documents, ordered=False)
+        except PyMongoError as e:
+            logger.warning("Question bank insert failed: %s", e)
+
+
+def create_question_bank():
+    if not config.QUESTION_BANK_ENABLED:
+        return None
+    return QuestionBank()
+
+
+question_bank = create_question_bank()
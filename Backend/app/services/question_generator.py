@@ -1,58 +1,166 @@
-from concurrent.futures import ThreadPoolExecutor
-import tqdm
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import json
+import logging
+from app import config
+from app.services.coalescing import question_flight
+from app.services.question_parser import QuestionParseError, build_question, parse_question
+from app.utils.telemetry import metrics, stage, submit_in_context
 
-# Generate questions in parallel to speed up the process
-def generate_questions_parallel(base, query, question_type, question_nbr, ollama_model, difficulty):
-    def generate_question(content):
+logger = logging.getLogger(__name__)
+
+# Generate one validated question of the given type from a chunk (raises QuestionParseError)
+# variant > 0 asks for another question on a chunk that already has one in the exam
+# Concurrent identical generations (same chunk, query, type, difficulty and variant, e.g. from
+# coalesced class requests) call the LLM once
+def generate_question(content, query, question_type, ollama_model, difficulty, variant=0):
+    if config.COALESCING_ENABLED:
+        key = (content, query, question_type.lower(), difficulty, variant)
+        return question_flight.do(key, _generate_question, content, query, question_type, ollama_model, difficulty, variant)
+    return _generate_question(content, query, question_type, ollama_model, difficulty, variant)
+
+
+# Timed as the "question" stage: the per-question LLM latency
+def _generate_question(content, query, question_type, ollama_model, difficulty, variant=0):
+    with stage("question", question_type=question_type.lower()):
         if question_type.lower() == "mcq":
-            return {
-                "type": "mcq",
-                "source_content": content,
-                "question_data": generate_mcq(content, query, ollama_model, difficulty)
-            }
+            return generate_mcq(content, query, ollama_model, difficulty, variant)
         elif question_type.lower() == "open-ended":
-            return {
-                "type": "open-ended",
-                "source_content": content,
-                "question_data": generate_open_ended(content, query, ollama_model, difficulty)
-            }
+            return generate_open_ended(content, query, ollama_model, difficulty, variant)
         else:
             raise ValueError("Invalid question type. Use 'mcq' or 'open-ended'.")
 
-    with ThreadPoolExecutor() as executor:
-        questions = list(
-            tqdm.tqdm(
-                executor.map(generate_question, base[:question_nbr]),
-                total=question_nbr,
-                desc="Generating Questions"
-            )
-        )
-    return questions
 
+# Failures of one question that are retried within the exam's retry budget: invalid LLM output
+# (QuestionParseError), timeouts and connection errors. Programming errors (e.g. the ValueError of an
+# invalid question type) fail the exam.
+PROGRAMMING_ERRORS = (ValueError, TypeError, KeyError, AttributeError, IndexError)
 
-def generate_mcq(content, query, ollama_model, difficulty="intermédiaire"):
-    """
-    Génère des questions à choix multiples (QCM) en français à partir du contenu fourni,
-    en respectant la requête de l'utilisateur et en tenant compte du niveau de difficulté spécifié.
-    
-    Args:
-        content (str): Le contenu pour générer les questions.
-        query (str): La requête de l'utilisateur, qui doit guider les questions.
-        difficulty (str): Le niveau de difficulté ('débutant', 'intermédiaire', 'avancé').
 
-    Returns:
-        dict: Question générée avec les options, la réponse correcte et une explication.
-    """
-    
-    # Guide for difficulty levels as a dictionary
-    difficulty_guide = {
-        "débutant": "Questions simples qui testent des connaissances de base. Exemples : définitions, faits élémentaires.",
-        "intermédiaire": "Questions qui nécessitent une compréhension plus approfondie et l'application de concepts. Exemples : analyse de cas, choix entre plusieurs options.",
-        "avancé": "Questions complexes qui demandent une réflexion critique et une synthèse des informations. Exemples : résolution de problèmes, interprétation de données."
-    }
+def is_retryable(error):
+    return isinstance(error, QuestionParseError) or not isinstance(error, PROGRAMMING_ERRORS)
+
+
+# Generate questions in parallel to speed up the process
+# on_question(index, question) is called as soon as each question is available
+# Questions already in the question bank are served from it; only the shortfall goes to the LLM
+# batch_size > 1 packs several chunks into one prompt (defaults to QUESTION_BATCH_SIZE)
+# Questions (or batches) that fail (validation, LLM timeouts or errors) are regenerated individually, within retry_budget for the whole exam
+# variants[i] > 0 marks a chunk repeated in base (see selection.plan_question_slots); those are generated individually
+def generate_questions_parallel(base, query, question_type, question_nbr, ollama_model, difficulty, on_question=None, question_bank=None, batch_size=None, retry_budget=None, variants=None):
+    if question_type.lower() not in ("mcq", "open-ended"):
+        raise ValueError("Invalid question type. Use 'mcq' or 'open-ended'.")
+
+    contents = base[:question_nbr]
+    variants = (variants or [0] * len(base))[:question_nbr]
+    questions = [None] * len(contents)
+
+    if question_bank:
+        for index, question in enumerate(question_bank.lookup(contents, question_type.lower(), difficulty)):
+            if question:
+                questions[index] = question
+                if on_question:
+                    on_question(index, question)
+
+    missing = [index for index, question in enumerate(questions) if question is None]
+    if question_bank:
+        metrics.count("question_bank_lookups_total", len(contents) - len(missing), result="hit")
+        metrics.count("question_bank_lookups_total", len(missing), result="miss")
+    if missing:
+        batch_size = batch_size or config.QUESTION_BATCH_SIZE
+        retry_budget = config.QUESTION_RETRY_BUDGET if retry_budget is None else retry_budget
+        # No more threads than the LLM client lets through at once
+        with ThreadPoolExecutor(max_workers=config.OLLAMA_MAX_CONCURRENCY) as executor:
+            def submit_single(index):
+                future = submit_in_context(
+                    executor, generate_question, contents[index], query, question_type, ollama_model, difficulty, variants[index]
+                )
+                pending[future] = (index, None)
+
+            # Several chunks per LLM call when batching; items that fail validation are retried one by one
+            pending = {}
+            if batch_size > 1:
+                first_variants = [index for index in missing if not variants[index]]
+                for start in range(0, len(first_variants), batch_size):
+                    batch = first_variants[start:start + batch_size]
+                    future = submit_in_context(
+                        executor, generate_question_batch, [contents[index] for index in batch], query, question_type, ollama_model, difficulty
+                    )
+                    pending[future] = (None, batch)
+                for index in missing:
+                    if variants[index]:
+                        submit_single(index)
+            else:
+                for index in missing:
+                    submit_single(index)
 
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, batch = pending.pop(future)
+                    if future.exception() is not None and not is_retryable(future.exception()):
+                        raise future.exception()
+                    if batch is not None:
+                        if future.exception() is not None:
+                            logger.warning("Question batch failed, retrying its questions one by one: %s", future.exception())
+                            generated = [(index, None) for index in batch]
+                        else:
+                            generated = list(zip(batch, future.result()))
+                    elif future.exception() is None:
+                        generated = [(index, future.result())]
+                    else:
+                        logger.warning(
+                            "Question generation failed: %s", future.exception(), extra={"question": index + 1}
+                        )
+                        generated = [(index, None)]
+
+                    for index, question in generated:
+                        if question is None:
+                            if retry_budget > 0:
+                                retry_budget -= 1
+                                submit_single(index)
+                            else:
+                                logger.warning("Retry budget exhausted, dropping a question", extra={"question": index + 1})
+                            continue
+                        questions[index] = question
+                        logger.debug("Question generated", extra={"question": index + 1, "of": len(contents)})
+                        if on_question:
+                            on_question(index, question)
+
+        if question_bank:
+            question_bank.add([questions[index] for index in missing if questions[index]], difficulty, query)
+
+    # Keep the questions in chunk order regardless of completion order
+    return [question for question in questions if question is not None]
+
+
+# Guide for difficulty levels, per question type
+MCQ_DIFFICULTY_GUIDE = {
+    "débutant": "Questions simples qui testent des connaissances de base. Exemples : définitions, faits élémentaires.",
+    "intermédiaire": "Questions qui nécessitent une compréhension plus approfondie et l'application de concepts. Exemples : analyse de cas, choix entre plusieurs options.",
+    "avancé": "Questions complexes qui demandent une réflexion critique et une synthèse des informations. Exemples : résolution de problèmes, interprétation de données."
+}
+
+OPEN_ENDED_DIFFICULTY_GUIDE = {
+    "débutant": "Questions simples qui invitent à une réflexion de base. Réponses courtes et directes. Accent sur la compréhension élémentaire.",
+    "intermédiaire": "Questions qui encouragent une analyse plus approfondie. Réponses nécessitant une explication structurée et des exemples.",
+    "avancé": "Questions complexes qui stimulent une pensée critique et une analyse approfondie. Réponses détaillées, argumentées et nuancées."
+}
+
+
+# Extra instruction for the second, third... question generated from the same chunk
+def variant_instruction(variant):
+    if not variant:
+        return ""
+    return (
+        f"Une autre question a déjà été posée sur ce contenu : cette question n°{variant + 1} doit porter "
+        "sur un aspect différent du contenu et ne pas reformuler une question précédente."
+    )
+
+
+# Build the MCQ prompt for one chunk
+def build_mcq_prompt(content, query, difficulty="intermédiaire", variant=0):
     # Accessing the appropriate guide based on the specified difficulty
-    guide_description = difficulty_guide.get(difficulty, "Niveau de difficulté non reconnu. Veuillez choisir entre 'débutant', 'intermédiaire' ou 'avancé'.")
+    guide_description = MCQ_DIFFICULTY_GUIDE.get(difficulty, "Niveau de difficulté non reconnu. Veuillez choisir entre 'débutant', 'intermédiaire' ou 'avancé'.")
 
     prompt = f"""
     Vous êtes un assistant spécialisé dans la génération de questions à choix multiples (QCM) en français.
@@ -90,37 +198,39 @@ def generate_mcq(content, query, ollama_model, difficulty="intermédiaire"):
 
     5. **Précision et clarté** :
        Toutes les informations doivent être extraites uniquement du contenu fourni. Évitez toute ambiguïté et assurez-vous que la question soit claire et compréhensible.
-
+    {variant_instruction(variant)}
     ### Contenu à utiliser :
     {content}
     """
-    response = ollama_model.invoke(prompt)
-    return response
+    return prompt
 
 
-def generate_open_ended(content, query, ollama_model, difficulty="intermédiaire"):
+def generate_mcq(content, query, ollama_model, difficulty="intermédiaire", variant=0):
     """
-    Génère des questions ouvertes en français à partir du contenu fourni,
+    Génère des questions à choix multiples (QCM) en français à partir du contenu fourni,
     en respectant la requête de l'utilisateur et en tenant compte du niveau de difficulté spécifié.
     
     Args:
         content (str): Le contenu pour générer les questions.
         query (str): La requête de l'utilisateur, qui doit guider les questions.
         difficulty (str): Le niveau de difficulté ('débutant', 'intermédiaire', 'avancé').
+        variant (int): 0 pour la première question sur ce contenu, n pour la (n+1)-ième.
 
     Returns:
-        dict: Question ouverte générée avec une réponse exemple et une explication.
+        Question: Question validée avec les options, la réponse correcte et une explication.
+
+    Raises:
+        QuestionParseError: Si la réponse du modèle n'est pas une question valide.
     """
-    
-    # Guide for difficulty levels as a dictionary
-    difficulty_guide = {
-        "débutant": "Questions simples qui invitent à une réflexion de base. Réponses courtes et directes. Accent sur la compréhension élémentaire.",
-        "intermédiaire": "Questions qui encouragent une analyse plus approfondie. Réponses nécessitant une explication structurée et des exemples.",
-        "avancé": "Questions complexes qui stimulent une pensée critique et une analyse approfondie. Réponses détaillées, argumentées et nuancées."
-    }
+    prompt = build_mcq_prompt(content, query, difficulty, variant)
+    response = ollama_model.invoke(prompt)
+    return parse_question(response, "mcq", source=content)
 
+
+# Build the open-ended question prompt for one chunk
+def build_open_ended_prompt(content, query, difficulty="intermédiaire", variant=0):
     # Accessing the appropriate guide based on the specified difficulty
-    guide_description = difficulty_guide.get(difficulty, "Niveau de difficulté non reconnu. Veuillez choisir entre 'débutant', 'intermédiaire' ou 'avancé'.")
+    guide_description = OPEN_ENDED_DIFFICULTY_GUIDE.get(difficulty, "Niveau de difficulté non reconnu. Veuillez choisir entre 'débutant', 'intermédiaire' ou 'avancé'.")
 
     prompt = f"""
     Vous êtes un assistant spécialisé dans la génération de questions ouvertes en français.
@@ -153,9 +263,168 @@ def generate_open_ended(content, query, ollama_model, difficulty="intermédiaire
     5. **Précision et clarté** :
        Toutes les informations doivent être extraites uniquement du contenu fourni. 
        Assurez-vous que la question soit claire, stimulante et en adéquation avec le niveau de difficulté.
-
+    {variant_instruction(variant)}
     ### Contenu à utiliser :
     {content}
     """
+    return prompt
+
+
+def generate_open_ended(content, query, ollama_model, difficulty="intermédiaire", variant=0):
+    """
+    Génère des questions ouvertes en français à partir du contenu fourni,
+    en respectant la requête de l'utilisateur et en tenant compte du niveau de difficulté spécifié.
+    
+    Args:
+        content (str): Le contenu pour générer les questions.
+        query (str): La requête de l'utilisateur, qui doit guider les questions.
+        difficulty (str): Le niveau de difficulté ('débutant', 'intermédiaire', 'avancé').
+        variant (int): 0 pour la première question sur ce contenu, n pour la (n+1)-ième.
+
+    Returns:
+        Question: Question ouverte validée avec une réponse exemple et une explication.
+
+    Raises:
+        QuestionParseError: Si la réponse du modèle n'est pas une question valide.
+    """
+    prompt = build_open_ended_prompt(content, query, difficulty, variant)
     response = ollama_model.invoke(prompt)
-    return response
+    return parse_question(response, "open-ended", source=content)
+
+
+# Build one prompt asking for one question per chunk, returned as a JSON array under "questions"
+def build_batch_prompt(contents, query, question_type, difficulty="intermédiaire"):
+    if question_type.lower() == "mcq":
+        guide = MCQ_DIFFICULTY_GUIDE
+        kind = "questions à choix multiples (QCM)"
+        goal = "évaluer la compréhension de ce concept"
+        structure = """3. **Structure des options** :
+       - Pour chaque question, créez quatre options de réponse (A, B, C, D), dont une seule est correcte.
+       - Les options doivent être distinctes, pertinentes et logiquement plausibles."""
+        fields = '''"question": "",
+                   "options": {
+                       "A": "",
+                       "B": "",
+                       "C": "",
+                       "D": ""
+                   },
+                   "correct_answer": "",
+                   "explanation": ""'''
+    else:
+        guide = OPEN_ENDED_DIFFICULTY_GUIDE
+        kind = "questions ouvertes"
+        goal = "stimuler une réflexion approfondie"
+        structure = """3. **Structure des questions ouvertes** :
+       - Formulez des questions qui invitent à une réponse développée et réfléchie.
+       - Chaque question doit permettre une exploration nuancée du sujet."""
+        fields = '''"question": "",
+                   "correct_answer": "",
+                   "explanation": ""'''
+
+    guide_description = guide.get(difficulty, "Niveau de difficulté non reconnu. Veuillez choisir entre 'débutant', 'intermédiaire' ou 'avancé'.")
+    numbered_contents = "\n\n".join(
+        f"    #### Contenu {number}\n    {content}" for number, content in enumerate(contents, start=1)
+    )
+
+    prompt = f"""
+    Vous êtes un assistant spécialisé dans la génération de {kind} en français.
+    Utilisez chacun des {len(contents)} contenus numérotés ci-dessous pour créer exactement une question par contenu, conforme aux consignes ci-dessous.
+
+    ### Guide des niveaux de difficulté :
+    {guide_description}
+
+    ### Consignes :
+    1. **Lien avec la requête** :
+       Chaque question doit être directement liée au concept suivant : '{query}' et {goal}.
+
+    2. **Niveau de difficulté** :
+       Adaptez la complexité des questions au niveau spécifié : '{difficulty}'.
+
+    {structure}
+
+    4. **Format de sortie** :
+       Retournez uniquement un objet JSON dont la clé "questions" contient {len(contents)} éléments, un par contenu et dans l'ordre, sous le format suivant :
+       ```json
+       {{
+           "questions": [
+               {{
+                   "contenu": 1,
+                   {fields}
+               }}
+           ]
+       }}
+       ```
+
+    5. **Précision et clarté** :
+       Chaque question doit être construite uniquement à partir de son propre contenu. Évitez toute ambiguïté.
+
+    ### Contenus à utiliser :
+{numbered_contents}
+    """
+    return prompt
+
+
+# Check that a parsed item has the fields its question type requires
+def validate_question_data(item, question_type):
+    try:
+        build_question(item, question_type)
+        return True
+    except QuestionParseError:
+        return False
+
+
+# Extract the question objects of a batch answer, tolerating code fences and text around them
+def parse_batch_response(response):
+    text = response.strip()
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            value = value.get("questions", [value])
+        if isinstance(value, list):
+            return value
+    except json.JSONDecodeError:
+        pass
+
+    start, end = text.find("["), text.rfind("]")
+    if start != -1 and end > start:
+        try:
+            items = json.loads(text[start:end + 1])
+            if isinstance(items, list):
+                return items
+        except json.JSONDecodeError:
+            pass
+
+    # Malformed answer: salvage every well-formed question object it contains
+    decoder = json.JSONDecoder()
+    items, position = [], text.find("{")
+    while position != -1:
+        try:
+            item, end = decoder.raw_decode(text, position)
+            if isinstance(item, dict) and "questions" in item:
+                items.extend(item["questions"] if isinstance(item["questions"], list) else [])
+            else:
+                items.append(item)
+            position = text.find("{", end)
+        except json.JSONDecodeError:
+            position = text.find("{", position + 1)
+    return items
+
+
+# Generate one question per chunk with a single LLM call; None marks items that failed validation
+def generate_question_batch(contents, query, question_type, ollama_model, difficulty):
+    prompt = build_batch_prompt(contents, query, question_type, difficulty)
+    with stage("question_batch", question_type=question_type.lower(), size=len(contents)):
+        response = ollama_model.invoke(prompt)
+
+    questions = [None] * len(contents)
+    for position, item in enumerate(parse_batch_response(response)):
+        if not isinstance(item, dict):
+            continue
+        number = item.get("contenu", position + 1)
+        index = number - 1 if isinstance(number, int) else position
+        if 0 <= index < len(contents) and questions[index] is None:
+            try:
+                questions[index] = build_question(item, question_type, source=contents[index])
+            except QuestionParseError:
+                continue
+    return questions
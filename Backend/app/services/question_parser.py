@@ -0,0 +1,91 @@
+import json
+import re
+from pydantic import ValidationError
+from app.schemas.exam import Question
+
+OPTION_LETTERS = ("A", "B", "C", "D")
+
+
+# Raised when an LLM answer cannot be turned into a valid question
+class QuestionParseError(ValueError):
+    pass
+
+
+# Load the first JSON value of an LLM answer, tolerating code fences, text around it and common slips
+def load_json(raw):
+    if isinstance(raw, (dict, list)):
+        return raw
+
+    text = re.sub(r"```(?:json)?", "", str(raw)).strip()
+    start = min((position for position in (text.find("{"), text.find("[")) if position != -1), default=-1)
+    if start == -1:
+        raise QuestionParseError("No JSON object in the model answer.")
+    text = text[start:]
+
+    candidates = [
+        text,
+        # Smart quotes, control characters and trailing commas
+        re.sub(r",\s*([}\]])", r"\1", re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", text.replace("“", '"').replace("”", '"'))),
+    ]
+    for candidate in candidates:
+        try:
+            value, _ = json.JSONDecoder().raw_decode(candidate)
+            return value
+        except json.JSONDecodeError:
+            continue
+    raise QuestionParseError("Malformed JSON in the model answer.")
+
+
+# Build a validated Question from the JSON fields produced by the model
+def build_question(data, question_type, source=None):
+    if not isinstance(data, dict):
+        raise QuestionParseError("The model answer is not a JSON object.")
+
+    question_type = question_type.lower()
+    question_text = data.get("question") or data.get("question_text")
+    if not isinstance(question_text, str) or not question_text.strip():
+        raise QuestionParseError("The question text is missing.")
+
+    correct_answer = data.get("correct_answer") or data.get("answer")
+    if isinstance(correct_answer, (int, float)):
+        correct_answer = str(correct_answer)
+
+    options = None
+    if question_type == "mcq":
+        options = data.get("options")
+        if isinstance(options, list):
+            options = dict(zip(OPTION_LETTERS, options))
+        if not isinstance(options, dict):
+            raise QuestionParseError("The MCQ options are missing.")
+        options = {str(key).strip().upper()[:1]: str(value).strip() for key, value in options.items()}
+        if set(options) != set(OPTION_LETTERS) or not all(options.values()):
+            raise QuestionParseError("An MCQ needs four non-empty options A, B, C and D.")
+
+        # Accept "B", "b)", "B. texte" or the text of the option itself
+        answer = str(correct_answer or "").strip()
+        letter = answer[:1].upper()
+        if letter not in options or (len(answer) > 1 and answer[1].isalnum()):
+            letter = next((key for key, value in options.items() if value.lower() == answer.lower()), None)
+        if not letter:
+            raise QuestionParseError("The MCQ correct answer is not one of the options.")
+        correct_answer = letter
+    elif not isinstance(correct_answer, str) or not correct_answer.strip():
+        raise QuestionParseError("The reference answer is missing.")
+
+    explanation = data.get("explanation")
+    try:
+        return Question(
+            type=question_type,
+            question_text=question_text.strip(),
+            options=options,
+            correct_answer=correct_answer.strip(),
+            explanation=str(explanation).strip() if explanation else None,
+            source=source,
+        )
+    except ValidationError as e:
+        raise QuestionParseError(str(e))
+
+
+# Parse a raw LLM answer into a validated Question
+def parse_question(raw, question_type, source=None):
+    return build_question(load_json(raw), question_type, source)
@@ -0,0 +1,178 @@
+import logging
+import threading
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+# Base class for re-rankers: score (query, chunk) pairs and sort documents by score
+class ReRanker:
+    name = "base"
+
+    def score(self, query, texts):
+        raise NotImplementedError
+
+    # (document, score) pairs, best first
+    def rerank_with_scores(self, query, documents):
+        if not documents:
+            return []
+
+        scores = self.score(query, [doc.page_content for doc in documents])
+
+        # Stable sort: documents with equal scores keep their FAISS similarity order
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        return [(documents[i], float(scores[i])) for i in order]
+
+    def rerank(self, query, documents):
+        return [doc for doc, _ in self.rerank_with_scores(query, documents)]
+
+
+# "No re-rank" mode: keep the FAISS similarity order, without scores
+class NoReRanker(ReRanker):
+    name = "none"
+
+    def score(self, query, texts):
+        return [0.0] * len(texts)
+
+    def rerank_with_scores(self, query, documents):
+        return [(doc, None) for doc in documents]
+
+
+# Re-ranker backed by a sequence-pair classification model, scoring all pairs in padded batches
+class PairClassifierReRanker(ReRanker):
+
+    def __init__(self, model_name, batch_size=16, max_length=512, device=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.load_model(model_name, device)
+
+    # Tokenizer and PyTorch model (the ONNX Runtime variants load a quantized export instead)
+    def load_model(self, model_name, device=None):
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name).to(self.device)
+        self.model.eval()
+        self.model_config = self.model.config
+
+    # Logits of one batch of (first, second) text pairs
+    def forward(self, first, second):
+        inputs = self.tokenizer(
+            first,
+            second,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt",
+        ).to(self.device)
+        return self.model(**inputs).logits
+
+    def build_pairs(self, query, texts):
+        return [(query, text) for text in texts]
+
+    def logits_to_scores(self, logits):
+        raise NotImplementedError
+
+    def score(self, query, texts):
+        return self.score_pairs(self.build_pairs(query, texts))
+
+    # Score (query, texts) requests together, e.g. requests coming from several workers
+    def score_many(self, requests):
+        pairs = [pair for query, texts in requests for pair in self.build_pairs(query, texts)]
+        scores = self.score_pairs(pairs)
+        results, start = [], 0
+        for _, texts in requests:
+            results.append(scores[start:start + len(texts)])
+            start += len(texts)
+        return results
+
+    def score_pairs(self, pairs):
+        scores = [0.0] * len(pairs)
+
+        # Group pairs of similar length together so each batch carries little padding
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch_ids = order[start:start + self.batch_size]
+                first = [pairs[i][0] for i in batch_ids]
+                second = [pairs[i][1] for i in batch_ids]
+                logits = self.forward(first, second)
+                for i, value in zip(batch_ids, self.logits_to_scores(logits).tolist()):
+                    scores[i] = value
+
+        return scores
+
+
+# Zero-shot NLI re-ranker (bart-large-mnli): the chunk is the premise, the query the hypothesis
+class NLIReRanker(PairClassifierReRanker):
+    name = "nli"
+    hypothesis_template = "This example is {}."
+
+    def __init__(self, model_name, batch_size=16, max_length=512, device=None):
+        super().__init__(model_name, batch_size, max_length, device)
+        label2id = {label.lower(): idx for label, idx in self.model_config.label2id.items()}
+        self.entailment_id = label2id.get("entailment", self.model_config.num_labels - 1)
+        self.contradiction_id = label2id.get("contradiction", 0)
+
+    def build_pairs(self, query, texts):
+        hypothesis = self.hypothesis_template.format(query)
+        return [(text, hypothesis) for text in texts]
+
+    def logits_to_scores(self, logits):
+        # Entailment probability against contradiction, as in multi-label zero-shot classification
+        pair_logits = logits[:, [self.contradiction_id, self.entailment_id]]
+        return pair_logits.softmax(dim=-1)[:, 1]
+
+
+# Small cross-encoder re-ranker (e.g. ms-marco-MiniLM) producing one relevance logit per pair
+class CrossEncoderReRanker(PairClassifierReRanker):
+    name = "cross-encoder"
+
+    def logits_to_scores(self, logits):
+        return logits[:, -1]
+
+
+# Pair classifier on the configured inference backend: its int8 ONNX Runtime export when
+# INFERENCE_BACKEND=onnx, the PyTorch model otherwise or when the ONNX model can't be loaded
+def load_pair_classifier(reranker_class, model_name, backend=None):
+    if (backend or config.INFERENCE_BACKEND) == "onnx":
+        try:
+            from app.services.onnx_inference import ONNX_RERANKERS
+            return ONNX_RERANKERS[reranker_class.name](
+                model_name, config.RERANKER_BATCH_SIZE, config.RERANKER_MAX_LENGTH
+            )
+        except Exception:
+            logger.warning("ONNX Runtime re-ranker unavailable for %s, using PyTorch", model_name, exc_info=True)
+    return reranker_class(model_name, config.RERANKER_BATCH_SIZE, config.RERANKER_MAX_LENGTH)
+
+
+RERANKER_BACKENDS = {
+    "none": lambda: NoReRanker(),
+    "nli": lambda: load_pair_classifier(NLIReRanker, config.NLI_RERANKER_MODEL),
+    "cross-encoder": lambda: load_pair_classifier(CrossEncoderReRanker, config.CROSS_ENCODER_MODEL),
+}
+
+_rerankers = {}
+_rerankers_lock = threading.Lock()
+
+
+# Get (and load on first use) the re-ranker for a backend name
+def get_reranker(backend=None):
+    backend = (backend or config.RERANKER_BACKEND).lower()
+    if backend not in RERANKER_BACKENDS:
+        raise ValueError(
+            f"Unknown re-ranker backend '{backend}'. Use one of: {', '.join(RERANKER_BACKENDS)}."
+        )
+
+    with _rerankers_lock:
+        if backend not in _rerankers:
+            if config.INFERENCE_SOCKET and backend != "none":
+                # Scored by the shared inference sidecar instead of a model in this process
+                from app.services.inference_client import SidecarReRanker
+                _rerankers[backend] = SidecarReRanker(backend)
+            else:
+                _rerankers[backend] = RERANKER_BACKENDS[backend]()
+        return _rerankers[backend]
@@ -1,51 +1,178 @@
-from transformers import pipeline
-import torch
-from app.services.cleaning import filter_irrelevant_chunks
+import threading
+import weakref
+import faiss
+from langchain.schema import Document
+from app import config
+from app.services.ann_index import search_parameters
+from app.services.coalescing import retrieval_flight
+from app.services.cleaning import annotate_chunks
+from app.services.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from app.services.reranker import get_reranker
+from app.services.retrieval_cache import retrieval_cache, normalize_query
+from app.utils.telemetry import stage
+import numpy as np
+
+
+# FAISS ids of the chunks usable for questions, per loaded index (see prepare_index)
+class EligibleChunks:
+
+    def __init__(self, ids, total):
+        self.ids = ids
+        self.total = total
+        # No selector when every chunk is eligible: plain search is cheaper
+        self.selector = None
+        if len(ids) < total:
+            self.selector = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+
+    # Selector plus the configured nprobe (IVF) / efSearch (HNSW) for this index
+    def search_parameters(self, index):
+        return search_parameters(index, self.selector, config.FAISS_NPROBE, config.FAISS_EF_SEARCH)
+
+
+_eligible_chunks = weakref.WeakKeyDictionary()
+_prepare_lock = threading.Lock()
+
+
+# Annotate every chunk of a loaded index (relevance flag, cleaned text, word count) and collect the
+# ids of the relevant ones; done once per index, at load or ingest time
+def prepare_index(faiss_index):
+    with _prepare_lock:
+        if faiss_index in _eligible_chunks:
+            return _eligible_chunks[faiss_index]
+
+        docstore = faiss_index.docstore
+        documents = {
+            position: docstore.search(docstore_id)
+            for position, docstore_id in faiss_index.index_to_docstore_id.items()
+        }
+        annotate_chunks(documents.values())
+        for position, doc in documents.items():
+            doc.metadata["faiss_id"] = position  # to find the chunk's vector again (see selection.py)
+        if isinstance(faiss_index.index, faiss.IndexIVF):
+            faiss_index.index.make_direct_map()  # lets IVF indexes reconstruct vectors by id
+        ids = np.array(
+            sorted(position for position, doc in documents.items() if doc.metadata["relevant"]), dtype=np.int64
+        )
+        eligible = EligibleChunks(ids, faiss_index.index.ntotal)
+        _eligible_chunks[faiss_index] = eligible
+        return eligible
+
+
+# Embed a query with the FAISS index's embedding model
+def embed_query(query, faiss_index):
+    embedding_function = faiss_index.embedding_function
+    if hasattr(embedding_function, "embed_query"):
+        return embedding_function.embed_query(query)
+    return embedding_function(query)
 
 
 # Retrieve top-k relevant documents from FAISS index
-def retrieve_documents_from_faiss(query, faiss_index, k=5):
+# (pass query_embedding when the query was already embedded to avoid embedding it twice)
+def retrieve_documents_from_faiss(query, faiss_index, k=5, query_embedding=None):
     if not faiss_index:
         raise ValueError("FAISS index is not initialized.")
+    elif query_embedding is not None:
+        return faiss_index.similarity_search_by_vector(query_embedding, k=k)
     else:
         retriever = faiss_index.as_retriever(search_type="similarity", search_kwargs={"k": k})
         retrieved_docs = retriever.get_relevant_documents(query)
         return retrieved_docs
 
 
-# Load a re-ranker (for simplicity, we use a transformer model for re-ranking)
-re_ranker = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+# FAISS ids of the top-k chunks usable for questions: the search itself skips irrelevant chunks,
+# so k results are k usable chunks and no text processing happens per request
+def search_eligible(faiss_index, query_embedding, k=5):
+    eligible = prepare_index(faiss_index)
+    if not len(eligible.ids):
+        return []
+    vector = np.asarray([query_embedding], dtype=np.float32)
+    if getattr(faiss_index, "_normalize_L2", False):
+        faiss.normalize_L2(vector)
+
+    params = eligible.search_parameters(faiss_index.index)
+    _, positions = faiss_index.index.search(vector, min(k, len(eligible.ids)), params=params)
+    return [int(position) for position in positions[0] if position != -1]
 
-# Re-rank retrieved documents using a transformer model 
-def rerank_documents(query, documents):
 
-    re_ranked = []
+# FAISS ids of the top-k chunks by BM25 keyword score (eligible chunks only)
+def search_lexical(query, faiss_index, k=5):
+    return get_lexical_index(faiss_index, prepare_index(faiss_index).ids).search(query, k)
 
-    for doc in documents:
-        # Use a zero-shot classifier to rank documents based on relevance to the query
-        result = re_ranker(query, candidate_labels=[doc.page_content])
-        score = result['scores'][0]  # Take the relevance score
 
-        # Store document along with its score
-        re_ranked.append({"document": doc, "score": score})
+def documents_at(faiss_index, positions):
+    return [faiss_index.docstore.search(faiss_index.index_to_docstore_id[position]) for position in positions]
 
-    # Sort documents based on score (higher score is more relevant)
-    re_ranked.sort(key=lambda x: x['score'], reverse=True)
 
-    # Return the top re-ranked documents
-    return [doc["document"] for doc in re_ranked]
+# Retrieve the top-k chunks usable for questions, dense only or fused with BM25 keyword matches
+# (exact SQL terms like HAVING or COALESCE are often missed by embedding similarity alone)
+def retrieve_eligible_documents(faiss_index, query_embedding, k=5, query=None, hybrid=False):
+    if not faiss_index:
+        raise ValueError("FAISS index is not initialized.")
+
+    positions = search_eligible(faiss_index, query_embedding, k)
+    if hybrid and query:
+        lexical_positions = search_lexical(query, faiss_index, k)
+        positions = reciprocal_rank_fusion([positions, lexical_positions], k=config.RRF_K, limit=k)
+    return documents_at(faiss_index, positions)
+
+
+# Re-rank retrieved documents with the configured re-ranker backend
+# (all (query, chunk) pairs are scored in padded batches, see app/services/reranker.py)
+# Scored documents are returned as copies carrying metadata["rerank_score"], the MMR relevance of
+# select_diverse; the docstore's own documents are shared between requests and stay untouched
+def rerank_documents(query, documents, reranker=None):
+    reranker = reranker or get_reranker()
+    ranked = []
+    for doc, score in reranker.rerank_with_scores(query, documents):
+        if score is not None:
+            doc = Document(page_content=doc.page_content, metadata={**doc.metadata, "rerank_score": score})
+        ranked.append(doc)
+    return ranked
+
+# Main retrieval and re-ranking pipeline, served from the retrieval cache when possible
+def retrieve_and_rerank(query, faiss_index, k=25, top_n=10, reranker=None, cache=retrieval_cache, hybrid=None):
+    if not faiss_index:
+        raise ValueError("FAISS index is not initialized.")
+
+    reranker = reranker or get_reranker()
+    hybrid = config.HYBRID_RETRIEVAL if hybrid is None else hybrid
+    params = (k, top_n, reranker.name, hybrid)
 
-# Main retrieval and re-ranking pipeline
-def retrieve_and_rerank(query, faiss_index, k=25, top_n=10):
+    # Step 1: Exact match on the normalized query
+    if cache:
+        cache.check_index(faiss_index)
+        key = cache.make_key(normalize_query(query), params)
+        cached_docs = cache.get_exact(key)
+        if cached_docs is not None:
+            return cached_docs
 
-    # Step 1: Retrieve top-k relevant documents from FAISS index
-    retrieved_docs = retrieve_documents_from_faiss(query, faiss_index, k)
+    # Step 2: Embed the query once, for both the near-duplicate lookup and the FAISS search
+    with stage("embed_query"):
+        query_embedding = embed_query(query, faiss_index)
+    if cache:
+        normalized_embedding = np.asarray(query_embedding, dtype=np.float32)
+        normalized_embedding /= np.linalg.norm(normalized_embedding) or 1.0
+        cached_docs = cache.get_similar(normalized_embedding, params)
+        if cached_docs is not None:
+            return cached_docs
 
-    # Step 2: Filter out irrelevant documents (e.g., TOC, excessive dots)
-    filtered_docs = filter_irrelevant_chunks(retrieved_docs)
+    def search_and_rerank():
+        # Step 3: Retrieve the top-k relevant documents from FAISS index, fused with BM25 matches
+        # (irrelevant chunks, e.g. TOC or excessive dots, are excluded from the search, see prepare_index)
+        with stage("search", k=k, hybrid=hybrid):
+            retrieved_docs = retrieve_eligible_documents(faiss_index, query_embedding, k, query, hybrid)
+
+        # Step 4: Re-rank the retrieved documents and keep the top 'top_n'
+        with stage("rerank", reranker=reranker.name, documents=len(retrieved_docs)):
+            return rerank_documents(query, retrieved_docs, reranker)[:top_n]
+
+    # Identical requests arriving together (e.g. a class starting an exam) search and re-rank once
+    if config.COALESCING_ENABLED:
+        re_ranked_docs = retrieval_flight.do((normalize_query(query), params, id(faiss_index)), search_and_rerank)
+    else:
+        re_ranked_docs = search_and_rerank()
 
-    # Step 3: Re-rank the filtered documents
-    re_ranked_docs = rerank_documents(query, filtered_docs)
+    if cache:
+        cache.put(key, params, normalized_embedding, re_ranked_docs)
 
-    # Return the top 'top_n' re-ranked documents
-    return re_ranked_docs[:top_n]
\ No newline at end of file
+    return re_ranked_docs
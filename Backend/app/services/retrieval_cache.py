@@ -0,0 +1,264 @@
+import os
+import pickle
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from langchain.schema import Document
+from app import config
+from app.utils.faiss_utils import resolve_index_path
+
+
+# Normalize a query for exact matching: lowercase, no accents, collapsed whitespace and punctuation
+def normalize_query(query):
+    text = unicodedata.normalize("NFKD", query.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^\w\s-]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# Fingerprint of the FAISS files on disk; changes whenever the index is rebuilt or replaced
+def index_files_fingerprint(index_path):
+    index_path = resolve_index_path(index_path)
+    fingerprint = [index_path]
+    for name in sorted(os.listdir(index_path)) if os.path.isdir(index_path) else []:
+        if name.startswith("index."):
+            stat = os.stat(os.path.join(index_path, name))
+            fingerprint.append((name, stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+class CacheEntry:
+    __slots__ = ("key", "params", "embedding", "documents", "created_at")
+
+    def __init__(self, key, params, embedding, documents, created_at=None):
+        self.key = key
+        self.params = params
+        self.embedding = embedding
+        self.documents = documents
+        self.created_at = created_at or time.time()
+
+
+# Two-tier cache in front of retrieve_and_rerank:
+# exact match on the normalized query, then near-duplicate match on the query embedding
+class RetrievalCache:
+
+    def __init__(self, index_path, max_entries=512, ttl_seconds=86400, similarity_threshold=0.95, store=None):
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.store = store
+        self._entries = OrderedDict()  # key -> CacheEntry, least recently used first
+        self._matrix = None  # stacked embeddings for the semantic tier, rebuilt lazily
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+        self._index_id = None
+        self._fingerprint = index_files_fingerprint(index_path)
+
+        # Counters
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        if self.store:
+            now = time.time()
+            for entry in self.store.load(self._fingerprint):
+                if not self._expired(entry, now):
+                    self._entries[entry.key] = entry
+            self._trim()
+
+    @staticmethod
+    def make_key(normalized_query, params):
+        return f"{normalized_query}|{'|'.join(str(value) for value in params)}"
+
+    def _expired(self, entry, now):
+        return now - entry.created_at > self.ttl_seconds
+
+    def _trim(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self.invalidations += 1
+        if self.store:
+            self.store.clear()
+
+    # Drop everything when the FAISS index in memory or on disk has changed
+    def check_index(self, faiss_index):
+        fingerprint = index_files_fingerprint(self.index_path)
+        changed = fingerprint != self._fingerprint or (
+            self._index_id is not None and self._index_id != id(faiss_index)
+        )
+        self._fingerprint = fingerprint
+        self._index_id = id(faiss_index)
+        if changed:
+            self.clear()
+
+    # Exact tier: normalized query text + retrieval parameters
+    def get_exact(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                del self._entries[key]
+                self._matrix = None
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.documents
+
+    # Semantic tier: most similar cached query embedding with the same parameters, above the threshold
+    def get_similar(self, embedding, params):
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._matrix_keys = list(self._entries)
+                self._matrix = np.stack([self._entries[key].embedding for key in self._matrix_keys])
+
+            similarities = self._matrix @ embedding
+            now = time.time()
+            for position in np.argsort(-similarities):
+                if similarities[position] < self.similarity_threshold:
+                    break
+                entry = self._entries.get(self._matrix_keys[position])
+                if entry is None or entry.params != params or self._expired(entry, now):
+                    continue
+                self._entries.move_to_end(entry.key)
+                self.semantic_hits += 1
+                return entry.documents
+
+            self.misses += 1
+            return None
+
+    def put(self, key, params, embedding, documents):
+        entry = CacheEntry(key, params, embedding, documents)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._trim()
+        if self.store:
+            self.store.save(entry, self._fingerprint)
+
+    def close(self):
+        if self.store:
+            self.store.close(list(self._entries.values()), self._fingerprint)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Persist cache entries in a pickle file, written on shutdown
+class DiskCacheStore:
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, fingerprint):
+        try:
+            with open(self.path, "rb") as f:
+                stored_fingerprint, entries = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return []
+        if stored_fingerprint != fingerprint:
+            return []
+        return [CacheEntry(*entry) for entry in entries]
+
+    def save(self, entry, fingerprint):
+        pass  # Everything is written at once on close()
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def close(self, entries, fingerprint):
+        data = (fingerprint, [
+            (entry.key, entry.params, entry.embedding, entry.documents, entry.created_at) for entry in entries
+        ])
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+# Persist cache entries in MongoDB, written through on every insert
+class MongoCacheStore:
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def load(self, fingerprint):
+        # Entries built against another version of the index are useless
+        self.collection.delete_many({"fingerprint": {"$ne": list(map(list, fingerprint))}})
+
+        entries = []
+        for doc in self.collection.find({"fingerprint": list(map(list, fingerprint))}).sort("created_at", 1):
+            documents = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in doc["documents"]]
+            entries.append(CacheEntry(
+                doc["_id"], tuple(doc["params"]), np.asarray(doc["embedding"], dtype=np.float32),
+                documents, doc["created_at"],
+            ))
+        return entries
+
+    def save(self, entry, fingerprint):
+        self.collection.replace_one({"_id": entry.key}, {
+            "_id": entry.key,
+            "params": list(entry.params),
+            "embedding": entry.embedding.tolist(),
+            "documents": [{"page_content": d.page_content, "metadata": d.metadata} for d in entry.documents],
+            "created_at": entry.created_at,
+            "fingerprint": list(map(list, fingerprint)),
+        }, upsert=True)
+
+    def clear(self):
+        self.collection.delete_many({})
+
+    def close(self, entries, fingerprint):
+        pass  # Every entry is already stored
+
+
+def create_retrieval_cache():
+    if not config.RETRIEVAL_CACHE_ENABLED:
+        return None
+
+    store = None
+    if config.RETRIEVAL_CACHE_PERSIST == "disk":
+        store = DiskCacheStore(config.RETRIEVAL_CACHE_PATH)
+    elif config.RETRIEVAL_CACHE_PERSIST == "mongo":
+        from app.database import get_sync_database
+        store = MongoCacheStore(get_sync_database()["retrieval_cache"])
+
+    return RetrievalCache(
+        config.VECTORSTORE_PATH,
+        max_entries=config.RETRIEVAL_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.RETRIEVAL_CACHE_TTL_SECONDS,
+        similarity_threshold=config.RETRIEVAL_CACHE_SIMILARITY_THRESHOLD,
+        store=store,
+    )
+
+
+retrieval_cache = create_retrieval_cache()
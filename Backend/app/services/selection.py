@@ -0,0 +1,84 @@
+import logging
+import numpy as np
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+# Retrieval depth for an exam: enough candidates for question_nbr diverse chunks
+# (k chunks retrieved, top_n of them kept after re-ranking)
+def candidate_depth(question_nbr, k=25, top_n=10):
+    k = max(k, question_nbr * config.CANDIDATES_PER_QUESTION)
+    top_n = min(k, max(top_n, 2 * question_nbr))
+    return k, top_n
+
+
+# Stored vectors of retrieved chunks (None when the index cannot return them)
+def chunk_embeddings(faiss_index, documents):
+    try:
+        ids = np.array([doc.metadata["faiss_id"] for doc in documents], dtype=np.int64)
+        return faiss_index.index.reconstruct_batch(ids)
+    except (KeyError, RuntimeError) as e:
+        logger.warning("Chunk vectors unavailable, keeping the re-ranked order: %s", e)
+        return None
+
+
+# Maximal marginal relevance over all candidates at once: each step picks the candidate with the best
+# lambda * relevance - (1 - lambda) * (max cosine similarity to the candidates already picked)
+def mmr_order(embeddings, relevance, count, lambda_mult=0.7):
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    while len(selected) < min(count, len(relevance)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+# MMR relevance of re-ranked candidates: their re-ranker scores, min-max normalized to [0, 1]. The rank
+# order is only a fallback for unscored documents (NoReRanker, cache entries stored without scores).
+def rerank_relevance(documents):
+    scores = [doc.metadata.get("rerank_score") for doc in documents]
+    if any(score is None for score in scores):
+        return 1.0 - np.arange(len(documents), dtype=np.float32) / len(documents)
+    scores = np.asarray(scores, dtype=np.float32)
+    spread = scores.max() - scores.min()
+    if spread <= 0:
+        return np.ones(len(scores), dtype=np.float32)
+    return (scores - scores.min()) / spread
+
+
+# Pick up to `count` relevant but mutually different chunks from the re-ranked candidates
+# (the re-ranker scores give the relevance, the stored chunk vectors the similarity)
+def select_diverse(documents, faiss_index, count, lambda_mult=None):
+    if len(documents) <= 1 or not config.MMR_ENABLED:
+        return documents[:count]
+
+    embeddings = chunk_embeddings(faiss_index, documents)
+    if embeddings is None:
+        return documents[:count]
+
+    relevance = rerank_relevance(documents)
+    lambda_mult = config.MMR_LAMBDA if lambda_mult is None else lambda_mult
+    return [documents[i] for i in mmr_order(embeddings, relevance, count, lambda_mult)]
+
+
+# One slot per question: every chunk once, then again with a new variant number when there are fewer
+# chunks than questions (at most max_per_chunk questions per chunk). Returns (contents, variants).
+def plan_question_slots(chunks, question_nbr, max_per_chunk=None):
+    max_per_chunk = max_per_chunk or config.MAX_QUESTIONS_PER_CHUNK
+    contents, variants = [], []
+    for variant in range(max_per_chunk):
+        for chunk in chunks:
+            if len(contents) == question_nbr:
+                return contents, variants
+            contents.append(chunk)
+            variants.append(variant)
+    return contents, variants
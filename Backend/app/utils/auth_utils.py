@@ -1,6 +1,20 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
+from app import config
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds/max_rounds make needs_update() flag hashes with any other cost, so verify_and_update
+# re-hashes them at the next login when BCRYPT_ROUNDS is raised or lowered
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=config.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=config.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=config.BCRYPT_ROUNDS,
+)
+
+# bcrypt is deliberately slow: run it on its own small pool instead of the event loop
+password_executor = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
 # Hash a password
 def hash_password(password: str) -> str:
@@ -11,3 +25,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# Hash a password without blocking the event loop
+async def ahash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(password_executor, hash_password, password)
+
+# Verify a password without blocking the event loop; returns (valid, new_hash), where new_hash is
+# set when the stored hash uses outdated parameters (e.g. BCRYPT_ROUNDS changed) and should replace it
+async def averify_password(plain_password: str, hashed_password: str):
+    return await asyncio.get_running_loop().run_in_executor(
+        password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
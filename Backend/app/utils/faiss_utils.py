@@ -1,18 +1,67 @@
+import logging
+import os
+import pickle
+import faiss
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.vectorstores import FAISS
+from app import config
+
+logger = logging.getLogger(__name__)
 
 # Load the FAISS vector database
 embedding_model_name = "all-MPNet-base-v2"
 
-# Load FAISS index
-def load_faiss_index(save_path):
-    print("Loading FAISS vector database...")
-    embedding_model = HuggingFaceEmbeddings(model_name=embedding_model_name)
+# Load the embedding model used to build the FAISS index, on the configured inference backend
+# (INFERENCE_BACKEND); the PyTorch model when the ONNX Runtime export can't be loaded
+def load_embedding_model(backend=None):
+    if (backend or config.INFERENCE_BACKEND) == "onnx":
+        try:
+            from app.services.onnx_inference import OnnxEmbeddings
+            logger.info("Loading embedding model", extra={"backend": "onnx"})
+            return OnnxEmbeddings(embedding_model_name)
+        except Exception:
+            logger.warning("ONNX Runtime embedding model unavailable, using PyTorch", exc_info=True)
+    logger.info("Loading embedding model")
+    return HuggingFaceEmbeddings(model_name=embedding_model_name)
+
+# Versioned index layout: <vector_database>/versions/<version>/index.{faiss,pkl}, with the served
+# version named in <vector_database>/CURRENT. Without a pointer file the index sits in the directory itself.
+INDEX_POINTER_FILE = "CURRENT"
+INDEX_VERSIONS_DIR = "versions"
+
+# Directory of the index version currently served
+def resolve_index_path(base_path):
+    try:
+        with open(os.path.join(base_path, INDEX_POINTER_FILE)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return base_path
+    return os.path.join(base_path, INDEX_VERSIONS_DIR, version) if version else base_path
+
+# Flags for memory-mapping a saved index read-only. IO_FLAG_MMAP maps the inverted lists of IVF
+# indexes; newer faiss versions also map the vectors of flat indexes with IO_FLAG_MMAP_IFC.
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+# Load the vector store with its index memory-mapped: every worker process maps the same
+# index.faiss file, so the vectors live once in the page cache instead of once per worker
+def load_mmap_faiss_index(save_path, embedding_model):
+    index = faiss.read_index(os.path.join(save_path, "index.faiss"), MMAP_FLAGS)
+    with open(os.path.join(save_path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embedding_model, index, docstore, index_to_docstore_id)
+
+# Load FAISS index (with an already loaded embedding model when given)
+def load_faiss_index(save_path, embedding_model=None, mmap=False):
+    logger.info("Loading FAISS vector database", extra={"path": save_path, "mmap": mmap})
+    embedding_model = embedding_model or load_embedding_model()
     try:
-        faiss_index = FAISS.load_local(save_path, embeddings=embedding_model, allow_dangerous_deserialization=True)
-        print("FAISS index loaded successfully.")
+        if mmap:
+            faiss_index = load_mmap_faiss_index(save_path, embedding_model)
+        else:
+            faiss_index = FAISS.load_local(save_path, embeddings=embedding_model, allow_dangerous_deserialization=True)
+        logger.info("FAISS index loaded")
     except Exception as e:
-        print(f"Error loading FAISS index: {e}")
+        logger.exception("Error loading FAISS index")
         faiss_index = None
 
-    return faiss_index
\ No newline at end of file
+    return faiss_index
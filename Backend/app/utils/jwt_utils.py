@@ -1,7 +1,11 @@
 from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
 from jose import JWTError, jwt
-from app.database import users_collection
-from fastapi import Depends
+from app import config
+from app.database import database
+from app.utils.user_cache import UserCache
+from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 
 # Configuration
@@ -9,7 +13,7 @@ SECRET_KEY = "youss"  # Replace with a strong secret key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 255
 
-# Create JWT
+# Create JWT (login puts the username in "sub" and the user id in "uid")
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -29,15 +33,51 @@ def decode_access_token(token: str):
 # OAuth2 scheme for the token endpoint
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-# get current user
+# Users resolved from tokens, so authenticated requests don't query MongoDB every time
+user_cache = UserCache(max_entries=config.USER_CACHE_MAX_ENTRIES, ttl_seconds=config.USER_CACHE_TTL_SECONDS)
+
+# Fields never kept in the cache or handed to request handlers
+USER_PROJECTION = {"hashed_password": 0}
+
+
+def credentials_exception():
+    return HTTPException(
+        status_code=401,
+        detail="Invalid token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+# Call after changing or deleting an account
+def invalidate_user(user_id):
+    user_cache.invalidate(user_id)
+
+
+# get current user: FastAPI dependency resolving the token's user, or failing the request with 401
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     payload = decode_access_token(token)
     if not payload:
-        return None  # Invalid token
+        raise credentials_exception()  # Invalid token
 
     username = payload.get("sub")  # Extract username from token payload
+    user_id = payload.get("uid")
     if not username:
-        return None
+        raise credentials_exception()
+
+    if user_id:
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+        try:
+            query = {"_id": ObjectId(user_id)}
+        except InvalidId:
+            raise credentials_exception()
+    else:
+        # Token issued before user ids were added to the claims
+        query = {"username": username}
 
-    user = await users_collection.find_one({"username": username})
+    user = await database.users.find_one(query, USER_PROJECTION)
+    if not user or user["username"] != username:
+        raise credentials_exception()
+    user_cache.put(user)
     return user
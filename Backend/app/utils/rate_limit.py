@@ -0,0 +1,43 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+# Token-bucket rate limiter per key (username, client IP...): each key holds up to `burst` tokens,
+# refilled at `per_minute` tokens per minute, and each attempt takes one. Least recently seen keys
+# are evicted once there are more than max_keys.
+class TokenBucketLimiter:
+
+    def __init__(self, burst, per_minute, max_keys=100_000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    # Take a token for key; returns (allowed, seconds until the next token)
+    def acquire(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        if allowed:
+            return True, 0
+        return False, math.ceil((1 - tokens) / self.rate) if self.rate else 60
+
+    # Forget a key, e.g. a username after a successful login
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
@@ -0,0 +1,191 @@
+import bisect
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from app import config
+
+try:
+    from opentelemetry import trace
+    tracer = trace.get_tracer("exam-generator")
+except ImportError:  # Spans are optional; timings and metrics work without OpenTelemetry
+    tracer = None
+
+logger = logging.getLogger(__name__)
+
+
+# Logging: the app's modules log under "app"; extra={...} fields are kept as structured fields
+LOG_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in LOG_RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **record_fields(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        fields = " ".join(f"{key}={value}" for key, value in record_fields(record).items())
+        return f"{super().format(record)} {fields}" if fields else super().format(record)
+
+
+def configure_logging(level=None, format=None):
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if (format or config.LOG_FORMAT) == "json" else TextFormatter())
+    app_logger = logging.getLogger("app")
+    app_logger.handlers[:] = [handler]
+    app_logger.setLevel(level or config.LOG_LEVEL)
+    app_logger.propagate = False
+
+
+# Metrics, rendered in the Prometheus text format by GET /metrics (per process: with several
+# uvicorn workers, each scrape sees the worker that answered)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot: above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> value
+        self._help = {}
+        self._sources = []  # (prefix, stats function), read at scrape time
+
+    def observe(self, name, value, buckets=STAGE_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def describe(self, name, help):
+        self._help[name] = help
+
+    # Export the numeric fields of stats_fn() (pools, caches, queues...) as gauges named prefix_field
+    def add_source(self, prefix, stats_fn):
+        self._sources.append((prefix, stats_fn))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), histogram in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{format_labels(labels)} {value}")
+
+        for prefix, stats_fn in self._sources:
+            try:
+                stats = stats_fn()
+            except Exception as e:
+                logger.warning("Metrics source failed", extra={"source": prefix, "error": str(e)})
+                continue
+            for field, value in flatten_stats(stats):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{field}")
+                header(name, "gauge")
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def flatten_stats(stats, prefix=""):
+    for key, value in (stats or {}).items():
+        if isinstance(value, dict):
+            yield from flatten_stats(value, f"{prefix}{key}_")
+        else:
+            yield f"{prefix}{key}", value
+
+
+metrics = Metrics()
+metrics.describe("exam_stage_seconds", "Duration of each exam generation stage")
+metrics.describe("question_bank_lookups_total", "Questions served from the question bank (hit) or generated (miss)")
+
+
+# Time a pipeline stage: one exam_stage_seconds observation, a tracing span when OpenTelemetry is
+# installed, and a debug log line with the duration
+@contextmanager
+def stage(name, **attributes):
+    started_at = time.perf_counter()
+    with tracer.start_as_current_span(name, attributes=attributes) if tracer else nullcontext():
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started_at
+            metrics.observe("exam_stage_seconds", seconds, stage=name)
+            logger.debug("Stage finished", extra={"stage": name, "seconds": round(seconds, 4), **attributes})
+
+
+# Submit to an executor with the caller's context, so spans opened in the worker thread are
+# children of the request's span
+def submit_in_context(executor, fn, *args, **kwargs):
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
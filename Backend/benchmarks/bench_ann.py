@@ -0,0 +1,183 @@
+"""
+Approximate nearest-neighbour index types on synthetic MPNet-sized corpora: recall@k against the
+exact flat index, per-query p50/p99 latency, build time and index size.
+
+Vectors are 768-dim and clustered like sentence embeddings of a course corpus. 1M vectors take
+~3 GB as float32 (plus the index being measured), so run the largest sizes on a big enough box.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_ann --sizes 10000 100000 --types flat ivf-flat hnsw ivf-pq
+    python -m benchmarks.bench_ann --sizes 1000000 --types ivf-pq hnsw --nprobe 8 16 64 --ef-search 32 64 128
+    python -m benchmarks.bench_ann --check-delete   # delete-then-search consistency of every index type
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+
+from app.services.ann_index import INDEX_TYPES, build_index, delete_chunks, search_parameters
+
+DIMENSION = 768
+
+
+# Gaussian clusters around random centres, generated in blocks to bound peak memory
+def synthetic_vectors(count, rng, centres, spread=0.35, block=100_000):
+    vectors = np.empty((count, DIMENSION), dtype=np.float32)
+    for start in range(0, count, block):
+        size = min(block, count - start)
+        assignment = rng.integers(0, len(centres), size)
+        noise = rng.standard_normal((size, DIMENSION), dtype=np.float32) * spread
+        vectors[start:start + size] = centres[assignment] + noise
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def index_size_bytes(index):
+    with tempfile.NamedTemporaryFile(suffix=".faiss") as f:
+        faiss.write_index(index, f.name)
+        return os.path.getsize(f.name)
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(row_found) & set(row_truth)) for row_found, row_truth in zip(found, truth))
+    return hits / truth.size
+
+
+# One query at a time, like a request, with the given search parameters
+def measure(index, queries, k, params):
+    latencies, found = [], []
+    for query in queries:
+        started_at = time.perf_counter()
+        _, ids = index.search(query[None, :], k, params=params)
+        latencies.append(time.perf_counter() - started_at)
+        found.append(ids[0])
+    return np.array(found), latencies
+
+
+# Delete a tenth of the chunks of a vector store the way ingestion does, add new ones, then query each
+# remaining chunk with its own vector: positions must map to live chunks, and mostly to the chunk itself
+def check_delete(kind, corpus, rng, args, queries=200):
+    size = len(corpus)
+    store = FAISS.from_embeddings(
+        [(str(row), vector.tolist()) for row, vector in enumerate(corpus)], None,
+        metadatas=[{"row": row} for row in range(size)], ids=[str(row) for row in range(size)],
+    )
+    store.index = build_index(corpus, kind, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m)
+    deleted = {int(row) for row in rng.choice(size, size // 10, replace=False)}
+    delete_chunks(store, [str(row) for row in deleted])
+
+    added = synthetic_vectors(size // 20, rng, corpus[rng.choice(size, 16, replace=False)])
+    store.add_embeddings(
+        [(str(size + row), vector.tolist()) for row, vector in enumerate(added)],
+        metadatas=[{"row": size + row} for row in range(len(added))],
+        ids=[str(size + row) for row in range(len(added))],
+    )
+    vectors = np.concatenate([corpus, added])
+
+    kept = [row for row in range(len(vectors)) if row not in deleted]
+    sample = [kept[i] for i in rng.choice(len(kept), min(queries, len(kept)), replace=False)]
+    params = search_parameters(store.index, nprobe=max(args.nprobe), ef_search=max(args.ef_search))
+    self_hits = broken = returned_deleted = 0
+    for row in sample:
+        _, positions = store.index.search(vectors[row][None, :], 1, params=params)
+        docstore_id = store.index_to_docstore_id.get(int(positions[0][0]))
+        document = store.docstore.search(docstore_id) if docstore_id is not None else None
+        if not isinstance(document, Document):
+            broken += 1
+        elif document.metadata["row"] in deleted:
+            returned_deleted += 1
+        elif document.metadata["row"] == row:
+            self_hits += 1
+
+    ok = not broken and not returned_deleted and store.index.ntotal == len(store.index_to_docstore_id)
+    print(f"{kind:>9} after delete+add: self-recall@1={self_hits / len(sample):.3f} unmapped={broken} "
+          f"deleted returned={returned_deleted} {'OK' if ok else 'BROKEN'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=25, help="retrieval depth, as in retrieve_and_rerank")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[16], help="IVF settings to sweep")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[64], help="HNSW settings to sweep")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=1, help="faiss OpenMP threads (1 = one request per core)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--check-delete", action="store_true",
+                        help="only check that deleting chunks keeps each index type consistent (smallest size)")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    rng = np.random.default_rng(0)
+    centres = rng.standard_normal((256, DIMENSION), dtype=np.float32)
+    results = []
+
+    if args.check_delete:
+        corpus = synthetic_vectors(min(args.sizes), rng, centres)
+        sys.exit(0 if all([check_delete(kind, corpus, rng, args) for kind in args.types]) else 1)
+
+    print(f"{'size':>8} {'type':>9} {'param':>14} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'size MB':>8}")
+    for size in args.sizes:
+        corpus = synthetic_vectors(size, rng, centres)
+        queries = synthetic_vectors(args.queries, rng, centres)
+
+        # Exact baseline
+        flat = build_index(corpus, "flat")
+        _, truth = flat.search(queries, args.k)
+        del flat
+
+        for kind in args.types:
+            started_at = time.perf_counter()
+            index = build_index(corpus, kind, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m)
+            build_seconds = time.perf_counter() - started_at
+            size_mb = index_size_bytes(index) / 2**20
+
+            if kind in ("ivf-flat", "ivf-pq"):
+                settings = [(f"nprobe={nprobe}", {"nprobe": nprobe}) for nprobe in args.nprobe]
+            elif kind == "hnsw":
+                settings = [(f"efSearch={ef}", {"ef_search": ef}) for ef in args.ef_search]
+            else:
+                settings = [("exact", {})]
+
+            for label, options in settings:
+                found, latencies = measure(index, queries, args.k, search_parameters(index, **options))
+                row = {
+                    "size": size,
+                    "type": kind,
+                    "param": label,
+                    "recall_at_k": recall_at_k(found, truth),
+                    "p50_ms": statistics.median(latencies) * 1000,
+                    "p99_ms": percentile(latencies, 0.99) * 1000,
+                    "build_seconds": build_seconds,
+                    "size_mb": size_mb,
+                }
+                results.append(row)
+                print(f"{size:>8} {kind:>9} {label:>14} {row['recall_at_k']:>9.3f} {row['p50_ms']:>8.2f} "
+                      f"{row['p99_ms']:>8.2f} {build_seconds:>8.1f} {size_mb:>8.1f}")
+            del index
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"k": args.k, "threads": args.threads, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
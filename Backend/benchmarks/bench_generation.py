@@ -0,0 +1,120 @@
+"""
+Question generation throughput: one Ollama call per chunk vs several chunks per prompt.
+
+Talks to the Ollama HTTP API directly to read prompt/eval token counts.
+Run from the Backend directory:
+    python -m benchmarks.bench_generation --questions 10 --batch-sizes 1 5 10
+"""
+import argparse
+import json
+import math
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from app import config
+from app.services.cleaning import filter_irrelevant_chunks, clean_relevant_chunks_for_question_generation
+from app.services.question_generator import build_mcq_prompt, build_open_ended_prompt, build_batch_prompt
+from app.services.question_generator import parse_batch_response, validate_question_data
+from app.services.retrieval import retrieve_documents_from_faiss
+from app.utils.faiss_utils import load_faiss_index
+
+SYNTHETIC_CHUNK = (
+    "Une jointure interne (INNER JOIN) retourne les lignes pour lesquelles la condition de "
+    "jointure est vérifiée dans les deux tables. Une jointure externe gauche (LEFT JOIN) "
+    "retourne toutes les lignes de la table de gauche, complétées par des valeurs NULL lorsque "
+    "aucune ligne de la table de droite ne correspond. "
+) * 2
+
+
+# Totals over the worker threads of a run
+class OllamaStats:
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+        self.eval_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += result.get("prompt_eval_count", 0)
+            self.eval_tokens += result.get("eval_count", 0)
+            self.eval_seconds += result.get("eval_duration", 0) / 1e9
+
+
+def ollama_generate(host, model, prompt, stats):
+    body = json.dumps({"model": model, "prompt": prompt, "stream": False}).encode("utf-8")
+    request = urllib.request.Request(f"{host}/api/generate", data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=600) as response:
+        result = json.loads(response.read())
+    stats.add(result)
+    return result["response"]
+
+
+def load_chunks(query, count):
+    faiss_index = load_faiss_index(config.VECTORSTORE_PATH)
+    if faiss_index:
+        docs = filter_irrelevant_chunks(retrieve_documents_from_faiss(query, faiss_index, count * 3))
+        chunks = clean_relevant_chunks_for_question_generation(docs, min_chunk_length=30)
+        if len(chunks) >= count:
+            return chunks[:count]
+    return [SYNTHETIC_CHUNK] * count
+
+
+def run(chunks, query, question_type, difficulty, batch_size, host, model, workers):
+    stats = OllamaStats()
+    build_single = build_mcq_prompt if question_type == "mcq" else build_open_ended_prompt
+
+    if batch_size == 1:
+        prompts = [build_single(chunk, query, difficulty) for chunk in chunks]
+    else:
+        prompts = [
+            build_batch_prompt(chunks[start:start + batch_size], query, question_type, difficulty)
+            for start in range(0, len(chunks), batch_size)
+        ]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        responses = list(executor.map(lambda prompt: ollama_generate(host, model, prompt, stats), prompts))
+
+    # Items a batched run would have to retry individually
+    invalid = 0
+    if batch_size > 1:
+        for position, response in enumerate(responses):
+            expected = len(chunks[position * batch_size:(position + 1) * batch_size])
+            valid = [item for item in parse_batch_response(response) if validate_question_data(item, question_type)]
+            invalid += max(expected - len(valid), 0)
+
+    wall = time.perf_counter() - start
+    tokens_per_second = stats.eval_tokens / stats.eval_seconds if stats.eval_seconds else 0.0
+    print(
+        f"batch_size={batch_size:<3} calls={stats.calls:<3} wall={wall:7.1f} s  "
+        f"prompt_tokens={stats.prompt_tokens:<6} eval_tokens={stats.eval_tokens:<6} "
+        f"eval_tok/s={tokens_per_second:6.1f}  invalid_items={invalid}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="http://localhost:11434")
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--query", default="les jointures en SQL")
+    parser.add_argument("--question-type", default="mcq", choices=["mcq", "open-ended"])
+    parser.add_argument("--difficulty", default="intermédiaire")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.query, args.questions)
+    print(f"{len(chunks)} questions, {args.question_type}, model={args.model}")
+    for batch_size in args.batch_sizes:
+        run(chunks, args.query, args.question_type, args.difficulty, max(batch_size, 1),
+            args.host, args.model, min(args.workers, math.ceil(len(chunks) / max(batch_size, 1))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Micro-benchmarks of the exam generation path at several corpus sizes, fully offline: FAISS search
+(dense and hybrid), re-ranking, cleaning, prompt construction and the whole exam_pipeline with a
+stub LLM. Corpora, embeddings, re-ranker and LLM come from benchmarks/stubs.py; pass
+--reranker nli/cross-encoder to measure a real model instead.
+
+Run from the Backend directory, saving the results and checking them against a previous run:
+    python -m benchmarks.bench_pipeline --sizes 1000 10000 100000 --output benchmarks/results/pipeline.json
+    python -m benchmarks.bench_pipeline --sizes 1000 10000 --baseline benchmarks/results/pipeline.json
+"""
+import argparse
+import sys
+import time
+
+from app import config
+from app.services.cleaning import clean_relevant_chunks_for_question_generation, filter_irrelevant_chunks
+from app.services.piepeline import exam_pipeline
+from app.services.question_generator import build_batch_prompt, build_mcq_prompt
+from app.services.reranker import get_reranker
+from app.services.retrieval import embed_query, retrieve_eligible_documents
+from app.services.retrieval_cache import retrieval_cache
+from benchmarks.results import environment, latency_metrics, load_results, report_comparison, save_results
+from benchmarks.stubs import StubLLM, build_stub_index, synthetic_corpus
+
+QUERIES = [
+    "les jointures en SQL",
+    "GROUP BY et les fonctions d'agrégation",
+    "différence entre WHERE et HAVING",
+    "les index et les performances",
+    "transactions et atomicité",
+    "normalisation des tables",
+    "sous-requêtes corrélées",
+    "les vues matérialisées",
+]
+
+
+# Call fn(query) for every query, runs times, after one warm-up call
+def measure(fn, queries, runs):
+    fn(queries[0])
+    latencies = []
+    started_at = time.perf_counter()
+    for _ in range(runs):
+        for query in queries:
+            call_started_at = time.perf_counter()
+            fn(query)
+            latencies.append(time.perf_counter() - call_started_at)
+    wall = time.perf_counter() - started_at
+    return {**latency_metrics(latencies), "calls_per_second": len(latencies) / wall if wall else 0.0}
+
+
+def bench_size(size, args, reranker, llm):
+    documents = synthetic_corpus(size, seed=size)
+    started_at = time.perf_counter()
+    faiss_index = build_stub_index(documents)
+    build_seconds = time.perf_counter() - started_at
+
+    queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+    embeddings = {query: embed_query(query, faiss_index) for query in set(queries)}
+    retrieved = {query: retrieve_eligible_documents(faiss_index, embeddings[query], args.k) for query in set(queries)}
+    re_ranked = {query: reranker.rerank(query, docs)[:args.top_n] for query, docs in retrieved.items()}
+
+    def prompts(query):
+        chunks = clean_relevant_chunks_for_question_generation(re_ranked[query], min_chunk_length=30)
+        for chunk in chunks:
+            build_mcq_prompt(chunk, query)
+        build_batch_prompt(chunks, query, "mcq")
+
+    def pipeline(query):
+        if retrieval_cache:
+            retrieval_cache.clear()  # Measure retrieval, not cache hits
+        exam_pipeline(query, "mcq", args.questions, faiss_index, llm, k=args.k, top_n=args.top_n, use_question_bank=False)
+
+    stages = {
+        "faiss_search": lambda query: retrieve_eligible_documents(faiss_index, embeddings[query], args.k),
+        "hybrid_search": lambda query: retrieve_eligible_documents(faiss_index, embeddings[query], args.k, query, hybrid=True),
+        "rerank": lambda query: reranker.rerank(query, retrieved[query]),
+        "cleaning": lambda query: clean_relevant_chunks_for_question_generation(
+            filter_irrelevant_chunks(retrieved[query]), min_chunk_length=30),
+        "prompt_build": prompts,
+        "pipeline": pipeline,
+    }
+    results = [{"name": f"index_build/{size}", "metrics": {"build_seconds": build_seconds}}]
+    for name in args.stages:
+        metrics = measure(stages[name], queries, args.runs)
+        results.append({"name": f"{name}/{size}", "metrics": metrics})
+        print(f"{size:>8} {name:<14} p50={metrics['p50_ms']:9.2f} ms  p99={metrics['p99_ms']:9.2f} ms  "
+              f"{metrics['calls_per_second']:9.1f} calls/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="chunks in the corpus")
+    parser.add_argument("--stages", nargs="+", default=["faiss_search", "hybrid_search", "rerank", "cleaning", "prompt_build", "pipeline"])
+    parser.add_argument("--queries", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=10, help="questions per exam in the pipeline stage")
+    parser.add_argument("--reranker", default="stub", help="re-ranker backend (stub = offline word overlap)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per stub LLM call")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    config.RERANKER_BACKEND = args.reranker  # Also used by retrieve_and_rerank inside the pipeline
+    reranker = get_reranker(args.reranker)
+    llm = StubLLM(latency=args.llm_latency)
+
+    results = []
+    for size in args.sizes:
+        results.extend(bench_size(size, args, reranker, llm))
+
+    params = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "threshold")}
+    if args.output:
+        save_results(args.output, "pipeline", params, results)
+    if args.baseline:
+        current = {"params": params, "results": results, "environment": environment()}
+        sys.exit(1 if report_comparison(load_results(args.baseline), current, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Per-request re-ranking latency: legacy per-chunk zero-shot loop vs batched re-ranker backends.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_rerank --k 25 --runs 5 --backends nli cross-encoder none
+"""
+import argparse
+import statistics
+import time
+
+from langchain.schema import Document
+from transformers import pipeline
+
+from app import config
+from app.services.cleaning import filter_irrelevant_chunks
+from app.services.reranker import get_reranker
+from app.services.retrieval import retrieve_documents_from_faiss
+from app.utils.faiss_utils import load_faiss_index
+
+SYNTHETIC_CHUNK = (
+    "La clause GROUP BY regroupe les lignes qui ont les mêmes valeurs dans les colonnes "
+    "spécifiées. Elle est souvent utilisée avec des fonctions d'agrégation comme COUNT, SUM, "
+    "AVG, MIN et MAX afin de calculer une valeur par groupe. La clause HAVING permet ensuite "
+    "de filtrer les groupes obtenus selon une condition portant sur ces agrégats. "
+)
+
+
+# Load real chunks from the FAISS index when available, synthetic ones otherwise
+def load_documents(query, k):
+    faiss_index = load_faiss_index(config.VECTORSTORE_PATH)
+    if faiss_index:
+        return filter_irrelevant_chunks(retrieve_documents_from_faiss(query, faiss_index, k))
+    return [Document(page_content=SYNTHETIC_CHUNK * (1 + i % 3)) for i in range(k)]
+
+
+# The re-ranking loop this benchmark replaces: one zero-shot forward pass per chunk
+def legacy_rerank(classifier, query, documents):
+    re_ranked = []
+    for doc in documents:
+        result = classifier(query, candidate_labels=[doc.page_content])
+        re_ranked.append({"document": doc, "score": result["scores"][0]})
+    re_ranked.sort(key=lambda x: x["score"], reverse=True)
+    return [doc["document"] for doc in re_ranked]
+
+
+def measure(label, fn, runs):
+    fn()  # warm-up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+    print(f"{label:<28} mean={statistics.mean(timings):9.1f} ms  p50={statistics.median(timings):9.1f} ms  p95={p95:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", default="les jointures en SQL")
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["nli", "cross-encoder", "none"])
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    documents = load_documents(args.query, args.k)
+    print(f"Re-ranking {len(documents)} chunks per request "
+          f"(batch_size={config.RERANKER_BATCH_SIZE}, max_length={config.RERANKER_MAX_LENGTH})")
+
+    if not args.skip_legacy:
+        classifier = pipeline("zero-shot-classification", model=config.NLI_RERANKER_MODEL)
+        measure("legacy per-chunk loop", lambda: legacy_rerank(classifier, args.query, documents), args.runs)
+
+    for backend in args.backends:
+        reranker = get_reranker(backend)
+        measure(f"batched [{backend}]", lambda: reranker.rerank(args.query, documents), args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Fake Ollama server for load-testing the LLM client and the exam pipeline without a GPU.
+
+Implements POST /api/generate (streaming and non-streaming) and GET /api/tags. Each
+generation takes FAKE_OLLAMA_LATENCY seconds of "prompt evaluation" plus one
+FAKE_OLLAMA_TOKEN_DELAY per token, and at most FAKE_OLLAMA_PARALLEL generations run at
+once, like OLLAMA_NUM_PARALLEL. Answers are valid questions in the format the prompts ask for.
+
+Run from the Backend directory:
+    FAKE_OLLAMA_LATENCY=0.5 uvicorn benchmarks.fake_ollama:app --port 11500
+"""
+import asyncio
+import json
+import os
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.getenv("FAKE_OLLAMA_LATENCY", "0.5"))
+TOKEN_DELAY = float(os.getenv("FAKE_OLLAMA_TOKEN_DELAY", "0.005"))
+PARALLEL = int(os.getenv("FAKE_OLLAMA_PARALLEL", "4"))
+
+app = FastAPI(title="Fake Ollama")
+slots = asyncio.Semaphore(PARALLEL)
+state = {"in_flight": 0, "max_in_flight": 0, "requests": 0}
+
+
+def fake_question(prompt, number):
+    if "choix multiples" in prompt:
+        return {
+            "question": f"Question {number} : quelle clause SQL filtre les groupes ?",
+            "options": {"A": "WHERE", "B": "HAVING", "C": "ORDER BY", "D": "LIMIT"},
+            "correct_answer": "B",
+            "explanation": "HAVING filtre les groupes produits par GROUP BY.",
+        }
+    return {
+        "question": f"Question {number} : expliquez la différence entre WHERE et HAVING.",
+        "correct_answer": "WHERE filtre les lignes avant le regroupement, HAVING filtre les groupes après.",
+        "explanation": "HAVING s'applique aux agrégats.",
+    }
+
+
+# Answer in the shape the prompt asks for: one question, or {"questions": [...]} for batched prompts
+def fake_answer(prompt):
+    if "### Réponse de l'étudiant" in prompt:  # Grading of an open-ended answer
+        return json.dumps({"score": 0.5, "feedback": "Réponse partiellement correcte."}, ensure_ascii=False)
+    contents = len(re.findall(r"#### Contenu \d+", prompt))
+    if contents:
+        questions = [{"contenu": number, **fake_question(prompt, number)} for number in range(1, contents + 1)]
+        return json.dumps({"questions": questions}, ensure_ascii=False)
+    return json.dumps(fake_question(prompt, 1), ensure_ascii=False)
+
+
+def tokenize(text):
+    return re.findall(r"\S+\s*", text)
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [{"name": "llama3.2:latest"}]}
+
+
+@app.get("/stats")
+async def stats():
+    return state
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    body = await request.json()
+    prompt = body.get("prompt", "")
+    tokens = tokenize(fake_answer(prompt))
+    usage = {"prompt_eval_count": len(tokenize(prompt)), "eval_count": len(tokens)}
+
+    async def run(emit=None):
+        async with slots:
+            state["requests"] += 1
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            try:
+                await asyncio.sleep(LATENCY)
+                for token in tokens:
+                    await asyncio.sleep(TOKEN_DELAY)
+                    if emit:
+                        await emit(token)
+            finally:
+                state["in_flight"] -= 1
+
+    if not body.get("stream", True):
+        await run()
+        duration = int((LATENCY + TOKEN_DELAY * len(tokens)) * 1e9)
+        return JSONResponse({
+            "model": body.get("model"), "response": "".join(tokens), "done": True,
+            "eval_duration": int(TOKEN_DELAY * len(tokens) * 1e9), "total_duration": duration, **usage,
+        })
+
+    async def stream():
+        queue = asyncio.Queue()
+
+        async def emit(token):
+            await queue.put(json.dumps({"model": body.get("model"), "response": token, "done": False}) + "\n")
+
+        task = asyncio.create_task(run(emit))
+        while not task.done() or not queue.empty():
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=0.1)
+            except asyncio.TimeoutError:
+                continue
+        await task
+        yield json.dumps({"model": body.get("model"), "response": "", "done": True, **usage}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
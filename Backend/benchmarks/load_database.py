@@ -0,0 +1,154 @@
+"""
+Concurrent load on the MongoDB layer (app/database.py), with the API's query shapes: token user
+lookups, exam history pages and exam inserts. Checks that the startup indexes exist and are used,
+then reports per-operation latency and the connection pool metrics (connections opened, peak
+checked out, requests that waited for a connection).
+
+Against a local mongod (pool settings from the MONGO_* environment variables), from the Backend directory:
+    MONGO_MAX_POOL_SIZE=20 python -m benchmarks.load_database --tasks 200 --operations 5000
+Without a server, with mongomock_motor (checks the logic only; there is no real pool to measure):
+    python -m benchmarks.load_database --mongomock
+
+Uses its own database (--database), dropped at the end unless --keep is given.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from app import config
+from app.database import database
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def summary(label, latencies):
+    if not latencies:
+        return f"{label}: no samples"
+    return (f"{label}: n={len(latencies)} p50={statistics.median(latencies) * 1000:.2f} ms "
+            f"p99={percentile(latencies, 0.99) * 1000:.2f} ms max={max(latencies) * 1000:.2f} ms")
+
+
+async def seed(users, exams_per_user):
+    result = await database.users.insert_many([
+        {"username": f"loaduser{i}", "email": f"loaduser{i}@example.com", "hashed_password": "x"}
+        for i in range(users)
+    ])
+    user_ids = result.inserted_ids
+    now = datetime.utcnow()
+    exams = [
+        {
+            "query": f"Examen {j} sur les jointures",
+            "answers": {},
+            "questions": [{"question": f"Q{k}", "source_content": "x" * 1500} for k in range(10)],
+            "user_id": user_id,
+            "created_at": now - timedelta(minutes=j),
+        }
+        for user_id in user_ids for j in range(exams_per_user)
+    ]
+    for start in range(0, len(exams), 1000):
+        await database.exams.insert_many(exams[start:start + 1000])
+    return user_ids
+
+
+# Same query as GET /Exam/exam_history (first page)
+def history_page(user_id, limit=20):
+    return database.exams.find(
+        {"user_id": user_id},
+        {"query": 1, "created_at": 1, "question_count": {"$size": {"$ifNull": ["$questions", []]}}},
+    ).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).to_list(length=limit + 1)
+
+
+async def check_indexes(user_ids, mongomock):
+    try:
+        await database.users.insert_one({"username": "loaduser0", "email": "other@example.com"})
+        print("FAIL: duplicate username accepted (unique index missing)")
+    except DuplicateKeyError:
+        print("ok: unique username index")
+
+    if mongomock:
+        return
+    plan = await database.exams.find({"user_id": user_ids[0]}) \
+        .sort([("created_at", -1), ("_id", -1)]).limit(21).explain()
+    uses_index = "IXSCAN" in str(plan.get("queryPlanner", {}).get("winningPlan"))
+    print(f"{'ok' if uses_index else 'FAIL'}: exam history query {'uses' if uses_index else 'does not use'} an index")
+
+
+async def run(args):
+    client = None
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    config.DATABASE_NAME = args.database
+
+    await database.start(client)
+    try:
+        user_ids = await seed(args.users, args.exams_per_user)
+        await check_indexes(user_ids, args.mongomock)
+
+        latencies = {"user lookup": [], "history page": [], "exam insert": []}
+        errors = []
+        remaining = iter(range(args.operations))
+
+        async def operation():
+            kind = random.choices(list(latencies), weights=args.mix)[0]
+            user_id = random.choice(user_ids)
+            started_at = time.perf_counter()
+            if kind == "user lookup":
+                await database.users.find_one({"_id": user_id}, {"hashed_password": 0})
+            elif kind == "history page":
+                await history_page(user_id)
+            else:
+                await database.exams.insert_one({
+                    "query": "Examen", "answers": {}, "questions": [], "user_id": user_id,
+                    "created_at": datetime.utcnow(),
+                })
+            latencies[kind].append(time.perf_counter() - started_at)
+
+        async def worker():
+            for _ in remaining:
+                try:
+                    await operation()
+                except Exception as e:
+                    errors.append(repr(e))
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.tasks)))
+        wall = time.perf_counter() - started_at
+
+        print(f"{args.operations} operations, {args.tasks} concurrent tasks, {wall:.2f} s "
+              f"({args.operations / wall:.0f} ops/s), {len(errors)} errors")
+        for label, values in latencies.items():
+            print(summary(label, values))
+        if errors:
+            print(f"first error: {errors[0]}")
+        print(f"pool: {database.stats()}")
+    finally:
+        if not args.keep:
+            await database.client.drop_database(args.database)
+        database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock_motor instead of MONGO_URI")
+    parser.add_argument("--database", default="exam_generator_loadtest")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--exams-per-user", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=200, help="concurrent callers, like requests in flight")
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--mix", type=float, nargs=3, default=[0.6, 0.3, 0.1],
+                        help="weights of user lookups, history pages and inserts")
+    parser.add_argument("--keep", action="store_true", help="keep the test database")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
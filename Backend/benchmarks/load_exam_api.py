@@ -0,0 +1,161 @@
+"""
+HTTP load generator for the exam API: virtual users log in, list their exam history and generate
+exams concurrently, in the proportions given by --mix. Reports per-endpoint latency, throughput
+and status codes, saves them as JSON and compares them with a previous run.
+
+Against the offline API (benchmarks/offline_app.py) or a real deployment, from the Backend directory:
+    uvicorn benchmarks.offline_app:app --port 8000 &
+    python -m benchmarks.load_exam_api --users 50 --duration 60 --concurrency 50 --create-users \
+        --output benchmarks/results/load.json
+    python -m benchmarks.load_exam_api --users 50 --duration 60 --concurrency 50 --baseline benchmarks/results/load.json
+
+Login rate limits apply to real deployments (offline_app raises them); see benchmarks/load_login.py.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+
+from benchmarks.results import environment, latency_metrics, load_results, report_comparison, save_results
+
+QUERIES = [
+    "les jointures en SQL",
+    "GROUP BY et HAVING",
+    "les index et les performances",
+    "transactions et atomicité",
+    "normalisation des tables",
+]
+OPERATIONS = ("login", "history", "generate")
+
+
+class Recorder:
+
+    def __init__(self):
+        self.latencies = {operation: [] for operation in OPERATIONS}
+        self.statuses = {operation: {} for operation in OPERATIONS}
+
+    def record(self, operation, seconds, status):
+        self.latencies[operation].append(seconds)
+        self.statuses[operation][status] = self.statuses[operation].get(status, 0) + 1
+
+    def results(self, wall):
+        results = []
+        for operation in OPERATIONS:
+            latencies, statuses = self.latencies[operation], self.statuses[operation]
+            total = sum(statuses.values())
+            errors = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+            results.append({
+                "name": operation,
+                "metrics": {
+                    **latency_metrics(latencies),
+                    "requests_per_second": total / wall if wall else 0.0,
+                    "error_rate": errors / total if total else 0.0,
+                },
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            })
+        return results
+
+
+async def create_users(client, usernames, password):
+    for username in usernames:
+        response = await client.post("/auth/signup", json={
+            "username": username, "email": f"{username}@loadtest.example.com", "password": password,
+        })
+        if response.status_code not in (200, 400):  # 400: already exists
+            print(f"Signup failed for {username}: {response.status_code} {response.text}")
+
+
+async def login(client, username, password):
+    response = await client.post("/auth/login", json={"username": username, "password": password})
+    token = response.json().get("access_token") if response.status_code == 200 else None
+    return response.status_code, token
+
+
+async def virtual_user(client, username, args, recorder, deadline):
+    rng = random.Random(username)
+    status, token = await login(client, username, args.password)
+    if not token:
+        print(f"Login failed for {username}: {status}")
+        return
+
+    while time.monotonic() < deadline:
+        operation = rng.choices(OPERATIONS, weights=args.mix)[0]
+        headers = {"Authorization": f"Bearer {token}"}
+        started_at = time.perf_counter()
+        if operation == "login":
+            status, new_token = await login(client, username, args.password)
+            token = new_token or token
+        elif operation == "history":
+            response = await client.get("/Exam/exam_history", params={"limit": 20}, headers=headers)
+            status = response.status_code
+        else:
+            response = await client.post("/Exam/generate-exam", headers=headers, json={
+                "query": rng.choice(QUERIES),
+                "question_nbr": args.question_nbr,
+                "difficulty": "intermédiaire",
+                "question_type": rng.choice(["mcq", "open-ended"]),
+            })
+            status = response.status_code
+        recorder.record(operation, time.perf_counter() - started_at, status)
+        if args.think_time:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def run(args):
+    usernames = [f"{args.prefix}{i}" for i in range(args.users)]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        if args.create_users:
+            await create_users(client, usernames, args.password)
+
+        deadline = time.monotonic() + args.duration
+        started_at = time.perf_counter()
+        await asyncio.gather(*(virtual_user(client, username, args, recorder, deadline) for username in usernames))
+        wall = time.perf_counter() - started_at
+
+    results = recorder.results(wall)
+    print(f"{args.users} users, {args.duration:.0f} s, mix login/history/generate = {args.mix}")
+    for result in results:
+        metrics = result["metrics"]
+        if metrics["samples"]:
+            print(f"{result['name']:<9} n={metrics['samples']:<6} p50={metrics['p50_ms']:8.1f} ms  "
+                  f"p99={metrics['p99_ms']:8.1f} ms  {metrics['requests_per_second']:7.1f} req/s  "
+                  f"statuses={result['statuses']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20, help="virtual users, each running one request at a time")
+    parser.add_argument("--concurrency", type=int, default=100, help="maximum open connections")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--mix", type=float, nargs=3, default=[0.1, 0.6, 0.3],
+                        help="weights of logins, history pages and exam generations")
+    parser.add_argument("--question-nbr", type=int, default=5)
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause between requests, seconds")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--prefix", default="loadtest_user_")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--create-users", action="store_true")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    params = {key: value for key, value in vars(args).items()
+              if key not in ("url", "output", "baseline", "threshold", "password", "create_users")}
+    if args.output:
+        save_results(args.output, "exam_api_load", params, results)
+    if args.baseline:
+        current = {"params": params, "results": results, "environment": environment()}
+        sys.exit(1 if report_comparison(load_results(args.baseline), current, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Load test for the pooled Ollama client, normally against one or more fake Ollama servers.
+
+Run from the Backend directory, e.g. with two fake servers:
+    uvicorn benchmarks.fake_ollama:app --port 11500 &
+    uvicorn benchmarks.fake_ollama:app --port 11501 &
+    OLLAMA_HOSTS=http://localhost:11500,http://localhost:11501 OLLAMA_MAX_CONCURRENCY=8 \
+        python -m benchmarks.load_llm_client --requests 200 --threads 32
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import config
+from app.services.llm_client import create_llm_client
+from app.services.question_generator import build_mcq_prompt
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=16, help="concurrent callers, like exam generation workers")
+    parser.add_argument("--stream", action="store_true", help="consume token streams instead of full answers")
+    parser.add_argument("--timeout", type=float, default=None, help="per-call deadline in seconds")
+    args = parser.parse_args()
+
+    client = create_llm_client()
+    prompt = build_mcq_prompt("La clause HAVING filtre les groupes produits par GROUP BY.", "HAVING", "intermédiaire")
+    latencies, errors = [], []
+
+    def call(_):
+        started_at = time.perf_counter()
+        try:
+            if args.stream:
+                for _token in client.stream(prompt, timeout=args.timeout):
+                    pass
+            else:
+                client.invoke(prompt, timeout=args.timeout)
+            latencies.append(time.perf_counter() - started_at)
+        except Exception as e:
+            errors.append(type(e).__name__)
+
+    print(f"{args.requests} requests, {args.threads} callers, hosts={config.OLLAMA_HOSTS}, "
+          f"max_concurrency={config.OLLAMA_MAX_CONCURRENCY}, balancing={config.OLLAMA_BALANCING}")
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(call, range(args.requests)))
+    wall = time.perf_counter() - started_at
+
+    if latencies:
+        print(f"throughput={len(latencies) / wall:.1f} req/s  p50={statistics.median(latencies):.3f} s  "
+              f"p99={percentile(latencies, 0.99):.3f} s  errors={len(errors)} {sorted(set(errors))}")
+    stats = client.stats()
+    for endpoint in stats["endpoints"]:
+        print(f"  {endpoint['url']}: requests={endpoint['requests']} errors={endpoint['errors']} "
+              f"latency_avg={endpoint['latency_avg_seconds']:.3f} s")
+    print(f"  tokens: prompt={stats['prompt_tokens']} completion={stats['completion_tokens']} timeouts={stats['timeouts']}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Login burst load test: many concurrent logins (like a class at exam start) while a probe measures
+the latency of a non-auth endpoint on the same server. With bcrypt on the event loop, the probe's
+p99 climbs to hundreds of milliseconds; with hashing in its own pool it should stay flat.
+
+Run against a running API (MongoDB required), from the Backend directory:
+    uvicorn app.main:app --port 8000 &
+    python -m benchmarks.load_login --users 50 --logins 500 --concurrency 50 --create-users
+
+Rate limits apply: raise LOGIN_RATE_IP_BURST / LOGIN_RATE_IP_PER_MINUTE on the server for large runs
+from a single machine, or pass --expect-429 to measure the limiter itself.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def summary(label, latencies):
+    if not latencies:
+        return f"{label}: no samples"
+    return (f"{label}: n={len(latencies)} p50={statistics.median(latencies) * 1000:.1f} ms "
+            f"p99={percentile(latencies, 0.99) * 1000:.1f} ms max={max(latencies) * 1000:.1f} ms")
+
+
+async def create_users(client, usernames, password):
+    for username in usernames:
+        response = await client.post("/auth/signup", json={
+            "username": username, "email": f"{username}@loadtest.example.com", "password": password,
+        })
+        if response.status_code not in (200, 400):  # 400: already exists
+            print(f"Signup failed for {username}: {response.status_code} {response.text}")
+
+
+async def probe(client, path, interval, stop, latencies):
+    while not stop.is_set():
+        started_at = time.perf_counter()
+        await client.get(path)
+        latencies.append(time.perf_counter() - started_at)
+        await asyncio.sleep(interval)
+
+
+async def run(args):
+    usernames = [f"{args.prefix}{i}" for i in range(args.users)]
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60.0) as client:
+        if args.create_users:
+            await create_users(client, usernames, args.password)
+
+        # Baseline latency of the probe endpoint with no login traffic
+        baseline, stop = [], asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, args.probe_path, args.probe_interval, stop, baseline))
+        await asyncio.sleep(2.0)
+        stop.set()
+        await probe_task
+
+        login_latencies, probe_latencies, statuses = [], [], {}
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def login(i):
+            async with semaphore:
+                started_at = time.perf_counter()
+                response = await client.post("/auth/login", json={
+                    "username": usernames[i % len(usernames)], "password": args.password,
+                })
+                login_latencies.append(time.perf_counter() - started_at)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, args.probe_path, args.probe_interval, stop, probe_latencies))
+        started_at = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        wall = time.perf_counter() - started_at
+        stop.set()
+        await probe_task
+
+    print(f"{args.logins} logins, concurrency {args.concurrency}, {wall:.1f} s ({args.logins / wall:.1f} logins/s)")
+    print(f"status codes: {dict(sorted(statuses.items()))}")
+    print(summary("login", login_latencies))
+    print(summary(f"probe {args.probe_path} (idle)", baseline))
+    print(summary(f"probe {args.probe_path} (during logins)", probe_latencies))
+    if not args.expect_429 and statuses.get(429):
+        print("Some logins were rate limited; see the note in --help.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--prefix", default="loadtest_user_")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--create-users", action="store_true")
+    parser.add_argument("--probe-path", default="/health/live", help="non-auth endpoint to watch")
+    parser.add_argument("--probe-interval", type=float, default=0.02)
+    parser.add_argument("--expect-429", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
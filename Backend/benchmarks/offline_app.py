@@ -0,0 +1,32 @@
+"""
+The API with offline backends, for HTTP load tests without MongoDB, Ollama or models: in-memory
+MongoDB (mongomock_motor), stub embeddings, re-ranker and LLM, and a synthetic corpus
+(benchmarks/stubs.py). Login rate limits are raised so a load generator on one machine isn't throttled.
+
+Run from the Backend directory (one worker: the in-memory database is per process):
+    OFFLINE_CORPUS_SIZE=10000 OFFLINE_LLM_LATENCY=0.5 uvicorn benchmarks.offline_app:app --port 8000
+"""
+import os
+
+os.environ.setdefault("MODEL_LOADING", "lazy")  # The stub resources are set below, nothing to load
+os.environ.setdefault("RERANKER_BACKEND", "stub")
+os.environ.setdefault("INFERENCE_SOCKET", "")
+os.environ.setdefault("LOGIN_RATE_IP_BURST", "100000")
+os.environ.setdefault("LOGIN_RATE_IP_PER_MINUTE", "1000000")
+os.environ.setdefault("LOGIN_RATE_USER_BURST", "100000")
+os.environ.setdefault("LOGIN_RATE_USER_PER_MINUTE", "1000000")
+
+from app.main import app
+from app.routers import exam
+from app.services.model_registry import model_registry
+from benchmarks.stubs import StubEmbeddings, StubLLM, StubReRanker, build_stub_index, synthetic_corpus, use_mongomock
+
+use_mongomock()
+
+embeddings = StubEmbeddings()
+model_registry.set("embedding_model", embeddings)
+model_registry.set("reranker", StubReRanker())
+model_registry.set("faiss_index", build_stub_index(
+    synthetic_corpus(int(os.getenv("OFFLINE_CORPUS_SIZE", "10000"))), embeddings,
+))
+exam.ollama_model = StubLLM(latency=float(os.getenv("OFFLINE_LLM_LATENCY", "0.5")))
@@ -0,0 +1,136 @@
+"""
+Benchmark results as JSON files, and regression checks of one run against a previous one.
+
+Each result has a name (e.g. "faiss_search/10000") and metrics; a metric regresses when it is worse
+than the baseline by more than the threshold: *_ms and *_seconds are better lower, *_per_second
+and recall* better higher, anything else is informational. error_rate is better lower too, but is
+compared in absolute terms (the baseline is usually 0): it regresses when it rises by more than
+ERROR_RATE_TOLERANCE.
+
+The benchmarks write results with --output and check them with --baseline; to compare two saved runs,
+from the Backend directory:
+    python -m benchmarks.results benchmarks/results/before.json benchmarks/results/after.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Rise of error_rate (a fraction of the requests) counted as a regression
+ERROR_RATE_TOLERANCE = 0.01
+# Metrics compared by absolute difference rather than relative change
+ABSOLUTE_METRICS = ("error_rate",)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+# Latency metrics of a list of timings in seconds
+def latency_metrics(latencies):
+    if not latencies:
+        return {"samples": 0}
+    return {
+        "samples": len(latencies),
+        "mean_ms": 1000 * sum(latencies) / len(latencies),
+        "p50_ms": 1000 * percentile(latencies, 0.5),
+        "p95_ms": 1000 * percentile(latencies, 0.95),
+        "p99_ms": 1000 * percentile(latencies, 0.99),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_results(path, benchmark, params, results):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "benchmark": benchmark,
+            "environment": environment(),
+            "params": params,
+            "results": results,
+        }, f, indent=2, ensure_ascii=False)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def metric_direction(metric):
+    if metric.endswith(("_ms", "_seconds")) or metric in ABSOLUTE_METRICS:
+        return -1
+    if metric.endswith("_per_second") or metric.startswith("recall"):
+        return 1
+    return 0
+
+
+# (name, metric, baseline, current, change, regressed) for every metric both runs have; the change is
+# relative, except for ABSOLUTE_METRICS where it is the difference
+def compare(baseline, current, threshold=0.1):
+    baseline_results = {result["name"]: result["metrics"] for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        previous = baseline_results.get(result["name"])
+        if previous is None:
+            continue
+        for metric, value in result["metrics"].items():
+            direction = metric_direction(metric)
+            old = previous.get(metric)
+            if not direction or not isinstance(old, (int, float)) or not isinstance(value, (int, float)):
+                continue
+            if metric in ABSOLUTE_METRICS:
+                change = value - old
+                rows.append((result["name"], metric, old, value, change, -direction * change > ERROR_RATE_TOLERANCE))
+                continue
+            if not old:
+                continue
+            change = (value - old) / abs(old)
+            rows.append((result["name"], metric, old, value, change, -direction * change > threshold))
+    return rows
+
+
+# Print the comparison; returns True when something regressed
+def report_comparison(baseline, current, threshold=0.1):
+    if baseline.get("params") != current.get("params"):
+        print("Note: the runs used different parameters, comparisons may not be meaningful.")
+    rows = compare(baseline, current, threshold)
+    regressions = [row for row in rows if row[5]]
+    for name, metric, old, value, change, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        shown = f"{100 * change:>+6.1f}pt" if metric in ABSOLUTE_METRICS else f"{change:>+8.1%}"
+        print(f"{name:<32} {metric:<18} {old:>12.3f} -> {value:>12.3f} {shown} {flag}")
+    print(f"{len(regressions)} regression(s) above {threshold:.0%} "
+          f"(baseline {baseline['environment'].get('git_commit')}, current {current['environment'].get('git_commit')})")
+    return bool(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+    sys.exit(1 if report_comparison(load_results(args.baseline), load_results(args.current), args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Offline stand-ins for the benchmarks: no GPU, model download, Ollama server or MongoDB needed.
+
+- StubEmbeddings: hashed bag-of-words vectors (same dimension as MPNet), so FAISS and the cache
+  see realistic vector sizes and similar texts get similar vectors
+- StubReRanker: word-overlap scores, registered as the "stub" re-ranker backend
+- StubLLM: the invoke() interface of the LLM client, answering like benchmarks/fake_ollama.py
+- synthetic_corpus / build_stub_index: a French SQL course corpus of any size, with some table of
+  contents chunks for the cleaning filters to drop
+- use_mongomock: points app.database at in-memory mongomock clients
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain.vectorstores import FAISS
+
+from app.services.reranker import RERANKER_BACKENDS, ReRanker
+from app.services.retrieval import prepare_index
+from benchmarks.fake_ollama import fake_answer
+
+DIMENSION = 768
+
+TOPICS = [
+    ("jointure", "Une jointure {kind} combine les lignes de deux tables selon une condition sur {column}."),
+    ("agrégation", "La fonction {function} calcule une valeur par groupe lorsque la requête utilise GROUP BY {column}."),
+    ("filtrage", "La clause HAVING filtre les groupes après l'agrégation, alors que WHERE filtre les lignes de {table}."),
+    ("index", "Un index sur {table}({column}) accélère les recherches mais ralentit les insertions et les mises à jour."),
+    ("transaction", "Une transaction garantit l'atomicité : toutes les modifications de {table} sont validées ou annulées."),
+    ("normalisation", "La {form} forme normale élimine les dépendances qui provoquent des anomalies de mise à jour dans {table}."),
+    ("sous-requête", "Une sous-requête corrélée est réévaluée pour chaque ligne de {table}, ce qui peut coûter cher."),
+    ("vue", "Une vue est une requête nommée sur {table} ; elle ne stocke pas de données, sauf si elle est matérialisée."),
+]
+FILLERS = {
+    "kind": ["interne", "externe gauche", "externe droite", "complète", "croisée"],
+    "column": ["id_client", "date_commande", "code_produit", "id_etudiant", "salaire"],
+    "function": ["COUNT", "SUM", "AVG", "MIN", "MAX"],
+    "table": ["commandes", "clients", "produits", "etudiants", "employes"],
+    "form": ["première", "deuxième", "troisième"],
+}
+
+
+def tokens(text):
+    return re.findall(r"\w+", text.lower())
+
+
+# Hashed bag-of-words embeddings, L2-normalised
+class StubEmbeddings(Embeddings):
+
+    def __init__(self, dimension=DIMENSION):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in tokens(text):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimension] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+# Fraction of the query's words found in each chunk; delay_per_pair simulates model cost
+class StubReRanker(ReRanker):
+    name = "stub"
+
+    def __init__(self, delay_per_pair=0.0):
+        self.delay_per_pair = delay_per_pair
+
+    def score(self, query, texts):
+        if self.delay_per_pair:
+            time.sleep(self.delay_per_pair * len(texts))
+        query_tokens = set(tokens(query))
+        return [len(query_tokens & set(tokens(text))) / (len(query_tokens) or 1) for text in texts]
+
+
+RERANKER_BACKENDS.setdefault("stub", StubReRanker)
+
+
+# LLM answering every prompt with valid questions after `latency` seconds
+class StubLLM:
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt, timeout=None, format=None, options=None):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return fake_answer(prompt)
+
+    def stats(self):
+        with self._lock:
+            return {"model": "stub", "calls": self.calls}
+
+
+def synthetic_chunk(rng):
+    sentences = []
+    for _ in range(rng.randint(4, 8)):
+        _, template = rng.choice(TOPICS)
+        sentences.append(template.format(**{key: rng.choice(values) for key, values in FILLERS.items()}))
+    return " ".join(sentences)
+
+
+# size chunks, about 1 in 10 being table of contents noise
+def synthetic_corpus(size, seed=0):
+    rng = random.Random(seed)
+    documents = []
+    for i in range(size):
+        if i % 10 == 9:
+            content = "\n".join(f"{rng.randint(1, 9)}.{rng.randint(1, 9)} {rng.choice(TOPICS)[0]} " + "." * 40 + f" {rng.randint(1, 300)}"
+                                for _ in range(5))
+        else:
+            content = synthetic_chunk(rng)
+        documents.append(Document(page_content=content, metadata={"doc_id": f"cours-{i // 100}", "chunk": i}))
+    return documents
+
+
+# FAISS index of the corpus with the stub embeddings, prepared like a loaded index
+def build_stub_index(documents, embeddings=None):
+    embeddings = embeddings or StubEmbeddings()
+    texts = [doc.page_content for doc in documents]
+    vectors = embeddings.embed_documents(texts)
+    faiss_index = FAISS.from_embeddings(
+        list(zip(texts, vectors)), embeddings, metadatas=[dict(doc.metadata) for doc in documents],
+    )
+    prepare_index(faiss_index)
+    return faiss_index
+
+
+# In-memory MongoDB for app.database (requires mongomock and mongomock_motor)
+def use_mongomock():
+    import mongomock
+    from mongomock_motor import AsyncMongoMockClient
+    from app.database import database
+
+    database.connect(AsyncMongoMockClient())
+    database.sync_client = mongomock.MongoClient()
+    return database
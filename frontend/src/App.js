@@ -7,7 +7,7 @@ import ExamDisplay from "./components/ExamDisplay";
 import Sidebar from "./components/Sidebar";
 import TopBar from "./components/TopBar";
 import ExamHistory from "./components/ExamHistory";
-import { fetchExam } from "./api/Exam";
+import { fetchExam, fetchExamDetail } from "./api/Exam";
 
 const App = () => {
   const [exam, setExam] = useState(null);
@@ -49,9 +49,15 @@ const App = () => {
     localStorage.removeItem("token");
   };
 
-  const handleExamClick = (exam) => {
-    setExam(exam); // Set the clicked exam to be displayed in the ExamDisplay
-    navigate("/exam-display"); // Navigate to the ExamDisplay page
+  const handleExamClick = async (exam) => {
+    try {
+      // The history only lists summaries: load the full exam to display it
+      const detail = await fetchExamDetail(exam._id);
+      setExam(detail); // Set the clicked exam to be displayed in the ExamDisplay
+      navigate("/exam-display"); // Navigate to the ExamDisplay page
+    } catch (error) {
+      console.error("Erreur lors du chargement de l'examen:", error);
+    }
   };
 
   const resetExam = () => {
@@ -39,22 +39,39 @@ export const fetchExam = async (
 };
 
 
-export const fetchExamHistory = async () => {
+// One page of the exam history (summaries, newest first); pass nextCursor to get the following page
+export const fetchExamHistory = async ({ cursor = null, limit = 20 } = {}) => {
   try {
     const token = localStorage.getItem("token"); // Retrieve the token
     const response = await axios.get(`${API_BASE_URL}/Exam/exam_history`, {
       headers: {
         Authorization: `Bearer ${token}`, // Include token in Authorization header
       },
+      params: cursor ? { limit, cursor } : { limit },
     });
-    console.log(response.data);
-    return response.data.exams; // Return the exam history
+    return { exams: response.data.exams, nextCursor: response.data.next_cursor };
   } catch (error) {
     console.error("Error fetching the exam history:", error);
     throw error;
   }
 };
 
+// Full exam, questions included
+export const fetchExamDetail = async (id) => {
+  try {
+    const token = localStorage.getItem("token");
+    const response = await axios.get(`${API_BASE_URL}/Exam/exams/${id}`, {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+    return response.data;
+  } catch (error) {
+    console.error("Error fetching the exam:", error);
+    throw error;
+  }
+};
+
 export const deleteExam = async (id) => {
   try {
     const token = localStorage.getItem("token");
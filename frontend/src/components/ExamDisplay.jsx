@@ -20,6 +20,12 @@ const ExamDisplay = ({ exam, onReset }) => {
   useEffect(() => {
     if (exam && exam.questions) {
       const questions = exam.questions.map((q, index) => {
+        // Questions parsed and validated by the backend
+        if (q.question_text) {
+          return { ...q, question: q.question_text };
+        }
+
+        // Exams stored before parsing moved to the backend keep the raw model answer
         let cleanedData = q.question_data;
 
         if (!cleanedData) {
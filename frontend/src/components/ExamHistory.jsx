@@ -6,16 +6,16 @@ import { Trash2, ArrowLeft, Clock, AlertCircle } from "lucide-react";
 const ExamHistory = ({ onExamClick }) => {
   const [examHistory, setExamHistory] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const [showDeleteConfirm, setShowDeleteConfirm] = useState(false);
 
   useEffect(() => {
     const loadExamHistory = async () => {
       try {
-        const history = await fetchExamHistory();
-        const sortedHistory = history.sort(
-          (a, b) => new Date(b.created_at) - new Date(a.created_at)
-        );
-        setExamHistory(sortedHistory);
+        const { exams, nextCursor } = await fetchExamHistory(); // Already newest first
+        setExamHistory(exams);
+        setNextCursor(nextCursor);
       } catch (error) {
         console.error("Error loading exam history:", error);
       } finally {
@@ -26,6 +26,19 @@ const ExamHistory = ({ onExamClick }) => {
     loadExamHistory();
   }, []);
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const { exams, nextCursor: cursor } = await fetchExamHistory({ cursor: nextCursor });
+      setExamHistory((prevHistory) => [...prevHistory, ...exams]);
+      setNextCursor(cursor);
+    } catch (error) {
+      console.error("Error loading exam history:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (id) => {
     try {
       await deleteExam(id);
@@ -39,10 +52,16 @@ const ExamHistory = ({ onExamClick }) => {
 
   const handleDeleteAll = async () => {
     try {
-      for (const exam of examHistory) {
-        await deleteExam(exam._id);
+      // Delete page by page until the whole history is gone, not just the loaded exams
+      let exams = examHistory;
+      while (exams.length > 0) {
+        for (const exam of exams) {
+          await deleteExam(exam._id);
+        }
+        ({ exams } = await fetchExamHistory());
       }
       setExamHistory([]);
+      setNextCursor(null);
       setShowDeleteConfirm(false);
     } catch (error) {
       console.error("Error deleting all exams:", error);
@@ -150,7 +169,7 @@ const ExamHistory = ({ onExamClick }) => {
                   <div className="flex justify-between items-start">
                     <div className="flex-1 min-w-0">
                       <h3 className="font-medium text-gray-900 group-hover:text-indigo-600 transition-colors">
-                        {truncateText(exam.query, 50)}
+                        {truncateText(exam.title || exam.query, 50)}
                       </h3>
                       <div className="flex items-center mt-2 text-sm text-gray-500">
                         <Clock className="w-4 h-4 mr-2" />
@@ -158,6 +177,7 @@ const ExamHistory = ({ onExamClick }) => {
                           {new Date(exam.created_at).toLocaleDateString()} à{" "}
                           {new Date(exam.created_at).toLocaleTimeString()}
                         </time>
+                        <span className="ml-4">{exam.question_count} questions</span>
                       </div>
                     </div>
                     <button
@@ -173,6 +193,15 @@ const ExamHistory = ({ onExamClick }) => {
                 </button>
               </div>
             ))}
+            {nextCursor && (
+              <button
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                className="mx-auto px-4 py-2 text-indigo-600 hover:text-indigo-800 disabled:text-gray-400 transition-colors"
+              >
+                {loadingMore ? "Chargement..." : "Afficher plus"}
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -10,11 +10,8 @@ const Sidebar = ({ onExamClick, onLogout, userProfile }) => {
   useEffect(() => {
     const loadExamHistory = async () => {
       try {
-        const history = await fetchExamHistory();
-        const sortedHistory = history.sort(
-          (a, b) => new Date(b.created_at) - new Date(a.created_at)
-        );
-        setExamHistory(sortedHistory);
+        const { exams } = await fetchExamHistory({ limit: 20 }); // Already newest first
+        setExamHistory(exams);
       } catch (error) {
         console.error("Error loading exam history:", error);
       }